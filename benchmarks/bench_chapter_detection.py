@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+章节边界选择微基准
+生成带已知章节边界的合成页面文本（不经过PDF），对比ChapterDetector的
+greedy和optimal策略：检测耗时、真实章节起始的召回率、切在干扰页上的误切数、
+补充边界数，以及违反最小/最大章节页数的章节数
+
+合成文档中章节长度在 [min_pages, 1.5 x max_pages] 之间随机（部分章节超过最大页数，
+需要补充边界），正文中混入编号列表和短标题行等干扰候选。
+
+用法:
+    python benchmarks/bench_chapter_detection.py --pages 10000 --repeat 3
+"""
+
+import argparse
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src' / 'pdf'))
+
+# 中文正文（英文句末的"字母+句点"会被大小写不敏感的 [A-Z]\. 模式当作章节标题，
+# 每页都成为候选，无法比较边界选择策略）
+BODY_TEXT = ("这是第{page}页的正文内容，段落足够长，读起来像普通的书页，没有任何标题。"
+             "后面还有更多句子，包含逗号和句号，继续描述正文内容。\n") * 4
+
+def make_page_texts(num_pages, min_pages, max_pages, noise, seed):
+    """
+    生成合成页面文本
+
+    Returns:
+        (dict, list, set): 页面编号 -> 文本，真实章节起始页列表，干扰页集合
+    """
+    rng = random.Random(seed)
+    page_texts = {}
+    chapter_starts = []
+    noise_pages = set()
+
+    page_num = 0
+    chapter_number = 1
+    while page_num < num_pages:
+        chapter_starts.append(page_num)
+        length = rng.randint(min_pages, max_pages * 3 // 2)
+        for offset in range(min(length, num_pages - page_num)):
+            body = BODY_TEXT.format(page=page_num + 1)
+            if offset == 0:
+                text = f"第{chapter_number}章 合成章节\n{body}"
+            elif rng.random() < noise:
+                noise_pages.add(page_num)
+                # 干扰：编号列表（匹配章节模式）或短小标题行（标题特征）
+                if rng.random() < 0.5:
+                    text = f"{rng.randint(1, 9)}、编号列表中的一项\n{body}"
+                else:
+                    text = f"本节小结\n{body}"
+            else:
+                text = body
+            page_texts[page_num] = text
+            page_num += 1
+        chapter_number += 1
+
+    return page_texts, chapter_starts, noise_pages
+
+def score(boundaries, chapter_starts, noise_pages, total_pages, min_pages, max_pages):
+    """
+    召回率、误切数、补充边界数，以及长度越界的章节数
+
+    超过最大页数的真实章节必须补充边界，所以不在真实起始页上的边界分为
+    误切（切在干扰页上）和补充边界（其余页面）两类分别统计
+    """
+    found = set(boundaries)
+    truth = set(chapter_starts)
+    extra = found - truth
+    false_splits = len(extra & noise_pages)
+    lengths = [end - start for start, end in zip(boundaries, boundaries[1:] + [total_pages])]
+    return {
+        'chapters': len(boundaries),
+        'recall': len(found & truth) / len(truth) if truth else 0.0,
+        'false_splits': false_splits,
+        'fillers': len(extra) - false_splits,
+        'too_short': sum(1 for length in lengths if length < min_pages),
+        'too_long': sum(1 for length in lengths if length > max_pages),
+    }
+
+def main():
+    """命令行接口"""
+    parser = argparse.ArgumentParser(description='章节边界选择微基准（greedy vs optimal）')
+    parser.add_argument('--pages', type=int, default=10000, help='合成文档页数 (默认: 10000)')
+    parser.add_argument('--min-pages', type=int, default=10, help='最小章节页数 (默认: 10)')
+    parser.add_argument('--max-pages', type=int, default=40, help='最大章节页数 (默认: 40)')
+    parser.add_argument('--noise', type=float, default=0.05, help='正文页中干扰候选的比例 (默认: 0.05)')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数 (默认: 3)')
+    parser.add_argument('--seed', type=int, default=1, help='随机种子 (默认: 1)')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    from pdf_chapter_detector import STRATEGIES, ChapterDetector
+
+    page_texts, chapter_starts, noise_pages = make_page_texts(args.pages, args.min_pages, args.max_pages,
+                                                 args.noise, args.seed)
+    print(f"合成文档: {args.pages} 页, {len(chapter_starts)} 个真实章节, 干扰比例 {args.noise:.0%}")
+
+    print("\n" + "=" * 82)
+    print(f" {'策略':<10}{'耗时(秒)':>10}{'章节数':>8}{'召回率':>10}{'误切':>8}{'补充边界':>10}{'过短':>8}{'过长':>8}")
+    print("=" * 82)
+    for strategy in STRATEGIES:
+        detector = ChapterDetector(min_chapter_pages=args.min_pages, max_chapter_pages=args.max_pages,
+                                   strategy=strategy)
+        start_time = time.perf_counter()
+        for _ in range(args.repeat):
+            boundaries = detector.detect_from_text(page_texts)
+        elapsed = (time.perf_counter() - start_time) / args.repeat
+
+        stats = score(boundaries, chapter_starts, noise_pages, args.pages, args.min_pages, args.max_pages)
+        print(f" {strategy:<10}{elapsed:>10.3f}{stats['chapters']:>8}{stats['recall']:>10.1%}"
+              f"{stats['false_splits']:>8}{stats['fillers']:>10}{stats['too_short']:>8}{stats['too_long']:>8}")
+    print("=" * 82)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+OCR图像预处理微基准
+对比原PIL流程（中值滤波 -> ImageOps.equalize -> 全局中位数阈值）
+与NumPy原地流程（pdf_image_preprocess）的耗时和峰值内存
+
+用法:
+    python benchmarks/bench_preprocess.py --dpi 200 --repeat 5
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src' / 'pdf'))
+
+def legacy_preprocess(image, denoise=True):
+    """原PDFOCR.preprocess_image的处理流程（作为对比基准）"""
+    from PIL import Image, ImageFilter, ImageOps
+    import numpy as np
+
+    gray_image = image.convert('L') if image.mode != 'L' else image
+    denoised = gray_image.filter(ImageFilter.MedianFilter(size=3)) if denoise else gray_image
+    enhanced = ImageOps.equalize(denoised)
+    img_array = np.array(enhanced)
+    threshold = np.median(img_array)
+    binary_array = (img_array > threshold).astype(np.uint8) * 255
+    return Image.fromarray(binary_array)
+
+def make_page_image(dpi):
+    """生成A4扫描页：左暗右亮的渐变底色加若干行文字"""
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    background = np.tile(np.linspace(110, 250, width).astype(np.uint8), (height, 1))
+    image = Image.fromarray(np.dstack([background] * 3))
+
+    draw = ImageDraw.Draw(image)
+    line = "The quick brown fox jumps over the lazy dog 0123456789 " * 3
+    for y in range(dpi, height - dpi, dpi // 4):
+        draw.text((dpi // 2, y), line, fill=(25, 25, 25))
+    return image
+
+def measure(function, image, repeat):
+    """返回 (平均耗时秒, Python/NumPy分配的峰值内存MB, 结果图像)"""
+    function(image)  # 预热
+
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        result = function(image)
+    elapsed = (time.perf_counter() - start_time) / repeat
+
+    tracemalloc.start()
+    function(image)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak / 1024 / 1024, result
+
+def main():
+    """命令行接口"""
+    parser = argparse.ArgumentParser(description='OCR图像预处理微基准')
+    parser.add_argument('--dpi', type=int, default=200, help='页面分辨率 (默认: 200)')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数 (默认: 5)')
+    parser.add_argument('--no-denoise', action='store_true',
+                        help='两个流程都跳过中值滤波（两者共用PIL中值滤波，跳过后只比较其余步骤）')
+    args = parser.parse_args()
+    denoise = not args.no_denoise
+
+    import numpy as np
+    from pdf_image_preprocess import preprocess_for_ocr
+
+    image = make_page_image(args.dpi)
+    print(f"页面图像: {image.size[0]}x{image.size[1]} ({image.mode}), 重复 {args.repeat} 次")
+    print("(峰值内存只统计Python/NumPy分配，不含PIL内部缓冲)")
+
+    rows = []
+    for name, function in (('legacy (PIL + 全局阈值)', lambda img: legacy_preprocess(img, denoise)),
+                           ('numpy (原地 + 自适应阈值)', lambda img: preprocess_for_ocr(img, denoise))):
+        elapsed, peak_mb, result = measure(function, image, args.repeat)
+        black = float((np.asarray(result) == 0).mean())
+        rows.append((name, elapsed, peak_mb, black))
+
+    print(f"\n{'流程':<28}{'耗时(毫秒)':>12}{'峰值内存(MB)':>16}{'黑色像素比例':>14}")
+    for name, elapsed, peak_mb, black in rows:
+        print(f"{name:<28}{elapsed * 1000:>12.1f}{peak_mb:>16.1f}{black:>14.3f}")
+
+    speedup = rows[0][1] / rows[1][1] if rows[1][1] else 0
+    print(f"\n加速比: {speedup:.2f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+PDF处理流程基准测试
+生成合成PDF，逐个运行各处理引擎，记录耗时、峰值内存和每秒页数，
+结果写入JSON并可与保存的基线对比
+
+用法:
+    python benchmarks/run_benchmarks.py                      # 运行全部引擎
+    python benchmarks/run_benchmarks.py --save-baseline      # 保存为基线
+    python benchmarks/run_benchmarks.py --engines final,detector --pages 2000
+    python benchmarks/run_benchmarks.py --engines split,v2 --text-pdf huge.pdf --input-mode both
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCHMARK_DIR.parent
+PDF_MODULE_DIR = PROJECT_ROOT / 'src' / 'pdf'
+RESULTS_DIR = BENCHMARK_DIR / 'results'
+
+# 引擎名称 -> 输入类型（text: 文本PDF, image: 纯图像PDF）
+ENGINES = {
+    'final': 'text',
+    'split': 'text',
+    'v2': 'text',
+    'detector': 'text',
+    'detector-optimal': 'text',
+    'ocr': 'image',
+}
+
+def _run_final(pdf_path, work_dir, options):
+    """PDFSplitterFinal: 类型检测 + 全文档章节检测 + 拆分"""
+    from pdf_chapter_splitter_final import PDFSplitterFinal
+    splitter = PDFSplitterFinal(pages_per_chapter=20, workers=options['workers'])
+    result = splitter.smart_process_pdf(pdf_path, work_dir, use_smart_detection=True)
+    return result.get('success', False)
+
+def _run_split(pdf_path, work_dir, options):
+    """PDFSplitterFinal: 固定页数拆分，原始对象复制（I/O为主，对比输入方式用）"""
+    from pdf_chapter_splitter_final import PDFSplitterFinal
+    splitter = PDFSplitterFinal(pages_per_chapter=20, split_engine='raw')
+    result = splitter.smart_process_pdf(pdf_path, work_dir, use_smart_detection=False)
+    return result.get('success', False)
+
+def _run_v2(pdf_path, work_dir, options):
+    """PDFSplitterV2: 固定页数拆分"""
+    from pdf_chapter_splitter_v2 import PDFSplitterV2
+    splitter = PDFSplitterV2(pages_per_chapter=20)
+    return bool(splitter.split_pdf(pdf_path, work_dir))
+
+def _run_detector(pdf_path, work_dir, options, strategy='greedy'):
+    """ChapterDetector: 只计章节检测本身（页面文本预先提取）"""
+    from pdf_chapter_detector import ChapterDetector
+    from pdf_document import PDFDocument
+    from pdf_page_index import build_page_text_index
+
+    with PDFDocument(pdf_path) as document:
+        texts = build_page_text_index(document).texts
+    page_texts = {page_num: text.strip() for page_num, text in enumerate(texts)}
+
+    detector = ChapterDetector(strategy=strategy)
+    start_time = time.perf_counter()
+    boundaries = detector.detect_from_text(page_texts)
+    return len(boundaries) > 0, time.perf_counter() - start_time
+
+def _run_detector_optimal(pdf_path, work_dir, options):
+    """ChapterDetector(strategy='optimal'): 动态规划边界选择"""
+    return _run_detector(pdf_path, work_dir, options, strategy='optimal')
+
+def _run_ocr(pdf_path, work_dir, options):
+    """PDFOCRProcessor: 栅格化 + 预处理 + OCR + 拆分"""
+    from pdf_ocr_processor import PDFOCRProcessor
+    processor = PDFOCRProcessor(dpi=options['dpi'], workers=options['workers'],
+                                ocr_backend=OCR_BACKENDS[options['ocr']])
+    result = processor.process_scanned_pdf(pdf_path, work_dir, pages_per_chapter=20)
+    return result.get('success', False)
+
+# --input-mode选项：mmap为共享内存映射（pdf_input），file为普通文件读取
+INPUT_MODES = ('mmap', 'file')
+
+# --ocr选项 -> OCR后端（stub为进程内替身，不需要tesseract和poppler）
+OCR_BACKENDS = {
+    'stub': 'stub',
+    'tesseract': 'auto',
+}
+
+RUNNERS = {
+    'final': _run_final,
+    'split': _run_split,
+    'v2': _run_v2,
+    'detector': _run_detector,
+    'detector-optimal': _run_detector_optimal,
+    'ocr': _run_ocr,
+}
+
+def _peak_rss_mb():
+    """本进程及已结束子进程（OCR进程池）的峰值内存（MB）"""
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux上ru_maxrss单位为KB，macOS上为字节
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return max(self_rss, children_rss) / scale
+
+def run_one(engine, pdf_path, pages, options):
+    """
+    在当前进程中运行单个引擎（由子进程调用，保证峰值内存互不影响）
+
+    Returns:
+        dict: 单个引擎的测量结果
+    """
+    sys.path.insert(0, str(PDF_MODULE_DIR))
+
+    if not options['verbose']:
+        logging.disable(logging.INFO)
+
+    from pdf_document import PDFDocument
+    PDFDocument.use_mmap = options['input_mode'] == 'mmap'
+
+    with tempfile.TemporaryDirectory(prefix=f"bench_{engine}_") as work_dir:
+        start_time = time.perf_counter()
+        outcome = RUNNERS[engine](pdf_path, work_dir, options)
+        wall_time = time.perf_counter() - start_time
+
+    # 部分引擎只计核心阶段的耗时
+    if isinstance(outcome, tuple):
+        success, wall_time = outcome
+    else:
+        success = outcome
+
+    return {
+        'engine': engine,
+        'input_mode': options['input_mode'],
+        'pages': pages,
+        'success': bool(success),
+        'wall_time': round(wall_time, 4),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'pages_per_sec': round(pages / wall_time, 2) if wall_time > 0 else 0.0
+    }
+
+def _existing_pdf(path):
+    """已有PDF文件及其页数"""
+    import PyPDF2
+
+    path = Path(path).resolve()
+    with open(path, 'rb') as f:
+        pages = len(PyPDF2.PdfReader(f).pages)
+    print(f"使用已有PDF: {path.name} ({pages} 页, {path.stat().st_size / 1024 / 1024:.1f} MB)")
+    return path, pages
+
+def run_engine(engine, pdf_path, pages, options):
+    """在独立子进程中运行引擎，返回其测量结果"""
+    env = dict(os.environ)
+    # OCR进程池的工作进程也要能导入PDF模块
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [str(PDF_MODULE_DIR), env.get('PYTHONPATH')])
+    )
+
+    command = [
+        sys.executable, str(Path(__file__).resolve()),
+        '--run-one', engine, '--pdf', str(pdf_path), '--pages', str(pages),
+        '--workers', str(options['workers']), '--dpi', str(options['dpi']),
+        '--ocr', options['ocr'], '--input-mode', options['input_mode']
+    ]
+    if options['verbose']:
+        command.append('--verbose')
+
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    if options['verbose']:
+        sys.stderr.write(completed.stderr)
+
+    if completed.returncode != 0 or not completed.stdout.strip():
+        return {
+            'engine': engine,
+            'pages': pages,
+            'success': False,
+            'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else '无输出'
+        }
+
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    与基线对比
+
+    Args:
+        results: 本次结果 {引擎: 测量结果}
+        baseline: 基线结果 {引擎: 测量结果}
+        tolerance: 允许的相对波动（如0.15表示15%）
+
+    Returns:
+        dict: {引擎: 对比结果}
+    """
+    comparison = {}
+
+    for engine, current in results.items():
+        base = baseline.get(engine)
+        if not base or not current.get('success') or not base.get('pages_per_sec'):
+            continue
+
+        speed_ratio = current['pages_per_sec'] / base['pages_per_sec']
+        rss_ratio = current['peak_rss_mb'] / base['peak_rss_mb'] if base.get('peak_rss_mb') else 1.0
+
+        comparison[engine] = {
+            'baseline_pages_per_sec': base['pages_per_sec'],
+            'speed_ratio': round(speed_ratio, 3),
+            'baseline_peak_rss_mb': base.get('peak_rss_mb'),
+            'rss_ratio': round(rss_ratio, 3),
+            'regression': speed_ratio < 1 - tolerance or rss_ratio > 1 + tolerance
+        }
+
+    return comparison
+
+def print_report(results, comparison):
+    """打印结果表格"""
+    print("\n" + "=" * 86)
+    print(f" {'引擎':<18}{'页数':>8}{'耗时(秒)':>12}{'页/秒':>12}{'峰值内存(MB)':>16}{'对比基线':>14}")
+    print("=" * 86)
+
+    for engine, result in results.items():
+        if not result.get('success'):
+            print(f" {engine:<18}{result['pages']:>8}   失败: {result.get('error', '未知错误')}")
+            continue
+
+        versus = ''
+        if engine in comparison:
+            item = comparison[engine]
+            versus = f"{item['speed_ratio']:.2f}x" + (' ⚠️' if item['regression'] else '')
+
+        print(f" {engine:<18}{result['pages']:>8}{result['wall_time']:>12.3f}"
+              f"{result['pages_per_sec']:>12.1f}{result['peak_rss_mb']:>16.1f}{versus:>14}")
+
+    print("=" * 86)
+
+def main():
+    """命令行接口"""
+    parser = argparse.ArgumentParser(description='PDF处理流程基准测试')
+    parser.add_argument('--engines', type=str, default=','.join(ENGINES),
+                        help=f"要运行的引擎，逗号分隔 (默认: {','.join(ENGINES)})")
+    parser.add_argument('--pages', type=int, default=500,
+                        help='文本PDF页数 (默认: 500)')
+    parser.add_argument('--ocr-pages', type=int, default=40,
+                        help='纯图像PDF页数 (默认: 40)')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                        help='OCR/索引工作进程数 (默认: 1)')
+    parser.add_argument('--dpi', type=int, default=200,
+                        help='OCR分辨率 (默认: 200)')
+    parser.add_argument('--ocr', choices=['stub', 'tesseract'], default='stub',
+                        help='OCR后端：stub为进程内替身，tesseract使用本机安装 (默认: stub)')
+    parser.add_argument('--input-mode', choices=INPUT_MODES + ('both',), default='mmap',
+                        help='输入读取方式：mmap (共享内存映射)、file (普通文件)、both (两种都运行，'
+                             'file的结果记为 引擎[file]) (默认: mmap)')
+    parser.add_argument('--text-pdf', type=str, default=None,
+                        help='使用已有的文本PDF代替合成PDF（如多GB的真实文件）')
+    parser.add_argument('--image-pdf', type=str, default=None,
+                        help='使用已有的纯图像PDF代替合成PDF')
+    parser.add_argument('--output', '-o', type=str, default=str(RESULTS_DIR / 'latest.json'),
+                        help='结果JSON路径')
+    parser.add_argument('--baseline', type=str, default=str(RESULTS_DIR / 'baseline.json'),
+                        help='基线JSON路径')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='把本次结果保存为基线')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='判定性能回退的相对阈值 (默认: 0.15)')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='出现性能回退时返回非零退出码')
+    parser.add_argument('--verbose', '-v', action='store_true',
+                        help='显示引擎日志')
+
+    # 内部参数：子进程中运行单个引擎
+    parser.add_argument('--run-one', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--pdf', type=str, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+    options = {'workers': args.workers, 'dpi': args.dpi, 'ocr': args.ocr, 'verbose': args.verbose,
+               'input_mode': args.input_mode}
+
+    if args.run_one:
+        print(json.dumps(run_one(args.run_one, args.pdf, args.pages, options)))
+        return 0
+
+    engines = [engine.strip() for engine in args.engines.split(',') if engine.strip()]
+    unknown = [engine for engine in engines if engine not in ENGINES]
+    if unknown:
+        parser.error(f"未知引擎: {', '.join(unknown)}")
+
+    sys.path.insert(0, str(BENCHMARK_DIR))
+    from synthetic_pdf import make_pdf
+
+    input_modes = INPUT_MODES if args.input_mode == 'both' else (args.input_mode,)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='bench_pdf_') as temp_dir:
+        inputs = {}
+        if any(ENGINES[engine] == 'text' for engine in engines):
+            inputs['text'] = (_existing_pdf(args.text_pdf) if args.text_pdf
+                              else (make_pdf(Path(temp_dir) / 'text.pdf', args.pages), args.pages))
+        if any(ENGINES[engine] == 'image' for engine in engines):
+            inputs['image'] = (_existing_pdf(args.image_pdf) if args.image_pdf
+                               else (make_pdf(Path(temp_dir) / 'image.pdf', args.ocr_pages, image_only=True),
+                                     args.ocr_pages))
+
+        for engine in engines:
+            pdf_path, pages = inputs[ENGINES[engine]]
+            for input_mode in input_modes:
+                # 默认的mmap结果沿用引擎名作为键，与基线保持可比
+                key = engine if input_mode == 'mmap' else f"{engine}[{input_mode}]"
+                print(f"运行 {key} ({pages} 页)...", flush=True)
+                results[key] = run_engine(engine, pdf_path, pages, {**options, 'input_mode': input_mode})
+
+    baseline_path = Path(args.baseline)
+    comparison = {}
+    if baseline_path.exists() and not args.save_baseline:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        comparison = compare_with_baseline(results, baseline, args.tolerance)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {
+            'pages': args.pages,
+            'ocr_pages': args.ocr_pages,
+            'workers': args.workers,
+            'dpi': args.dpi,
+            'ocr': args.ocr,
+            'input_mode': args.input_mode,
+            'text_pdf': args.text_pdf,
+            'image_pdf': args.image_pdf
+        },
+        'results': results,
+        'comparison': comparison
+    }
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"已保存基线: {baseline_path}")
+
+    print_report(results, comparison)
+    print(f"结果: {output_path}")
+
+    regressions = [engine for engine, item in comparison.items() if item['regression']]
+    if regressions:
+        print(f"⚠️  性能回退: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            return 1
+
+    failed = [engine for engine, result in results.items() if not result.get('success')]
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+合成PDF生成器 - 基准测试用
+直接写出PDF字节，不依赖reportlab等库；可生成文本PDF和纯图像（扫描件）PDF
+"""
+
+import argparse
+import zlib
+from pathlib import Path
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+
+BODY_LINES = [
+    "This is body text on page {page}, with several ordinary sentences.",
+    "More text follows here and there, long enough to look like a paragraph.",
+    "The quick brown fox jumps over the lazy dog while the benchmark runs.",
+    "Last line of the paragraph on page {page}.",
+]
+
+def _escape(text):
+    """转义PDF字符串中的特殊字符"""
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def _text_page_lines(page_num, chapter_every):
+    """文本页面内容：每chapter_every页以章节标题开头"""
+    lines = []
+    if chapter_every and page_num % chapter_every == 0:
+        lines.append(f"Chapter {page_num // chapter_every + 1}")
+    for _ in range(6):
+        lines.extend(line.format(page=page_num + 1) for line in BODY_LINES)
+    return lines
+
+def _scan_image(page_num, width, height):
+    """模拟扫描页面的灰度图像数据（白底、几行深色"文字"）"""
+    rows = []
+    for y in range(height):
+        if (y + page_num) % 12 < 3 and 8 < y < height - 8:
+            row = bytes(40 if (x // 3 + y) % 4 else 255 for x in range(width))
+        else:
+            row = bytes([235 + (x * y + page_num) % 20 for x in range(width)])
+        rows.append(row)
+    return b''.join(rows)
+
+def make_pdf(path, num_pages, image_only=False, chapter_every=20, image_size=(425, 550)):
+    """
+    生成合成PDF
+
+    Args:
+        path: 输出路径
+        num_pages: 页数
+        image_only: True时每页只有一张图像（模拟扫描件）
+        chapter_every: 文本PDF中每隔多少页出现一个章节标题
+        image_size: 扫描图像的像素尺寸
+
+    Returns:
+        Path: 输出路径
+    """
+    objects = []
+
+    def add(data):
+        objects.append(data)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")  # 占位，最后填写页面树
+    kids = []
+
+    for page_num in range(num_pages):
+        if image_only:
+            width, height = image_size
+            data = zlib.compress(_scan_image(page_num, width, height))
+            image_id = add(
+                b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                b"/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>\nstream\n" % (width, height, len(data))
+                + data + b"\nendstream"
+            )
+            content = b"q %d 0 0 %d 0 0 cm /Im0 Do Q" % (PAGE_WIDTH, PAGE_HEIGHT)
+            resources = b"<< /XObject << /Im0 %d 0 R >> >>" % image_id
+        else:
+            lines = _text_page_lines(page_num, chapter_every)
+            content = b"BT /F1 11 Tf 72 720 Td 14 TL " + b" ".join(
+                b"(" + _escape(line).encode('latin-1') + b") Tj T*" for line in lines
+            ) + b" ET"
+            resources = b"<< /Font << /F1 %d 0 R >> >>" % font_id
+
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources %s /Contents %d 0 R >>"
+            % (pages_id, PAGE_WIDTH, PAGE_HEIGHT, resources, content_id)
+        ))
+
+    objects[pages_id - 1] = (
+        b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % kid for kid in kids)
+        + b"] /Count %d >>" % len(kids)
+    )
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for object_id, data in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % object_id + data + b"\nendobj\n"
+
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog_id, xref_offset
+    )
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(bytes(output))
+    return path
+
+def main():
+    """命令行接口"""
+    parser = argparse.ArgumentParser(description='生成基准测试用的合成PDF')
+    parser.add_argument('output', type=str, help='输出PDF路径')
+    parser.add_argument('--pages', '-p', type=int, default=200, help='页数 (默认: 200)')
+    parser.add_argument('--image-only', action='store_true', help='生成纯图像（扫描件）PDF')
+    parser.add_argument('--chapter-every', type=int, default=20, help='章节标题间隔页数 (默认: 20)')
+
+    args = parser.parse_args()
+    path = make_pdf(args.output, args.pages, args.image_only, args.chapter_every)
+    print(f"已生成: {path} ({args.pages} 页, {path.stat().st_size / 1024:.1f} KB)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
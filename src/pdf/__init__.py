@@ -29,6 +29,9 @@ try:
     # 批量处理器
     from .pdf_batch_processor import main as batch_processor_main
     
+    # 共享文档句柄
+    from .pdf_document import PDFDocument
+    
     __all__ = [
         'splitter_v1_main',
         'splitter_v2_main', 
@@ -36,7 +39,8 @@ try:
         'PDFOCR',
         'PDFOCRProcessor',
         'PDFChapterDetector',
-        'batch_processor_main'
+        'batch_processor_main',
+        'PDFDocument'
     ]
 except ImportError as e:
     print(f"导入PDF模块时出错: {e}")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+自适应OCR分辨率 - 性能优化
+先用低分辨率缩略图判断空白页（跳过OCR）并估计文字行高，
+再选出能让文字达到目标像素高度的最低DPI；识别置信度不足时逐级提高DPI
+"""
+
+import logging
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 缩略图分辨率：72 DPI时1像素正好是1磅
+THUMBNAIL_DPI = 72
+
+# 可选的OCR分辨率（从低到高）
+DPI_LADDER = (150, 200, 250, 300)
+
+# 文字行（从上伸部到下伸部）的目标像素高度：约等于10磅正文在250 DPI下的行高
+TARGET_LINE_HEIGHT_PX = 24
+
+# 平均词置信度（0-100）低于该值时提高一级DPI重试
+DEFAULT_MIN_CONFIDENCE = 70
+
+# 墨迹像素占比低于该值视为空白页
+BLANK_INK_RATIO = 0.001
+
+# 比背景亮度暗该比例以上的像素算作墨迹
+INK_CONTRAST = 0.6
+
+# 超过该高度（磅）的墨迹行段视为图片而不是文字行
+MAX_LINE_HEIGHT_PT = 72
+
+def analyze_thumbnail(image, dpi=THUMBNAIL_DPI):
+    """
+    分析页面缩略图：是否空白、墨迹占比、文字行高
+
+    行高取水平投影中连续有墨迹的行段高度的中位数。
+
+    Args:
+        image: 缩略图（PIL Image）
+        dpi: 缩略图分辨率
+
+    Returns:
+        dict: blank、ink_ratio、line_height_pt（找不到文字行时为None）
+    """
+    import numpy as np
+
+    gray = image if image.mode == 'L' else image.convert('L')
+    array = np.asarray(gray)
+    if array.size == 0:
+        return {'blank': True, 'ink_ratio': 0.0, 'line_height_pt': None}
+
+    background = float(np.median(array))
+    ink = array < background * INK_CONTRAST
+    ink_ratio = float(ink.mean())
+
+    if ink_ratio < BLANK_INK_RATIO:
+        return {'blank': True, 'ink_ratio': round(ink_ratio, 5), 'line_height_pt': None}
+
+    # 水平投影：墨迹像素超过页宽0.5%的行算作文字行的一部分
+    row_ink = ink.sum(axis=1) > max(2, ink.shape[1] // 200)
+    heights = _run_lengths(row_ink)
+    max_height = MAX_LINE_HEIGHT_PT * dpi / 72
+    heights = [height for height in heights if 1 < height <= max_height]
+
+    line_height_pt = None
+    if heights:
+        line_height_pt = round(float(np.median(heights)) * 72 / dpi, 1)
+
+    return {'blank': False, 'ink_ratio': round(ink_ratio, 5), 'line_height_pt': line_height_pt}
+
+def choose_dpi(line_height_pt, ladder=DPI_LADDER, target_px=TARGET_LINE_HEIGHT_PX):
+    """
+    选择让文字行达到目标像素高度的最低DPI
+
+    Args:
+        line_height_pt: 估计的文字行高（磅），None表示未知（如整页图片）
+        ladder: 可选DPI（从低到高）
+        target_px: 目标行高（像素）
+
+    Returns:
+        int: DPI
+    """
+    if not line_height_pt:
+        return ladder[0]
+
+    needed = target_px * 72 / line_height_pt
+    for dpi in ladder:
+        if dpi >= needed:
+            return dpi
+    return ladder[-1]
+
+def next_dpi(dpi, ladder=DPI_LADDER):
+    """比dpi高一级的分辨率，已是最高时返回None"""
+    for candidate in ladder:
+        if candidate > dpi:
+            return candidate
+    return None
+
+def _run_lengths(mask):
+    """一维布尔数组中连续True段的长度"""
+    import numpy as np
+
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return (edges[1::2] - edges[::2]).tolist()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+批量处理清单 - 性能优化
+记录每个已处理文件的 (大小, 修改时间, SHA-256, 处理参数哈希) 和输出文件，
+再次处理同一目录时未变化的文件只需一次stat就能跳过；
+只有大小或修改时间变化时才计算内容哈希（例如文件被touch或重新复制）。
+记录的哈希在处理前计算，处理期间文件被替换时下次运行会发现内容变化。
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+
+from pdf_checkpoint import atomic_open
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+MANIFEST_FILE_NAME = '.batch_manifest.json'
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """分块计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class BatchManifest:
+    """
+    批量处理清单（保存在输出目录中）
+
+    entries: 输入文件名 -> {
+        'size', 'mtime_ns', 'sha256', 'options_hash',
+        'output_subdir', 'outputs'（相对输出目录的路径）, 'chapters_created', 'processed_at'
+    }
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / MANIFEST_FILE_NAME
+        self.entries = {}
+        # 本次运行中已计算的内容哈希：(文件名, 大小, 修改时间) -> SHA-256
+        self._digests = {}
+
+    def load(self):
+        """加载已有清单（不存在、版本不符或损坏时为空清单）"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return self
+        except (OSError, ValueError) as e:
+            logger.warning(f"批量处理清单损坏，重新处理所有文件: {e}")
+            return self
+
+        if data.get('version') != MANIFEST_VERSION:
+            logger.info("批量处理清单版本不符，重新处理所有文件")
+            return self
+
+        self.entries = data.get('entries', {})
+        return self
+
+    def save(self):
+        """原子写入清单"""
+        with atomic_open(self.path, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'entries': self.entries}, f,
+                      indent=2, ensure_ascii=False)
+
+    def is_unchanged(self, pdf_file, options_hash, stat=None):
+        """
+        文件自上次处理后是否未变化（且用相同参数处理过、输出仍然存在）
+
+        大小和修改时间与清单一致时直接判定未变化；不一致时计算SHA-256，
+        内容相同则更新清单中的大小和修改时间并判定未变化。
+
+        Args:
+            pdf_file: 输入文件路径
+            options_hash: 处理参数哈希
+            stat: 已取得的os.stat结果（可选）
+        """
+        entry = self.entries.get(Path(pdf_file).name)
+        if entry is None or entry.get('options_hash') != options_hash:
+            return False
+        if not all((self.output_dir / output).exists() for output in entry.get('outputs', [])):
+            return False
+
+        stat = stat or os.stat(pdf_file)
+        if stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+
+        if self.content_hash(pdf_file, stat) != entry['sha256']:
+            return False
+
+        logger.debug(f"内容未变化（仅修改时间变化）: {Path(pdf_file).name}")
+        entry['size'] = stat.st_size
+        entry['mtime_ns'] = stat.st_mtime_ns
+        return True
+
+    def content_hash(self, pdf_file, stat=None):
+        """
+        文件内容的SHA-256（同一次运行中大小和修改时间不变时只计算一次）
+
+        Args:
+            pdf_file: 输入文件路径
+            stat: 已取得的os.stat结果（可选）
+        """
+        stat = stat or os.stat(pdf_file)
+        key = (Path(pdf_file).name, stat.st_size, stat.st_mtime_ns)
+        if key not in self._digests:
+            self._digests[key] = file_sha256(pdf_file)
+        return self._digests[key]
+
+    def previous_outputs(self, pdf_file):
+        """清单中记录的上次输出文件（重新处理前清理旧输出用）"""
+        entry = self.entries.get(Path(pdf_file).name)
+        return [self.output_dir / output for output in entry.get('outputs', [])] if entry else []
+
+    def record(self, pdf_file, stat, sha256, options_hash, file_output_dir, result):
+        """
+        记录一次成功的处理
+
+        stat和sha256都必须在处理前取得：处理期间文件被替换时，下次运行的stat不同，
+        重新计算的哈希与记录的旧内容哈希也不同，文件会被重新处理。
+
+        Args:
+            pdf_file: 输入文件路径
+            stat: 处理前取得的os.stat结果
+            sha256: 处理前计算的内容哈希（见content_hash）
+            options_hash: 处理参数哈希
+            file_output_dir: 该文件的输出目录
+            result: 处理结果
+        """
+        file_output_dir = Path(file_output_dir)
+        outputs = sorted(
+            str(path.relative_to(self.output_dir))
+            for path in file_output_dir.rglob('*') if path.is_file()
+        )
+        self.entries[Path(pdf_file).name] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256,
+            'options_hash': options_hash,
+            'output_subdir': str(file_output_dir.relative_to(self.output_dir)),
+            'outputs': outputs,
+            'chapters_created': result.get('chapters_created', 0),
+            'processed_at': datetime.now().isoformat()
+        }
+
+    def forget_missing(self, present_names):
+        """删除输入目录中已不存在的文件的记录"""
+        for name in list(self.entries):
+            if name not in present_names:
+                del self.entries[name]
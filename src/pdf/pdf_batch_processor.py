@@ -8,6 +8,7 @@ import os
 import sys
 import logging
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional
@@ -32,13 +33,19 @@ class PDFBatchProcessor:
         logger.info(f"初始化批量处理器")
         logger.info(f"基础输出目录: {self.base_output_dir}")
     
-    def process_directory(self, input_dir, output_subdir=None, **process_kwargs):
+    def process_directory(self, input_dir, output_subdir=None, max_workers=1, force=False,
+                          **process_kwargs):
         """
         处理目录中的所有PDF文件
         
+        输出目录中的清单（pdf_batch_manifest.BatchManifest）记录已处理文件的
+        大小、修改时间、内容哈希和处理参数，未变化的文件直接跳过。
+        
         Args:
             input_dir: 输入目录路径
             output_subdir: 输出子目录（如为None则使用输入目录名）
+            max_workers: 同时处理的文件数（>1时使用进程池，每个进程复用一个拆分器）
+            force: 忽略清单，重新处理所有文件
             **process_kwargs: 传递给单个文件处理的参数
             
         Returns:
@@ -79,78 +86,88 @@ class PDFBatchProcessor:
             'total_files': len(pdf_files),
             'successful': 0,
             'failed': 0,
+            'processed': 0,
+            'skipped': 0,
             'start_time': datetime.now().isoformat(),
             'file_results': []
         }
         
-        for i, pdf_file in enumerate(pdf_files):
-            file_start_time = time.time()
+        splitter_options = _splitter_options(process_kwargs)
+        split_options = {
+            'force_ocr': process_kwargs.get('force_ocr', False),
+            'use_smart_detection': process_kwargs.get('use_smart_detection', True)
+        }
+        
+        # 清单：未变化的文件（相同参数、输出仍在）只需一次stat就跳过
+        from pdf_batch_manifest import BatchManifest
+        manifest = BatchManifest(output_dir).load()
+        options_hash = _options_hash(splitter_options, split_options)
+        manifest.forget_missing({pdf_file.name for pdf_file in pdf_files})
+        
+        # 为每个需要处理的文件创建单独的输出子目录
+        tasks = []
+        file_stats = {}
+        file_digests = {}
+        for pdf_file in pdf_files:
+            stat = pdf_file.stat()
+            if not force and manifest.is_unchanged(pdf_file, options_hash, stat):
+                entry = manifest.entries[pdf_file.name]
+                logger.info(f"⏭️  跳过未变化的文件: {pdf_file.name}")
+                results['skipped'] += 1
+                results['successful'] += 1
+                results['file_results'].append({
+                    'file': str(pdf_file),
+                    'success': True,
+                    'skipped': True,
+                    'chapters_created': entry.get('chapters_created', 0),
+                    'output_subdir': str((output_dir / entry['output_subdir']).relative_to(self.base_output_dir))
+                })
+                continue
             
-            logger.info(f"\n处理文件 {i+1}/{len(pdf_files)}: {pdf_file.name}")
-            logger.info(f"文件大小: {pdf_file.stat().st_size / 1024 / 1024:.2f} MB")
+            # 清理上次处理留下的旧输出（文件变化后章节数可能减少）
+            for previous_output in manifest.previous_outputs(pdf_file):
+                if previous_output.exists():
+                    previous_output.unlink()
             
-            # 为每个文件创建单独的输出子目录
             file_output_dir = output_dir / pdf_file.stem
             file_output_dir.mkdir(exist_ok=True)
-            
-            try:
-                # 导入并调用最终版本工具
-                from pdf_chapter_splitter_final import PDFSplitterFinal
-                
-                # 创建拆分器（使用默认参数或传入的参数）
-                splitter = PDFSplitterFinal(
-                    pages_per_chapter=process_kwargs.get('pages_per_chapter', 20),
-                    use_ocr=process_kwargs.get('use_ocr', False),
-                    ocr_lang=process_kwargs.get('ocr_lang', 'eng+chi_sim'),
-                    enable_preprocessing=process_kwargs.get('enable_preprocessing', True),
-                    dpi=process_kwargs.get('dpi', 200)
-                )
-                
-                # 处理文件
-                result = splitter.smart_process_pdf(
-                    pdf_file,
-                    file_output_dir,
-                    force_ocr=process_kwargs.get('force_ocr', False),
-                    use_smart_detection=process_kwargs.get('use_smart_detection', True)
-                )
-                
-                file_processing_time = time.time() - file_start_time
-                
-                if result.get('success', False):
-                    results['successful'] += 1
-                    logger.info(f"✅ 处理成功: {pdf_file.name}")
-                    logger.info(f"   处理时间: {file_processing_time:.1f} 秒")
-                    logger.info(f"   生成章节: {result.get('chapters_created', 0)}")
-                    
-                    result['file'] = str(pdf_file)
-                    result['processing_time'] = file_processing_time
-                    result['output_subdir'] = str(file_output_dir.relative_to(self.base_output_dir))
-                    results['file_results'].append(result)
-                    
-                else:
-                    results['failed'] += 1
-                    logger.error(f"❌ 处理失败: {pdf_file.name}")
-                    logger.error(f"   错误: {result.get('error', '未知错误')}")
-                    
-                    results['file_results'].append({
-                        'file': str(pdf_file),
-                        'success': False,
-                        'error': result.get('error', '未知错误'),
-                        'processing_time': file_processing_time
-                    })
-            
-            except Exception as e:
+            tasks.append((pdf_file, file_output_dir))
+            file_stats[pdf_file] = stat
+            # 清单记录的内容哈希在处理前计算（与stat对应同一份内容）
+            file_digests[pdf_file] = manifest.content_hash(pdf_file, stat)
+        
+        if results['skipped']:
+            logger.info(f"清单: {results['skipped']} 个文件未变化, {len(tasks)} 个需要处理")
+        
+        max_workers = max(1, min(max_workers or 1, len(tasks)))
+        results['max_workers'] = max_workers
+        
+        if not tasks:
+            file_results = []
+        elif max_workers == 1:
+            file_results = self._process_serial(tasks, splitter_options, split_options)
+        else:
+            file_results = self._process_parallel(tasks, splitter_options, split_options, max_workers)
+        
+        for (pdf_file, file_output_dir), result in zip(tasks, file_results):
+            results['processed'] += 1
+            if result.get('success', False):
+                results['successful'] += 1
+                result['output_subdir'] = str(file_output_dir.relative_to(self.base_output_dir))
+                results['file_results'].append(result)
+                manifest.record(pdf_file, file_stats[pdf_file], file_digests[pdf_file], options_hash,
+                                file_output_dir, result)
+            else:
                 results['failed'] += 1
-                logger.error(f"❌ 处理异常: {pdf_file.name}")
-                logger.error(f"   异常: {e}")
-                
                 results['file_results'].append({
                     'file': str(pdf_file),
                     'success': False,
-                    'error': str(e),
-                    'processing_time': time.time() - file_start_time
+                    'error': result.get('error', '未知错误'),
+                    'processing_time': result.get('processing_time', 0)
                 })
         
+        manifest.save()
+        
         # 生成汇总报告
         results['end_time'] = datetime.now().isoformat()
         total_time = datetime.fromisoformat(results['end_time']) - datetime.fromisoformat(results['start_time'])
@@ -166,12 +183,99 @@ class PDFBatchProcessor:
         logger.info(f"   总文件: {results['total_files']}")
         logger.info(f"   成功: {results['successful']}")
         logger.info(f"   失败: {results['failed']}")
+        logger.info(f"   处理: {results['processed']}, 跳过（未变化）: {results['skipped']}")
         logger.info(f"   总时间: {results['total_processing_time']:.1f} 秒")
         logger.info(f"   报告文件: {report_file}")
         
         results['success'] = results['failed'] == 0
         return results
     
+    def _process_serial(self, tasks, splitter_options, split_options):
+        """在当前进程中依次处理文件，所有文件共用一个拆分器"""
+        from pdf_chapter_splitter_final import PDFSplitterFinal
+        
+        splitter = PDFSplitterFinal(**splitter_options)
+        file_results = []
+        
+        for i, (pdf_file, file_output_dir) in enumerate(tasks):
+            logger.info(f"\n处理文件 {i+1}/{len(tasks)}: {pdf_file.name}")
+            logger.info(f"文件大小: {pdf_file.stat().st_size / 1024 / 1024:.2f} MB")
+            
+            result = _process_one_file(splitter, pdf_file, file_output_dir, split_options)
+            _log_file_result(pdf_file, result)
+            file_results.append(result)
+        
+        return file_results
+    
+    def _process_parallel(self, tasks, splitter_options, split_options, max_workers):
+        """
+        使用进程池并发处理文件
+        
+        每个工作进程只创建一次拆分器（导入检测器和OCR模块、检查依赖），
+        同时最多处理max_workers个文件，结果按输入顺序返回。
+        """
+        logger.info(f"并发处理: 最多 {max_workers} 个文件同时处理")
+        
+        file_results = [None] * len(tasks)
+        
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_batch_worker,
+            initargs=(splitter_options,)
+        ) as executor:
+            futures = {
+                executor.submit(_process_file_in_worker, str(pdf_file), str(file_output_dir), split_options): i
+                for i, (pdf_file, file_output_dir) in enumerate(tasks)
+            }
+            
+            for completed, future in enumerate(as_completed(futures), 1):
+                index = futures[future]
+                pdf_file = tasks[index][0]
+                
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'file': str(pdf_file), 'success': False, 'error': str(e), 'processing_time': 0}
+                
+                logger.info(f"\n完成文件 {completed}/{len(tasks)}: {pdf_file.name}")
+                _log_file_result(pdf_file, result)
+                file_results[index] = result
+        
+        return file_results
+    
+    def watch_directory(self, inbox_dir, outbox_dir=None, max_workers=1, poll_interval=2.0,
+                        settle_seconds=2.0, use_watchdog=True, **process_kwargs):
+        """
+        常驻监视收件箱目录，持续处理新投放或内容变化的PDF
+        
+        拆分器或工作进程池只初始化一次，按内容哈希去重，
+        完整结果移到发件箱（见pdf_batch_watcher.PDFInboxWatcher）。
+        
+        Args:
+            inbox_dir: 收件箱目录
+            outbox_dir: 发件箱目录（默认为基础输出目录）
+            max_workers: 同时处理的文件数
+            poll_interval: 轮询间隔（秒）
+            settle_seconds: 文件保持不变多久后视为投放完成
+            use_watchdog: 可用时使用watchdog监听文件系统事件
+            **process_kwargs: 处理参数
+            
+        Returns:
+            Dict: 处理、重复、失败的文件数
+        """
+        from pdf_batch_watcher import PDFInboxWatcher
+        
+        watcher = PDFInboxWatcher(
+            inbox_dir,
+            outbox_dir or self.base_output_dir,
+            max_workers=max_workers,
+            poll_interval=poll_interval,
+            settle_seconds=settle_seconds,
+            use_watchdog=use_watchdog,
+            **process_kwargs
+        )
+        return watcher.run()
+    
     def process_file_list(self, file_list, output_subdir='file_list', **process_kwargs):
         """
         处理文件列表
@@ -215,6 +319,68 @@ class PDFBatchProcessor:
         # 调用目录处理方法
         return self.process_directory(temp_dir, output_subdir, **process_kwargs)
 
+def _splitter_options(process_kwargs):
+    """从处理参数中提取PDFSplitterFinal的构造参数"""
+    return {
+        'pages_per_chapter': process_kwargs.get('pages_per_chapter', 20),
+        'use_ocr': process_kwargs.get('use_ocr', False),
+        'ocr_lang': process_kwargs.get('ocr_lang', 'eng+chi_sim'),
+        'enable_preprocessing': process_kwargs.get('enable_preprocessing', True),
+        'dpi': process_kwargs.get('dpi', 200),
+        'ocr_backend': process_kwargs.get('ocr_backend', 'auto'),
+        'split_engine': process_kwargs.get('split_engine', 'pypdf2'),
+        'max_memory': process_kwargs.get('max_memory'),
+        'chapter_strategy': process_kwargs.get('chapter_strategy', 'greedy')
+    }
+
+def _options_hash(*options):
+    """处理参数的哈希（参数变化时已处理过的文件需要重新处理）"""
+    import hashlib
+    import json
+    encoded = json.dumps(options, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+def _process_one_file(splitter, pdf_file, file_output_dir, split_options):
+    """用给定拆分器处理单个文件，记录处理时间"""
+    file_start_time = time.time()
+    
+    try:
+        result = splitter.smart_process_pdf(
+            pdf_file,
+            file_output_dir,
+            force_ocr=split_options['force_ocr'],
+            use_smart_detection=split_options['use_smart_detection']
+        )
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+    
+    result['file'] = str(pdf_file)
+    result['processing_time'] = time.time() - file_start_time
+    return result
+
+def _log_file_result(pdf_file, result):
+    """记录单个文件的处理结果"""
+    if result.get('success', False):
+        logger.info(f"✅ 处理成功: {pdf_file.name}")
+        logger.info(f"   处理时间: {result.get('processing_time', 0):.1f} 秒")
+        logger.info(f"   生成章节: {result.get('chapters_created', 0)}")
+    else:
+        logger.error(f"❌ 处理失败: {pdf_file.name}")
+        logger.error(f"   错误: {result.get('error', '未知错误')}")
+
+# 工作进程内的拆分器（每个进程初始化一次）
+_worker_splitter = None
+
+def _init_batch_worker(splitter_options):
+    """进程池初始化：每个工作进程创建一个PDFSplitterFinal"""
+    global _worker_splitter
+    from pdf_chapter_splitter_final import PDFSplitterFinal
+    _worker_splitter = PDFSplitterFinal(**splitter_options)
+
+def _process_file_in_worker(pdf_file, file_output_dir, split_options):
+    """在工作进程中处理单个文件"""
+    return _process_one_file(_worker_splitter, Path(pdf_file), Path(file_output_dir), split_options)
+
 def test_batch_processing():
     """测试批量处理功能"""
     print("🧪 测试批量处理功能")
@@ -268,6 +434,9 @@ def test_batch_processing():
 def main():
     """命令行接口"""
     import argparse
+    from pdf_memory import parse_size
+    from pdf_chapter_detector import STRATEGIES as CHAPTER_STRATEGIES
+    from pdf_split_engine import SPLIT_ENGINES
     
     parser = argparse.ArgumentParser(description='PDF批量处理器')
     
@@ -283,6 +452,29 @@ def main():
                        help='启用OCR功能')
     parser.add_argument('--smart', action='store_true',
                        help='启用智能章节检测')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                       help='同时处理的文件数 (默认: 1)')
+    parser.add_argument('--ocr-backend', type=str, default='auto',
+                       help='OCR后端: auto, tesserocr, pytesseract, stub[:latency_ms=N] (默认: auto)')
+    parser.add_argument('--split-engine', choices=SPLIT_ENGINES, default='pypdf2',
+                       help='章节写出方式: pypdf2, raw (直接复制对象字节), streaming (raw加内存上限), '
+                            'virtual (只输出页面范围索引) (默认: pypdf2)')
+    parser.add_argument('--max-memory', type=str, default=None,
+                       help='每个处理进程的常驻内存上限，如 512M（隐含 --split-engine streaming）')
+    parser.add_argument('--chapter-strategy', choices=CHAPTER_STRATEGIES, default='greedy',
+                       help='智能检测的章节边界选择: greedy, optimal (动态规划全局最优分段) (默认: greedy)')
+    parser.add_argument('--force', '-f', action='store_true',
+                       help='忽略批量处理清单，重新处理所有文件')
+    
+    # 常驻监视
+    parser.add_argument('--watch', action='store_true',
+                       help='常驻监视 --dir 收件箱，处理新投放的PDF，结果移到 --output 发件箱')
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                       help='监视模式的轮询间隔（秒，默认: 2）')
+    parser.add_argument('--settle', type=float, default=2.0,
+                       help='文件多久不再变化后开始处理（秒，默认: 2）')
+    parser.add_argument('--polling', action='store_true',
+                       help='监视模式下不使用watchdog，只轮询')
     
     # 其他功能
     parser.add_argument('--test', action='store_true',
@@ -294,6 +486,25 @@ def main():
         success = test_batch_processing()
         return 0 if success else 1
     
+    if args.dir and args.watch:
+        processor = PDFBatchProcessor(base_output_dir=args.output)
+        stats = processor.watch_directory(
+            args.dir,
+            max_workers=args.jobs,
+            poll_interval=args.poll_interval,
+            settle_seconds=args.settle,
+            use_watchdog=not args.polling,
+            pages_per_chapter=args.pages,
+            use_ocr=args.ocr,
+            use_smart_detection=args.smart,
+            ocr_backend=args.ocr_backend,
+            split_engine='streaming' if args.max_memory else args.split_engine,
+            max_memory=parse_size(args.max_memory) if args.max_memory else None,
+            chapter_strategy=args.chapter_strategy
+        )
+        print(f"\n监视结束: 处理 {stats['processed']}, 重复 {stats['duplicates']}, 失败 {stats['failed']}")
+        return 0
+    
     if args.dir:
         processor = PDFBatchProcessor(base_output_dir=args.output)
         
@@ -302,19 +513,29 @@ def main():
         logger.info(f"每章节页数: {args.pages}")
         logger.info(f"OCR模式: {'启用' if args.ocr else '禁用'}")
         logger.info(f"智能检测: {'启用' if args.smart else '禁用'}")
+        logger.info(f"并发文件数: {args.jobs}")
+        if args.ocr:
+            logger.info(f"OCR后端: {args.ocr_backend}")
         
         result = processor.process_directory(
             args.dir,
             output_subdir=None,  # 使用输入目录名
+            max_workers=args.jobs,
+            force=args.force,
             pages_per_chapter=args.pages,
             use_ocr=args.ocr,
-            use_smart_detection=args.smart
+            use_smart_detection=args.smart,
+            ocr_backend=args.ocr_backend,
+            split_engine='streaming' if args.max_memory else args.split_engine,
+            max_memory=parse_size(args.max_memory) if args.max_memory else None,
+            chapter_strategy=args.chapter_strategy
         )
         
         if result.get('success', False) or result.get('successful', 0) > 0:
             print(f"\n✅ 批量处理完成!")
             print(f"   成功文件: {result.get('successful', 0)}")
             print(f"   失败文件: {result.get('failed', 0)}")
+            print(f"   跳过未变化文件: {result.get('skipped', 0)}")
             print(f"   总时间: {result.get('total_processing_time', 0):.1f} 秒")
             print(f"   报告文件: {args.output}/batch_processing_report.json")
             return 0
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+PDF收件箱监视器 - 性能优化
+常驻进程持续处理投放到收件箱目录的PDF：拆分器（或工作进程池）只初始化一次，
+新文件稳定后立即处理，按内容哈希去重，完整的结果一次性移动到发件箱。
+文件系统事件使用watchdog（可选依赖），不可用时退回定时轮询。
+"""
+
+import json
+import logging
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from pdf_batch_manifest import file_sha256
+from pdf_checkpoint import atomic_open
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+WATCH_STATE_VERSION = 1
+
+# 发件箱中的特殊目录和文件
+WORK_DIR_NAME = '.work'
+FAILED_DIR_NAME = '_failed'
+DUPLICATES_DIR_NAME = '_duplicates'
+STATE_FILE_NAME = '.watch_state.json'
+LOG_FILE_NAME = 'watch_log.jsonl'
+
+class PDFInboxWatcher:
+    """
+    收件箱/发件箱模式的PDF处理守护进程
+
+    - 收件箱中大小和修改时间在settle_seconds内不再变化的PDF视为投放完成
+    - 内容哈希（加处理参数）已处理过的文件不再处理，移到发件箱的_duplicates
+    - 结果先写到发件箱的.work临时目录，完成后整体改名为 发件箱/<文件名>，
+      原PDF随结果一起移出收件箱；同名文件内容变化时新结果替换旧结果
+    - 处理失败的PDF移到发件箱的_failed
+    - 每个事件追加一行到发件箱的watch_log.jsonl（含端到端延迟）
+    """
+
+    def __init__(self, inbox_dir, outbox_dir, max_workers=1, poll_interval=2.0,
+                 settle_seconds=2.0, use_watchdog=True, **process_kwargs):
+        """
+        Args:
+            inbox_dir: 收件箱目录
+            outbox_dir: 发件箱目录
+            max_workers: 同时处理的文件数（>1时使用常驻进程池）
+            poll_interval: 轮询间隔（秒，使用watchdog时为兜底扫描间隔）
+            settle_seconds: 文件大小和修改时间保持不变多久后开始处理
+            use_watchdog: 可用时使用watchdog监听文件系统事件
+            **process_kwargs: 处理参数（同PDFBatchProcessor.process_directory）
+        """
+        from pdf_batch_processor import _options_hash, _splitter_options
+
+        self.inbox_dir = Path(inbox_dir)
+        self.outbox_dir = Path(outbox_dir)
+        self.max_workers = max(1, max_workers or 1)
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.use_watchdog = use_watchdog
+
+        self.splitter_options = _splitter_options(process_kwargs)
+        self.split_options = {
+            'force_ocr': process_kwargs.get('force_ocr', False),
+            'use_smart_detection': process_kwargs.get('use_smart_detection', True)
+        }
+        self.options_hash = _options_hash(self.splitter_options, self.split_options)
+
+        self.work_dir = self.outbox_dir / WORK_DIR_NAME
+        self.state_path = self.outbox_dir / STATE_FILE_NAME
+        self.log_path = self.outbox_dir / LOG_FILE_NAME
+        for directory in (self.inbox_dir, self.outbox_dir, self.work_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        self.state = self._load_state()
+        self.stats = {'processed': 0, 'duplicates': 0, 'failed': 0}
+
+        self._candidates = {}
+        self._in_flight = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._splitter = None
+        self._executor = None
+        self._observer = None
+
+    def start(self):
+        """创建常驻拆分器或进程池，启动文件系统监听"""
+        from pdf_batch_processor import _init_batch_worker
+
+        if self.max_workers > 1:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_batch_worker,
+                initargs=(self.splitter_options,)
+            )
+        else:
+            from pdf_chapter_splitter_final import PDFSplitterFinal
+            self._splitter = PDFSplitterFinal(**self.splitter_options)
+
+        if self.use_watchdog:
+            self._observer = self._start_observer()
+
+        mode = 'watchdog' if self._observer is not None else f'轮询 {self.poll_interval}s'
+        logger.info(f"👀 监视收件箱: {self.inbox_dir} ({mode})")
+        logger.info(f"   发件箱: {self.outbox_dir}")
+        logger.info(f"   并发文件数: {self.max_workers}")
+        return self
+
+    def stop(self):
+        """请求run()退出（可从信号处理或其他线程调用）"""
+        self._stop.set()
+        self._wake.set()
+
+    def close(self):
+        """停止监听，等待进行中的文件完成并关闭进程池"""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._executor is not None:
+            self.drain()
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def run(self):
+        """常驻运行直到stop()或Ctrl+C"""
+        with self:
+            try:
+                while not self._stop.is_set():
+                    self.poll()
+                    self._wake.wait(self._wait_timeout())
+                    self._wake.clear()
+            except KeyboardInterrupt:
+                logger.info("收到中断，等待进行中的文件完成...")
+        logger.info(f"监视结束: 处理 {self.stats['processed']}, 重复 {self.stats['duplicates']}, "
+                    f"失败 {self.stats['failed']}")
+        return self.stats
+
+    def poll(self):
+        """
+        扫描一次收件箱并处理已稳定的文件
+
+        串行模式下在当前线程中处理完才返回；进程池模式下只提交，
+        并收尾已完成的文件。
+
+        Returns:
+            int: 本次开始处理（或判定为重复）的文件数
+        """
+        self._collect_finished()
+
+        started = 0
+        for path in self._scan_ready():
+            if self._start(path):
+                started += 1
+
+        self._collect_finished()
+        return started
+
+    def drain(self, timeout=None):
+        """等待进程池中的文件全部完成（用于测试和退出前收尾）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._in_flight:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            self._collect_finished()
+        return True
+
+    def _wait_timeout(self):
+        """下次扫描前的等待时间：有未稳定的文件时按settle_seconds及早复查"""
+        if self._candidates:
+            return min(self.poll_interval, max(self.settle_seconds, 0.1))
+        return self.poll_interval
+
+    def _scan_ready(self):
+        """列出收件箱中投放完成（大小和修改时间已稳定）且未在处理的PDF"""
+        now = time.monotonic()
+        seen = set()
+        ready = []
+
+        for path in sorted(self.inbox_dir.glob('*.pdf')):
+            if path in self._in_flight:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+
+            seen.add(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            candidate = self._candidates.get(path)
+            if candidate is None or candidate['signature'] != signature:
+                self._candidates[path] = {
+                    'signature': signature,
+                    'stable_since': now,
+                    'first_seen': candidate['first_seen'] if candidate else time.time()
+                }
+                if self.settle_seconds > 0:
+                    continue
+            if now - self._candidates[path]['stable_since'] >= self.settle_seconds:
+                ready.append(path)
+
+        # 忘记已经消失的文件
+        for path in list(self._candidates):
+            if path not in seen and path not in self._in_flight:
+                del self._candidates[path]
+
+        return ready
+
+    def _start(self, path):
+        """开始处理一个文件（重复内容直接收尾）"""
+        from pdf_batch_processor import _process_one_file
+
+        candidate = self._candidates.pop(path)
+        try:
+            digest = file_sha256(path)
+        except OSError as e:
+            logger.warning(f"读取文件失败 {path.name}: {e}")
+            return False
+
+        key = f"{digest}:{self.options_hash}"
+        if any(job['key'] == key for job in self._in_flight.values()):
+            # 相同内容正在处理，完成后再按重复处理
+            self._candidates[path] = candidate
+            return False
+
+        previous = self.state['processed'].get(key)
+        if previous and (self.outbox_dir / previous['output_dir']).exists():
+            self._handle_duplicate(path, digest, previous, candidate['first_seen'])
+            return True
+
+        staging_dir = self.work_dir / f"{path.stem}-{digest[:12]}"
+        if staging_dir.exists():
+            shutil.rmtree(staging_dir)
+        staging_dir.mkdir(parents=True)
+
+        job = {
+            'digest': digest,
+            'key': key,
+            'staging_dir': staging_dir,
+            'first_seen': candidate['first_seen']
+        }
+        logger.info(f"📥 开始处理: {path.name}")
+
+        if self._executor is None:
+            self._in_flight[path] = job
+            result = _process_one_file(self._splitter, path, staging_dir, self.split_options)
+            self._finish(path, result)
+        else:
+            from pdf_batch_processor import _process_file_in_worker
+            job['future'] = self._executor.submit(
+                _process_file_in_worker, str(path), str(staging_dir), self.split_options
+            )
+            job['future'].add_done_callback(lambda _: self._wake.set())
+            self._in_flight[path] = job
+        return True
+
+    def _collect_finished(self):
+        """收尾进程池中已完成的文件"""
+        for path, job in list(self._in_flight.items()):
+            future = job.get('future')
+            if future is None or not future.done():
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'file': str(path), 'success': False, 'error': str(e)}
+            self._finish(path, result)
+
+    def _finish(self, path, result):
+        """把结果移到发件箱，原PDF移出收件箱，更新状态和日志"""
+        job = self._in_flight.pop(path)
+        staging_dir = job['staging_dir']
+        entry = {
+            'file': path.name,
+            'sha256': job['digest'],
+            'processing_time': round(result.get('processing_time', 0), 3)
+        }
+
+        if result.get('success', False):
+            output_dir = self.outbox_dir / path.stem
+            _move_replacing(path, staging_dir / path.name)
+            _replace_dir(staging_dir, output_dir)
+
+            # 同一输出目录之前对应的内容已被替换
+            self.state['processed'] = {
+                key: info for key, info in self.state['processed'].items()
+                if info['output_dir'] != output_dir.name
+            }
+            self.state['processed'][job['key']] = {
+                'file': path.name,
+                'output_dir': output_dir.name,
+                'processed_at': datetime.now().isoformat()
+            }
+            self._save_state()
+            self.stats['processed'] += 1
+            entry.update({'status': 'processed', 'output_dir': output_dir.name,
+                          'chapters_created': result.get('chapters_created', 0)})
+            logger.info(f"📤 处理完成: {path.name} -> {output_dir}")
+        else:
+            failed_dir = self.outbox_dir / FAILED_DIR_NAME
+            failed_dir.mkdir(exist_ok=True)
+            _move_replacing(path, failed_dir / path.name)
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            self.stats['failed'] += 1
+            entry.update({'status': 'failed', 'error': result.get('error', '未知错误')})
+            logger.error(f"❌ 处理失败: {path.name}: {entry['error']}")
+
+        self._log_event(entry, job['first_seen'])
+
+    def _handle_duplicate(self, path, digest, previous, first_seen):
+        """内容已处理过：不再处理，原PDF移到_duplicates"""
+        duplicates_dir = self.outbox_dir / DUPLICATES_DIR_NAME
+        duplicates_dir.mkdir(exist_ok=True)
+        _move_replacing(path, duplicates_dir / path.name)
+        self.stats['duplicates'] += 1
+        logger.info(f"⏭️  重复内容: {path.name} 与 {previous['file']} 相同，结果见 {previous['output_dir']}")
+        self._log_event({
+            'file': path.name,
+            'sha256': digest,
+            'status': 'duplicate',
+            'output_dir': previous['output_dir']
+        }, first_seen)
+
+    def _log_event(self, entry, first_seen):
+        """追加一行事件日志，latency为从发现文件到结果就绪的秒数"""
+        entry['time'] = datetime.now().isoformat()
+        entry['latency'] = round(time.time() - first_seen, 3)
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def _load_state(self):
+        """加载去重状态（版本不符或损坏时从空状态开始）"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') == WATCH_STATE_VERSION:
+                return state
+            logger.info("监视状态版本不符，重新开始")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"监视状态损坏，重新开始: {e}")
+        return {'version': WATCH_STATE_VERSION, 'processed': {}}
+
+    def _save_state(self):
+        with atomic_open(self.state_path, 'w') as f:
+            json.dump(self.state, f, indent=2, ensure_ascii=False)
+
+    def _start_observer(self):
+        """启动watchdog监听（未安装时返回None，退回轮询）"""
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.info("watchdog未安装，使用轮询监视收件箱")
+            return None
+
+        wake = self._wake
+
+        class _WakeHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+
+        observer = Observer()
+        observer.schedule(_WakeHandler(), str(self.inbox_dir), recursive=False)
+        observer.start()
+        return observer
+
+def _move_replacing(source, target):
+    """移动文件，目标已存在时覆盖"""
+    if target.exists():
+        target.unlink()
+    shutil.move(str(source), str(target))
+
+def _replace_dir(source, target):
+    """用source目录替换target目录（旧目录先改名让出位置，新目录就位后再删除）"""
+    old = None
+    if target.exists():
+        old = target.with_name(f".{target.name}.old")
+        if old.exists():
+            shutil.rmtree(old)
+        target.rename(old)
+    source.rename(target)
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
@@ -2,10 +2,14 @@
 """
 PDF章节检测器 - Sprint 3
 智能识别PDF中的章节边界
+边界选择策略（STRATEGIES）：
+  greedy  - 按置信度依次接受高置信度候选，末尾按最大章节页数补齐
+  optimal - 动态规划求全局最优分段（候选页奖励、章节长度惩罚），O(页数 x 最大章节页数)
 """
 
 import re
 import logging
+from bisect import bisect_right
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional
 
@@ -13,19 +17,39 @@ from typing import List, Dict, Tuple, Optional
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+STRATEGIES = ('greedy', 'optimal')
+
 class ChapterDetector:
     """章节检测器 - 智能识别章节边界"""
     
-    def __init__(self, min_chapter_pages=5, max_chapter_pages=50):
+    # 批量匹配时分隔各页标题区的字符（章节模式不会匹配它）
+    PAGE_SEPARATOR = '\x00'
+    
+    # optimal策略的评分参数：候选页置信度超过阈值的部分为奖励，
+    # 非候选页作边界（章节超长时被迫切分）的惩罚，章节短于最小页数的惩罚（按缺少的比例），
+    # 以及偏离理想长度的微小惩罚（只在其他条件相同时决定切分位置）
+    CANDIDATE_THRESHOLD = 0.65
+    FILLER_PENALTY = 1.0
+    SHORT_PENALTY = 2.0
+    BALANCE_WEIGHT = 0.01
+    
+    def __init__(self, min_chapter_pages=5, max_chapter_pages=50, title_lines=3, strategy='greedy'):
         """
         初始化章节检测器
         
         Args:
             min_chapter_pages: 最小章节页数
             max_chapter_pages: 最大章节页数
+            title_lines: 章节模式只在每页前几行中查找
+            strategy: 边界选择策略（'greedy' 或 'optimal'，见STRATEGIES）
         """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"未知的边界选择策略: {strategy}（可选: {', '.join(STRATEGIES)}）")
+        
         self.min_chapter_pages = min_chapter_pages
         self.max_chapter_pages = max_chapter_pages
+        self.title_lines = title_lines
+        self.strategy = strategy
         
         # 章节标题模式
         self.chapter_patterns = [
@@ -50,9 +74,13 @@ class ChapterDetector:
         # 编译正则表达式
         self.patterns = [re.compile(pattern, re.IGNORECASE) for pattern in self.chapter_patterns]
         
+        # 所有模式合并为一个交替正则，每页只匹配一次
+        self.combined_pattern = self._compile_combined_pattern(self.chapter_patterns)
+        
         logger.info(f"初始化章节检测器")
         logger.info(f"最小章节页数: {min_chapter_pages}")
         logger.info(f"最大章节页数: {max_chapter_pages}")
+        logger.info(f"边界选择策略: {strategy}")
     
     def detect_from_text(self, page_texts: Dict[int, str]) -> List[int]:
         """
@@ -70,22 +98,21 @@ class ChapterDetector:
         total_pages = max(page_texts.keys()) + 1
         logger.info(f"开始章节检测，总页数: {total_pages}")
         
-        # 收集所有可能的章节起始页
+        # 收集所有可能的章节起始页（批量评分）
         candidate_pages = []
         
-        for page_num, text in page_texts.items():
-            if not text or len(text.strip()) < 10:
-                continue
-            
-            # 检查是否为章节起始
-            is_chapter_start, confidence, reason = self._is_chapter_start(text, page_num)
-            
+        scores = self.detect_from_text_batch({
+            page_num: text for page_num, text in page_texts.items()
+            if text and len(text.strip()) >= 10
+        })
+        
+        for page_num, (is_chapter_start, confidence, reason) in scores.items():
             if is_chapter_start:
                 candidate_pages.append({
                     'page': page_num,
                     'confidence': confidence,
                     'reason': reason,
-                    'text_preview': text[:100]
+                    'text_preview': page_texts[page_num][:100]
                 })
         
         # 如果没有检测到章节，使用固定页数
@@ -109,6 +136,53 @@ class ChapterDetector:
         
         return chapter_boundaries
     
+    def detect_from_text_batch(self, page_texts: Dict[int, str]) -> Dict[int, Tuple[bool, float, str]]:
+        """
+        批量判断多个页面是否为章节起始
+        
+        各页标题区（前title_lines行）用分隔符拼接成一个字符串，
+        合并正则在整批文本上只扫描一次。
+        
+        Args:
+            page_texts: 页面编号到文本的映射
+            
+        Returns:
+            Dict[int, Tuple]: 页面编号到 (是否章节起始, 置信度, 原因) 的映射
+        """
+        pages = []
+        heads = []
+        starts = []
+        offset = 0
+        
+        for page_num, text in page_texts.items():
+            text = (text or '').strip()
+            lines = self._head_lines(text)
+            head = self._title_head(lines)
+            
+            pages.append((page_num, text, lines))
+            heads.append(head)
+            starts.append(offset)
+            offset += len(head) + len(self.PAGE_SEPARATOR)
+        
+        # 每页取标题区中最靠前的匹配，命中后直接跳到下一页
+        joined = self.PAGE_SEPARATOR.join(heads)
+        matches = {}
+        position = 0
+        while True:
+            match = self.combined_pattern.search(joined, position)
+            if match is None:
+                break
+            index = bisect_right(starts, match.start()) - 1
+            matches[index] = match.group()
+            if index + 1 >= len(starts):
+                break
+            position = starts[index + 1]
+        
+        return {
+            page_num: self._score_page(text, lines, page_num, matches.get(index))
+            for index, (page_num, text, lines) in enumerate(pages)
+        }
+    
     def _is_chapter_start(self, text: str, page_num: int) -> Tuple[bool, float, str]:
         """
         判断文本是否为章节起始
@@ -117,19 +191,55 @@ class ChapterDetector:
             (是否章节起始, 置信度, 原因)
         """
         text = text.strip()
+        lines = self._head_lines(text)
+        
+        match = self.combined_pattern.search(self._title_head(lines))
+        return self._score_page(text, lines, page_num, match.group() if match else None)
+    
+    def _head_lines(self, text: str) -> List[str]:
+        """
+        只切分评分需要的开头几行
         
-        # 规则1: 检查章节模式
-        for pattern in self.patterns:
-            if pattern.search(text):
-                # 检查是否在文本开头附近
-                lines = text.split('\n')
-                for line in lines[:3]:  # 只检查前3行
-                    if pattern.search(line.strip()):
-                        match_text = pattern.search(line.strip()).group()
-                        return True, 0.8, f"匹配模式: {match_text}"
+        规则2需要知道页面是否不超过3行，多切一段即可判断，不必切分整页。
+        """
+        return text.split('\n', max(self.title_lines, 3))
+    
+    def _title_head(self, lines: List[str]) -> str:
+        """页面标题区：前title_lines行（去掉首尾空白）"""
+        head = '\n'.join(line.strip() for line in lines[:self.title_lines])
+        return head.replace(self.PAGE_SEPARATOR, '')
+    
+    def _compile_combined_pattern(self, patterns: List[str]):
+        """
+        把章节模式合并为一个交替正则
+        
+        以^开头的模式只匹配页面第一行的开头（批量文本中即分隔符之后），
+        其余模式可以出现在标题区任意位置；\\s不跨行，和逐行匹配一致。
+        """
+        page_start = f"(?<![^{self.PAGE_SEPARATOR}])"
+        alternatives = []
+        
+        for pattern in patterns:
+            pattern = pattern.replace(r'\s', r'[^\S\n]')
+            if pattern.startswith('^'):
+                pattern = page_start + pattern[1:]
+            alternatives.append(f"(?:{pattern})")
+        
+        return re.compile('|'.join(alternatives), re.IGNORECASE)
+    
+    def _score_page(self, text: str, lines: List[str], page_num: int,
+                    match_text: Optional[str]) -> Tuple[bool, float, str]:
+        """
+        根据标题区匹配结果和标题特征给页面评分
+        
+        Returns:
+            (是否章节起始, 置信度, 原因)
+        """
+        # 规则1: 检查章节模式（已在标题区中匹配）
+        if match_text is not None:
+            return True, 0.8, f"匹配模式: {match_text}"
         
         # 规则2: 检查标题特征（短文本、大写开头等）
-        lines = text.split('\n')
         first_line = lines[0].strip() if lines else ""
         
         if len(first_line) < 100 and len(first_line) > 5:
@@ -161,7 +271,7 @@ class ChapterDetector:
     
     def _select_chapter_boundaries(self, candidates: List[Dict], total_pages: int) -> List[int]:
         """
-        从候选页面中选择章节边界
+        从候选页面中选择章节边界（按strategy分派）
         
         Args:
             candidates: 候选页面列表
@@ -173,6 +283,12 @@ class ChapterDetector:
         if not candidates:
             return self._fallback_to_fixed_pages(total_pages)
         
+        if self.strategy == 'optimal':
+            return self._select_optimal_boundaries(candidates, total_pages)
+        return self._select_greedy_boundaries(candidates, total_pages)
+    
+    def _select_greedy_boundaries(self, candidates: List[Dict], total_pages: int) -> List[int]:
+        """贪心选择：按置信度接受高置信度候选，末尾按最大章节页数补齐"""
         # 按置信度排序
         candidates.sort(key=lambda x: x['confidence'], reverse=True)
         
@@ -214,6 +330,65 @@ class ChapterDetector:
         
         return selected_boundaries
     
+    def _select_optimal_boundaries(self, candidates: List[Dict], total_pages: int) -> List[int]:
+        """
+        最优分段：动态规划（Viterbi）求总得分最高的边界序列
+        
+        best[j] 为前j页分段、且第j页开始新章节时的最高得分：
+            best[j] = gain[j] + max(best[j - L] - length_cost[L]), 1 <= L <= max_chapter_pages
+        第0页总是边界；候选页的gain为置信度减CANDIDATE_THRESHOLD，其余页为-FILLER_PENALTY。
+        章节不超过max_chapter_pages页（硬约束），短于min_chapter_pages按比例惩罚。
+        复杂度 O(total_pages x max_chapter_pages)。
+        """
+        if total_pages <= 0:
+            return []
+        
+        max_length = max(1, self.max_chapter_pages)
+        min_length = max(1, min(self.min_chapter_pages, max_length))
+        ideal_length = (min_length + max_length) / 2
+        
+        length_cost = [0.0] * (max_length + 1)
+        for length in range(1, max_length + 1):
+            cost = self.BALANCE_WEIGHT * abs(length - ideal_length) / max_length
+            if length < min_length:
+                cost += self.SHORT_PENALTY * (min_length - length) / min_length
+            length_cost[length] = cost
+        
+        gain = [-self.FILLER_PENALTY] * total_pages + [0.0]
+        for candidate in candidates:
+            page_num = candidate['page']
+            if 0 < page_num < total_pages:
+                gain[page_num] = max(gain[page_num], candidate['confidence'] - self.CANDIDATE_THRESHOLD)
+        
+        best = [0.0] + [float('-inf')] * total_pages
+        previous = [0] * (total_pages + 1)
+        for end in range(1, total_pages + 1):
+            best_score = float('-inf')
+            best_start = 0
+            for start in range(max(0, end - max_length), end):
+                score = best[start] - length_cost[end - start]
+                if score > best_score:
+                    best_score = score
+                    best_start = start
+            best[end] = best_score + gain[end]
+            previous[end] = best_start
+        
+        # 从文档末尾回溯边界
+        boundaries = []
+        page_num = previous[total_pages]
+        while page_num > 0:
+            boundaries.append(page_num)
+            page_num = previous[page_num]
+        boundaries.append(0)
+        boundaries.reverse()
+        
+        candidate_pages = {candidate['page'] for candidate in candidates}
+        fillers = sum(1 for boundary in boundaries[1:] if boundary not in candidate_pages)
+        logger.debug(f"最优分段: {len(boundaries)} 章 (候选 {len(candidate_pages)}, 补充边界 {fillers}, "
+                     f"得分 {best[total_pages]:.2f})")
+        
+        return boundaries
+    
     def _fallback_to_fixed_pages(self, total_pages: int) -> List[int]:
         """回退到固定页数拆分"""
         boundaries = []
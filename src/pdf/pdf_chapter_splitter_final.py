@@ -11,6 +11,12 @@ import logging
 from pathlib import Path
 from datetime import datetime
 
+from pdf_document import PDFDocument, use_document
+from pdf_memory import MemoryGuard, parse_size
+from pdf_ocr_backends import available_backend_names
+from pdf_page_index import build_page_text_index
+from pdf_split_engine import SPLIT_ENGINES, PageTextCache, chapter_ranges, create_chapter_writer
+
 # 设置基础日志
 logging.basicConfig(
     level=logging.INFO,
@@ -22,7 +28,10 @@ class PDFSplitterFinal:
     """PDF拆分器 - 最终版本（完整OCR流程）"""
     
     def __init__(self, pages_per_chapter=20, use_ocr=False, ocr_lang='eng+chi_sim',
-                 enable_preprocessing=True, dpi=200):
+                 enable_preprocessing=True, dpi=200, workers=1,
+                 ocr_cache_dir=None, ocr_cache_size=None, resume=False,
+                 index_cache_dir=None, adaptive_dpi=False, ocr_backend='auto',
+                 split_engine='pypdf2', max_memory=None, chapter_strategy='greedy'):
         """
         初始化PDF拆分器
         
@@ -32,12 +41,33 @@ class PDFSplitterFinal:
             ocr_lang: OCR语言设置
             enable_preprocessing: 是否启用图像预处理
             dpi: OCR图像分辨率
+            workers: OCR和页面文本索引的工作进程数
+            ocr_cache_dir: OCR结果缓存目录（None表示不使用缓存）
+            ocr_cache_size: OCR缓存上限（字节）
+            resume: OCR模式下从输出目录中的检查点继续
+            index_cache_dir: 页面文本索引缓存目录（None表示不缓存）
+            adaptive_dpi: OCR按页自适应分辨率（空白页跳过，按文字大小选DPI）
+            ocr_backend: OCR后端（见pdf_ocr_backends，'stub'可在没有tesseract时压测）
+            split_engine: 章节写出方式（见pdf_split_engine.SPLIT_ENGINES，
+                          'raw'直接复制对象字节，'streaming'在raw基础上限制内存，
+                          'virtual'只输出页面范围索引）
+            max_memory: streaming引擎的常驻内存上限（字节，None表示只释放缓存）
+            chapter_strategy: 章节边界选择策略（见pdf_chapter_detector.STRATEGIES，
+                              'optimal'用动态规划求全局最优分段）
         """
+        if split_engine not in SPLIT_ENGINES:
+            raise ValueError(f"未知的拆分引擎: {split_engine}（可选: {', '.join(SPLIT_ENGINES)}）")
+        
         self.pages_per_chapter = pages_per_chapter
         self.use_ocr = use_ocr
         self.ocr_lang = ocr_lang
         self.enable_preprocessing = enable_preprocessing
         self.dpi = dpi
+        self.workers = workers
+        self.resume = resume
+        self.index_cache_dir = index_cache_dir
+        self.split_engine = split_engine
+        self.max_memory = max_memory
         
         # 检查OCR可用性
         self.ocr_available = False
@@ -51,7 +81,8 @@ class PDFSplitterFinal:
             from pdf_chapter_detector import ChapterDetector
             self.chapter_detector = ChapterDetector(
                 min_chapter_pages=max(5, pages_per_chapter // 2),
-                max_chapter_pages=min(50, pages_per_chapter * 2)
+                max_chapter_pages=min(50, pages_per_chapter * 2),
+                strategy=chapter_strategy
             )
             self.chapter_detector_available = True
             logger.info("✅ 章节检测器初始化成功")
@@ -64,7 +95,14 @@ class PDFSplitterFinal:
                 self.ocr_processor = PDFOCRProcessor(
                     lang=ocr_lang,
                     enable_preprocessing=enable_preprocessing,
-                    dpi=dpi
+                    dpi=dpi,
+                    workers=workers,
+                    cache_dir=ocr_cache_dir,
+                    cache_max_size=ocr_cache_size,
+                    adaptive_dpi=adaptive_dpi,
+                    ocr_backend=ocr_backend,
+                    split_engine=split_engine,
+                    max_memory=max_memory
                 )
                 self.ocr_available = self.ocr_processor.is_available()
                 
@@ -72,7 +110,9 @@ class PDFSplitterFinal:
                     logger.info(f"✅ OCR处理器初始化成功")
                     logger.info(f"   语言: {ocr_lang}")
                     logger.info(f"   预处理: {'启用' if enable_preprocessing else '禁用'}")
-                    logger.info(f"   分辨率: {dpi} DPI")
+                    logger.info(f"   分辨率: {'自适应' if adaptive_dpi else f'{dpi} DPI'}")
+                    logger.info(f"   工作进程: {workers}")
+                    logger.info(f"   OCR后端: {self.ocr_processor.ocr.backend_name}")
                 else:
                     logger.warning("⚠️  OCR功能不可用，将回退到基础模式")
                     self.use_ocr = False
@@ -85,6 +125,9 @@ class PDFSplitterFinal:
             logger.info(f"初始化PDF拆分器（基础模式）")
         
         logger.info(f"每章节页数: {pages_per_chapter}")
+        logger.info(f"拆分引擎: {split_engine}")
+        if split_engine == 'streaming' and max_memory:
+            logger.info(f"内存上限: {max_memory / 1024 / 1024:.0f} MB")
     
     def smart_process_pdf(self, input_path, output_dir, force_ocr=False, use_smart_detection=True):
         """
@@ -115,13 +158,56 @@ class PDFSplitterFinal:
         # 创建输出目录
         output_dir.mkdir(parents=True, exist_ok=True)
         
+        # 整个流程共享一个文档句柄，PDF只解析一次（首次访问时才打开，
+        # 打开失败由各步骤按原有方式处理）
+        document = PDFDocument(input_path)
+        if self.split_engine == 'streaming':
+            # 从类型检测开始就限制内存（文本提取同样会缓存整张图像）
+            document.memory_guard = MemoryGuard(document, self.max_memory)
+        try:
+            result = self._smart_process_document(
+                document, output_dir, force_ocr, use_smart_detection
+            )
+        finally:
+            document.close()
+        
+        if document.memory_guard is not None:
+            result['memory'] = document.memory_guard.report()
+        
+        # 步骤4: 生成最终报告
+        end_time = datetime.now()
+        processing_time = (end_time - start_time).total_seconds()
+        
+        result['input_file'] = str(input_path)
+        result['output_dir'] = str(output_dir)
+        result['processing_time'] = processing_time
+        result['start_time'] = start_time.isoformat()
+        result['end_time'] = end_time.isoformat()
+        
+        # 保存报告
+        report_path = output_dir / f"{input_path.stem}_processing_report.json"
+        import json
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        
+        logger.info(f"📋 处理报告: {report_path}")
+        
+        # 显示结果摘要
+        self._print_result_summary(result)
+        
+        return result
+    
+    def _smart_process_document(self, document, output_dir, force_ocr, use_smart_detection):
+        """smart_process_pdf的检测和拆分步骤（共享文档句柄）"""
+        input_path = document.path
+        
         logger.info(f"🚀 开始智能处理PDF: {input_path.name}")
         logger.info(f"输出目录: {output_dir}")
         logger.info(f"OCR模式: {'启用' if self.use_ocr else '禁用'}")
         
         # 步骤1: 检测PDF类型
         logger.info("🔍 检测PDF类型...")
-        pdf_type = self.detect_pdf_type(input_path, detailed=False)
+        pdf_type = self.detect_pdf_type(input_path, detailed=False, document=document)
         
         # 步骤2: 决定处理模式
         use_ocr_mode = False
@@ -150,64 +236,56 @@ class PDFSplitterFinal:
                 input_path,
                 output_dir,
                 pages_per_chapter=self.pages_per_chapter,
-                progress_callback=progress_callback
+                progress_callback=progress_callback,
+                document=document,
+                resume=self.resume
             )
             
             if result.get('success', False):
                 result['processing_mode'] = 'ocr'
                 result['pdf_type'] = pdf_type
+            elif document.memory_guard is not None and document.memory_guard.exceeded:
+                # 超过内存上限时回退到基础模式同样会超过
+                result['processing_mode'] = 'ocr'
+                result['pdf_type'] = pdf_type
             else:
                 # OCR失败，回退到基础模式
                 logger.warning("OCR处理失败，回退到基础模式")
-                result = self._basic_split_pdf(input_path, output_dir, use_smart_detection=use_smart_detection)
+                result = self._basic_split_pdf(input_path, output_dir, use_smart_detection=use_smart_detection,
+                                               document=document)
                 result['processing_mode'] = 'basic_fallback'
                 result['pdf_type'] = pdf_type
             
         else:
             # 基础处理模式
             logger.info("📄 使用基础拆分模式...")
-            result = self._basic_split_pdf(input_path, output_dir, use_smart_detection=use_smart_detection)
+            result = self._basic_split_pdf(input_path, output_dir, use_smart_detection=use_smart_detection,
+                                           document=document)
             result['processing_mode'] = 'basic'
             result['pdf_type'] = pdf_type
         
-        # 步骤4: 生成最终报告
-        end_time = datetime.now()
-        processing_time = (end_time - start_time).total_seconds()
-        
-        result['input_file'] = str(input_path)
-        result['output_dir'] = str(output_dir)
-        result['processing_time'] = processing_time
-        result['start_time'] = start_time.isoformat()
-        result['end_time'] = end_time.isoformat()
-        
-        # 保存报告
-        report_path = output_dir / f"{input_path.stem}_processing_report.json"
-        import json
-        with open(report_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
-        
-        logger.info(f"📋 处理报告: {report_path}")
-        
-        # 显示结果摘要
-        self._print_result_summary(result)
-        
         return result
     
-    def _basic_split_pdf(self, input_path, output_dir, use_smart_detection=True):
-        """PDF拆分（支持智能章节检测）"""
+    def _basic_split_pdf(self, input_path, output_dir, use_smart_detection=True, document=None):
+        """
+        PDF拆分（支持智能章节检测）
+        
+        单遍处理：智能检测时先构建全文档页面文本索引，检测和章节标题共用；
+        章节PDF逐章写出，写完即释放写入器。
+        """
         try:
-            import PyPDF2
-            
             input_path = Path(input_path)
             output_dir = Path(output_dir)
             
-            with open(input_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                total_pages = len(pdf_reader.pages)
+            with use_document(input_path, document) as doc:
+                total_pages = doc.total_pages
                 
                 if total_pages == 0:
                     return {'success': False, 'error': 'PDF文件没有页面'}
                 
+                page_texts = PageTextCache(doc)
+                text_index = None
+                
                 # 决定使用哪种拆分方式
                 split_method = 'fixed'
                 chapter_boundaries = []
@@ -216,22 +294,18 @@ class PDFSplitterFinal:
                     # 尝试智能章节检测
                     logger.info("尝试智能章节检测...")
                     
-                    # 提取页面文本
-                    page_texts = {}
-                    sample_pages = min(20, total_pages)  # 采样部分页面以提高速度
-                    
-                    for page_num in range(sample_pages):
-                        try:
-                            page = pdf_reader.pages[page_num]
-                            text = page.extract_text()
-                            if text and len(text.strip()) > 5:
-                                page_texts[page_num] = text.strip()
-                        except:
-                            continue
+                    # 一次遍历建立全文档页面文本索引（可并行、可缓存）
+                    # （限制内存时在本进程中提取，工作进程不受内存守卫约束）
+                    text_index = build_page_text_index(
+                        doc, workers=self.workers if doc.memory_guard is None else 1,
+                        cache_dir=self.index_cache_dir
+                    )
+                    page_texts = PageTextCache(doc, text_index)
+                    detection_texts = page_texts.detection_texts(range(total_pages))
                     
-                    if page_texts:
+                    if detection_texts:
                         # 使用章节检测器
-                        chapter_boundaries = self.chapter_detector.detect_from_text(page_texts)
+                        chapter_boundaries = self.chapter_detector.detect_from_text(detection_texts)
                         
                         if len(chapter_boundaries) > 1:
                             split_method = 'smart'
@@ -247,100 +321,86 @@ class PDFSplitterFinal:
                     chapter_boundaries = [i * self.pages_per_chapter for i in range(num_chapters)]
                     logger.info(f"使用固定页数拆分: {num_chapters} 个章节")
                 
-                # 创建章节
+                # 逐章流式写出（虚拟章节只记录页面范围）
+                chapter_writer = create_chapter_writer(self.split_engine, doc, output_dir, input_path.stem,
+                                                       max_memory=self.max_memory)
                 chapters = []
                 chapter_details = []
                 
-                for chapter_idx in range(len(chapter_boundaries)):
-                    start_page = chapter_boundaries[chapter_idx]
-                    end_page = chapter_boundaries[chapter_idx + 1] if chapter_idx + 1 < len(chapter_boundaries) else total_pages
-                    
-                    # 提取章节标题（如果可能）
-                    chapter_title = f"第 {chapter_idx + 1} 章"
-                    if start_page < total_pages:
-                        try:
-                            page = pdf_reader.pages[start_page]
-                            text = page.extract_text()
-                            if text:
-                                lines = text.split('\n')
-                                if lines and len(lines[0].strip()) > 3:
-                                    chapter_title = lines[0].strip()[:50]
-                        except:
-                            pass
+                for chapter_number, start_page, end_page in chapter_ranges(chapter_boundaries, total_pages):
+                    # 提取章节标题（复用检测时已提取的文本）
+                    chapter_title = page_texts.chapter_title(start_page, f"第 {chapter_number} 章")
                     
-                    # 创建章节PDF
-                    chapter_pdf = PyPDF2.PdfWriter()
+                    chapter_path = chapter_writer.write(chapter_number, start_page, end_page)
                     
-                    for page_num in range(start_page, end_page):
-                        page = pdf_reader.pages[page_num]
-                        chapter_pdf.add_page(page)
-                    
-                    # 保存章节文件
-                    chapter_filename = f"{input_path.stem}_chapter_{chapter_idx + 1:03d}.pdf"
-                    chapter_path = output_dir / chapter_filename
-                    
-                    with open(chapter_path, 'wb') as chapter_file:
-                        chapter_pdf.write(chapter_file)
-                    
-                    chapters.append(str(chapter_path))
+                    if chapter_path is not None:
+                        chapters.append(str(chapter_path))
                     chapter_details.append({
-                        'chapter_number': chapter_idx + 1,
+                        'chapter_number': chapter_number,
                         'start_page': start_page,
                         'end_page': end_page,
                         'page_count': end_page - start_page,
                         'title': chapter_title,
-                        'filename': chapter_filename
+                        'filename': chapter_path.name if chapter_path is not None else None
                     })
                     
-                    logger.info(f"创建章节 {chapter_idx + 1}: {chapter_filename}")
+                    logger.info(f"创建章节 {chapter_number}: "
+                                f"{chapter_path.name if chapter_path is not None else '（虚拟章节）'}")
                     logger.info(f"  页面范围: {start_page + 1}-{end_page} ({end_page - start_page} 页)")
                     logger.info(f"  章节标题: {chapter_title}")
                 
+                chapter_index = chapter_writer.close()
+                logger.debug(f"页面文本提取次数: {page_texts.extractions}")
+                
                 return {
                     'success': True,
                     'total_pages': total_pages,
-                    'chapters_created': len(chapters),
+                    'chapters_created': len(chapter_details),
                     'chapters': chapters,
+                    'chapter_index': str(chapter_index) if chapter_index is not None else None,
+                    'split_engine': chapter_writer.stats(),
                     'chapter_details': chapter_details,
                     'split_method': split_method,
-                    'pages_per_chapter': self.pages_per_chapter if split_method == 'fixed' else 'variable'
+                    'pages_per_chapter': self.pages_per_chapter if split_method == 'fixed' else 'variable',
+                    'text_extractions': page_texts.extractions,
+                    'page_text_memo': page_texts.memo.stats(),
+                    'text_index': text_index.stats() if text_index is not None else None
                 }
                 
         except Exception as e:
             logger.error(f"PDF拆分失败: {e}")
             return {'success': False, 'error': str(e)}
     
-    def detect_pdf_type(self, pdf_path, detailed=False):
+    def detect_pdf_type(self, pdf_path, detailed=False, document=None):
         """
         检测PDF类型（简化版本）
         
         Args:
             pdf_path: PDF文件路径
             detailed: 是否详细分析
+            document: 共享的PDFDocument句柄（可选）
             
         Returns:
             str: 'text', 'scanned', 'unknown'
         """
         try:
-            import PyPDF2
-            
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                total_pages = len(pdf_reader.pages)
-                
-                # 检查前几页是否有文本
+            with use_document(pdf_path, document) as doc:
+                # 先按页面结构快速判断（不提取文本、不栅格化）
+                structure = doc.structure
+                if structure['pdf_type'] != 'unknown':
+                    return structure['pdf_type']
+
+                total_pages = doc.total_pages
+
+                # 结构不确定时，检查前几页是否有文本（经文档的页面文本备忘，后续检测不再重复提取）
                 sample_pages = min(3, total_pages)
                 text_found = False
                 
                 for page_num in range(sample_pages):
-                    try:
-                        page = pdf_reader.pages[page_num]
-                        text = page.extract_text()
-                        if text and len(text.strip()) > 10:
-                            text_found = True
-                            break
-                    except:
-                        continue
+                    text = doc.page_texts.get(page_num)
+                    if len(text.strip()) > 10:
+                        text_found = True
+                        break
                 
                 if text_found:
                     return 'text'
@@ -350,7 +410,7 @@ class PDFSplitterFinal:
                         try:
                             from pdf_ocr_module import PDFOCR
                             ocr = PDFOCR()
-                            analysis = ocr.analyze_scanned_document(pdf_path, sample_pages=2)
+                            analysis = ocr.analyze_scanned_document(pdf_path, sample_pages=2, document=doc)
                             scanned_prob = analysis.get('is_scanned_probability', 0)
                             
                             if scanned_prob > 0.5:
@@ -385,6 +445,21 @@ class PDFSplitterFinal:
                 logger.info(f"   总文本字符: {result.get('total_text_chars', 0)}")
                 logger.info(f"   平均字符/页: {result.get('avg_chars_per_page', 0):.0f}")
             
+            cache_report = result.get('ocr_cache', {})
+            if cache_report.get('enabled'):
+                logger.info(f"   OCR缓存: 命中 {cache_report['hits']}, 未命中 {cache_report['misses']}")
+            
+            memory_report = result.get('memory')
+            if memory_report and memory_report.get('peak_rss'):
+                logger.info(f"   常驻内存峰值（本文档采样）: {memory_report['peak_rss'] / 1024 / 1024:.0f} MB"
+                            f" (释放缓存 {memory_report['releases']} 次)")
+            
+            index_report = result.get('text_index')
+            if index_report:
+                logger.info(f"   页面文本索引: {index_report['total_pages']} 页, "
+                            f"平均 {index_report['avg_page_ms']:.1f} 毫秒/页"
+                            f"{' (缓存)' if index_report['cached'] else ''}")
+            
             # 显示生成的章节
             chapters = result.get('chapters', [])
             if chapters:
@@ -415,6 +490,8 @@ class PDFSplitterFinal:
 
 def main():
     """主函数"""
+    from pdf_chapter_detector import STRATEGIES as CHAPTER_STRATEGIES
+    
     parser = argparse.ArgumentParser(description='PDF章节拆分工具 - 最终版本（完整OCR流程）')
     
     # 主要参数
@@ -438,6 +515,31 @@ def main():
                        help='禁用图像预处理')
     parser.add_argument('--dpi', type=int, default=200,
                        help='OCR图像分辨率 (默认: 200)')
+    parser.add_argument('--adaptive-dpi', action='store_true',
+                       help='OCR按页自适应分辨率：跳过空白页，按文字大小选择DPI（忽略--dpi）')
+    parser.add_argument('--ocr-backend', type=str, default='auto',
+                       help=f'OCR后端: {", ".join(available_backend_names())}，'
+                            f'可带选项如 stub:latency_ms=50 (默认: auto)')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                       help='OCR和页面文本索引的工作进程数 (默认: 1)')
+    parser.add_argument('--ocr-cache', type=str, default=None,
+                       help='OCR结果缓存目录（重复处理时跳过已识别页面）')
+    parser.add_argument('--ocr-cache-size', type=str, default='256M',
+                       help='OCR缓存上限 (默认: 256M)')
+    parser.add_argument('--resume', action='store_true',
+                       help='从检查点继续中断的OCR处理')
+    parser.add_argument('--index-cache', type=str, default=None,
+                       help='页面文本索引缓存目录（重复处理时跳过文本提取）')
+    parser.add_argument('--split-engine', choices=SPLIT_ENGINES, default='pypdf2',
+                       help='章节写出方式: pypdf2 (PdfWriter), raw (直接复制对象字节并去重), '
+                            'streaming (raw加内存上限), virtual (不写章节PDF，只输出页面范围索引) (默认: pypdf2)')
+    parser.add_argument('--chapter-strategy', choices=CHAPTER_STRATEGIES, default='greedy',
+                       help='智能检测的章节边界选择: greedy (逐个接受高置信度候选), '
+                            'optimal (动态规划求全局最优分段) (默认: greedy)')
+    parser.add_argument('--streaming', action='store_true',
+                       help='流式拆分超大PDF（等同 --split-engine streaming）：每章写完释放页面对象，报告常驻内存峰值')
+    parser.add_argument('--max-memory', type=str, default=None,
+                       help='流式拆分的常驻内存上限，如 512M，超过时中止而不是被OOM杀掉（隐含 --streaming）')
     
     # 章节检测参数
     parser.add_argument('--smart', action='store_true',
@@ -467,7 +569,17 @@ def main():
         use_ocr=args.ocr,
         ocr_lang=args.ocr_lang,
         enable_preprocessing=not args.no_preprocess,
-        dpi=args.dpi
+        dpi=args.dpi,
+        workers=args.workers,
+        ocr_cache_dir=args.ocr_cache,
+        ocr_cache_size=parse_size(args.ocr_cache_size),
+        resume=args.resume,
+        index_cache_dir=args.index_cache,
+        adaptive_dpi=args.adaptive_dpi,
+        ocr_backend=args.ocr_backend,
+        split_engine='streaming' if args.streaming or args.max_memory else args.split_engine,
+        max_memory=parse_size(args.max_memory) if args.max_memory else None,
+        chapter_strategy=args.chapter_strategy
     )
     
     # OCR测试模式
@@ -505,23 +617,11 @@ def main():
             
             # 测试章节检测
             try:
-                import PyPDF2
-                with open(args.input, 'rb') as f:
-                    pdf_reader = PyPDF2.PdfReader(f)
-                    total_pages = len(pdf_reader.pages)
+                with PDFDocument(args.input) as doc:
+                    total_pages = doc.total_pages
                     
                     # 提取样本文本
-                    page_texts = {}
-                    sample_pages = min(10, total_pages)
-                    
-                    for page_num in range(sample_pages):
-                        try:
-                            page = pdf_reader.pages[page_num]
-                            text = page.extract_text()
-                            if text and len(text.strip()) > 5:
-                                page_texts[page_num] = text.strip()
-                        except:
-                            continue
+                    page_texts = PageTextCache(doc).detection_texts(range(min(10, total_pages)))
                     
                     if page_texts:
                         # 分析文档结构
@@ -579,6 +679,7 @@ def main():
         logger.info(f"OCR语言: {args.ocr_lang}")
         logger.info(f"图像预处理: {'启用' if not args.no_preprocess else '禁用'}")
         logger.info(f"图像分辨率: {args.dpi} DPI")
+        logger.info(f"OCR工作进程: {args.workers}")
     
     # 决定是否使用智能检测
     use_smart_detection = args.smart and not args.no_smart
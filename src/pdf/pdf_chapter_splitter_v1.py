@@ -68,12 +68,14 @@ class PDFSplitter:
                 logger.error("需要安装PyPDF2库: pip install PyPDF2")
                 return []
             
-            # 读取PDF文件
+            from pdf_document import PDFDocument
+            
+            # 读取PDF文件（共享内存映射，见pdf_input）
             chapters = []
             try:
-                with open(input_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    total_pages = len(pdf_reader.pages)
+                with PDFDocument(input_path) as doc:
+                    pdf_reader = doc.reader
+                    total_pages = doc.total_pages
                     
                     logger.info(f"PDF总页数: {total_pages}")
                     
@@ -120,14 +122,18 @@ class PDFSplitter:
             logger.error(f"拆分PDF时发生错误: {e}")
             return []
     
-    def split_pdf_streaming(self, input_path, output_dir, chunk_size=50):
+    def split_pdf_streaming(self, input_path, output_dir, chunk_size=50, max_memory=None):
         """
         流式拆分PDF - 适用于大文件
         
+        使用有内存上限的流式写出器（pdf_split_engine.StreamingChapterWriter）：
+        对象字节直接从源文件按块复制，每章写完释放已解析的页面对象。
+        
         Args:
             input_path: 输入PDF文件路径
             output_dir: 输出目录路径
-            chunk_size: 每次处理的页数（控制内存使用）
+            chunk_size: 每次处理的页数（章节不跨块）
+            max_memory: 常驻内存上限（字节，None表示只释放缓存），超过时中止
             
         Returns:
             list: 生成的章节文件路径列表
@@ -155,13 +161,15 @@ class PDFSplitter:
                 logger.error("需要安装PyPDF2库: pip install PyPDF2")
                 return []
             
+            from pdf_document import PDFDocument
+            from pdf_split_engine import StreamingChapterWriter
+            
             chapters = []
             chapter_num = 1
             
             try:
-                with open(input_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    total_pages = len(pdf_reader.pages)
+                with PDFDocument(input_path) as doc:
+                    total_pages = doc.total_pages
                     
                     logger.info(f"PDF总页数: {total_pages}")
                     
@@ -169,41 +177,28 @@ class PDFSplitter:
                         logger.error("PDF文件没有页面")
                         return []
                     
+                    chapter_writer = StreamingChapterWriter(doc, output_dir, input_path.stem, max_memory)
+                    
                     # 分块处理大文件
                     for chunk_start in range(0, total_pages, chunk_size):
                         chunk_end = min(chunk_start + chunk_size, total_pages)
                         
                         # 在当前块内分章节
-                        pages_in_chunk = chunk_end - chunk_start
-                        chapters_in_chunk = (pages_in_chunk + self.pages_per_chapter - 1) // self.pages_per_chapter
-                        
-                        for chunk_chapter in range(chapters_in_chunk):
-                            chapter_start = chunk_start + chunk_chapter * self.pages_per_chapter
+                        for chapter_start in range(chunk_start, chunk_end, self.pages_per_chapter):
                             chapter_end = min(chapter_start + self.pages_per_chapter, chunk_end)
                             
-                            if chapter_start >= chapter_end:
-                                break
-                            
-                            # 创建章节PDF
-                            chapter_pdf = PyPDF2.PdfWriter()
-                            
-                            # 添加页面到章节
-                            for page_num in range(chapter_start, chapter_end):
-                                page = pdf_reader.pages[page_num]
-                                chapter_pdf.add_page(page)
-                            
-                            # 保存章节文件
-                            chapter_filename = f"{input_path.stem}_chapter_{chapter_num:03d}.pdf"
-                            chapter_path = output_dir / chapter_filename
-                            
-                            with open(chapter_path, 'wb') as chapter_file:
-                                chapter_pdf.write(chapter_file)
+                            # 写出章节（写完即释放页面对象）
+                            chapter_path = chapter_writer.write(chapter_num, chapter_start, chapter_end)
                             
                             chapters.append(str(chapter_path))
-                            logger.info(f"创建章节 {chapter_num}: {chapter_filename} (页 {chapter_start+1}-{chapter_end})")
+                            logger.info(f"创建章节 {chapter_num}: {chapter_path.name} (页 {chapter_start+1}-{chapter_end})")
                             chapter_num += 1
                     
+                    chapter_writer.close()
+                    memory = chapter_writer.stats()['memory']
                     logger.info(f"PDF流式拆分完成! 共生成 {len(chapters)} 个章节文件")
+                    if memory['peak_rss']:
+                        logger.info(f"常驻内存峰值（本文档采样）: {memory['peak_rss'] / 1024 / 1024:.0f} MB")
                     
             except Exception as e:
                 logger.error(f"流式处理PDF时出错: {e}")
@@ -228,6 +223,8 @@ def main():
                        help='流式处理的块大小 (默认: 50页)')
     parser.add_argument('--streaming', '-s', action='store_true',
                        help='使用流式处理模式（适用于大文件）')
+    parser.add_argument('--max-memory', type=str, default=None,
+                       help='流式处理的常驻内存上限，如 512M')
     
     args = parser.parse_args()
     
@@ -244,7 +241,11 @@ def main():
     # 执行拆分
     if args.streaming:
         logger.info("使用流式处理模式")
-        chapters = splitter.split_pdf_streaming(args.input, args.output, args.chunk_size)
+        max_memory = None
+        if args.max_memory:
+            from pdf_memory import parse_size
+            max_memory = parse_size(args.max_memory)
+        chapters = splitter.split_pdf_streaming(args.input, args.output, args.chunk_size, max_memory)
     else:
         logger.info("使用标准处理模式")
         chapters = splitter.split_pdf(args.input, args.output)
@@ -50,40 +50,44 @@ class PDFSplitterV2:
         
         logger.info(f"每章节页数: {pages_per_chapter}")
     
-    def detect_pdf_type(self, pdf_path, detailed=False):
+    def detect_pdf_type(self, pdf_path, detailed=False, document=None):
         """
         检测PDF类型：文本PDF或扫描件（改进版本）
         
         Args:
             pdf_path: PDF文件路径
             detailed: 是否返回详细分析
+            document: 共享的PDFDocument句柄（可选）
             
         Returns:
             str 或 dict: 类型或详细分析结果
         """
         try:
-            import PyPDF2
+            from pdf_document import use_document
             
             pdf_path = Path(pdf_path)
             
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                total_pages = len(pdf_reader.pages)
+            with use_document(pdf_path, document) as doc:
+                total_pages = doc.total_pages
                 
-                # 方法1: 检查文本提取
+                # 方法0: 页面结构分类（图像覆盖率、字体、内容流），不提取文本、不栅格化
+                structure = doc.structure
+                structure_type = structure['pdf_type']
+                if structure_type != 'unknown' and not detailed:
+                    logger.info(f"检测到{'文本' if structure_type == 'text' else '扫描件'}PDF: "
+                                f"{pdf_path.name} (页面结构, 置信度: {structure['confidence']:.0%})")
+                    return structure_type
+                
+                # 方法1: 检查文本提取（经文档的页面文本备忘，拆分时标题提取直接命中）
                 sample_pages = min(5, total_pages)
                 text_pages = 0
                 total_text_chars = 0
                 
                 for page_num in range(sample_pages):
-                    try:
-                        page = pdf_reader.pages[page_num]
-                        text = page.extract_text()
-                        if text and len(text.strip()) > 5:
-                            text_pages += 1
-                            total_text_chars += len(text.strip())
-                    except:
-                        continue
+                    text = doc.page_texts.get(page_num).strip()
+                    if len(text) > 5:
+                        text_pages += 1
+                        total_text_chars += len(text)
                 
                 # 计算文本提取指标
                 text_page_ratio = text_pages / sample_pages if sample_pages > 0 else 0
@@ -92,9 +96,11 @@ class PDFSplitterV2:
                 # 方法2: 如果启用了OCR，使用扫描件分析
                 scanned_analysis = {}
                 if self.use_ocr and OCR_AVAILABLE:
-                    scanned_analysis = self.ocr_processor.analyze_scanned_document(pdf_path, sample_pages=3)
+                    scanned_analysis = self.ocr_processor.analyze_scanned_document(
+                        pdf_path, sample_pages=3, document=doc
+                    )
                 
-                # 综合判断
+                # 综合判断（页面结构能确定时以结构为准）
                 is_text_pdf = text_page_ratio > 0.7 or avg_text_per_page > 100
                 is_scanned = False
                 
@@ -102,6 +108,10 @@ class PDFSplitterV2:
                     scanned_prob = scanned_analysis['is_scanned_probability']
                     is_scanned = scanned_prob > 0.6
                 
+                if structure_type != 'unknown':
+                    is_text_pdf = structure_type == 'text'
+                    is_scanned = structure_type == 'scanned'
+                
                 # 生成结果
                 if detailed:
                     result = {
@@ -112,6 +122,7 @@ class PDFSplitterV2:
                         'avg_text_per_page': round(avg_text_per_page, 1),
                         'is_text_pdf': is_text_pdf,
                         'scanned_analysis': scanned_analysis,
+                        'structure_analysis': structure,
                         'detected_type': 'text' if is_text_pdf else ('scanned' if is_scanned else 'mixed/unknown'),
                         'confidence': 'high' if (is_text_pdf or is_scanned) else 'low'
                     }
@@ -121,6 +132,7 @@ class PDFSplitterV2:
                     logger.info(f"  总页数: {total_pages}")
                     logger.info(f"  文本页面比例: {text_page_ratio:.1%}")
                     logger.info(f"  平均文本长度: {avg_text_per_page:.0f} 字符")
+                    logger.info(f"  页面结构: {structure_type} {structure['page_kinds']}")
                     
                     if scanned_analysis:
                         logger.info(f"  扫描件概率: {scanned_analysis.get('is_scanned_probability', 0):.1%}")
@@ -148,7 +160,7 @@ class PDFSplitterV2:
             logger.warning(f"PDF类型检测失败: {e}")
             return 'unknown' if not detailed else {'error': str(e), 'detected_type': 'unknown'}
     
-    def extract_page_text(self, pdf_path, page_num, use_preprocessing=True):
+    def extract_page_text(self, pdf_path, page_num, use_preprocessing=True, document=None):
         """
         提取页面文本（智能选择方法，改进版本）
         
@@ -156,20 +168,19 @@ class PDFSplitterV2:
             pdf_path: PDF文件路径
             page_num: 页面编号
             use_preprocessing: 是否使用图像预处理
+            document: 共享的PDFDocument句柄（可选，拆分时逐章提取标题不再重复打开文件）
             
         Returns:
             str: 提取的文本
         """
         try:
-            import PyPDF2
+            from pdf_document import use_document
             
             # 首先尝试直接提取文本
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                if page_num < len(pdf_reader.pages):
-                    page = pdf_reader.pages[page_num]
-                    text = page.extract_text()
-                    if text and len(text.strip()) > 5:
+            with use_document(pdf_path, document) as doc:
+                if page_num < doc.total_pages:
+                    text = doc.page_texts.get(page_num)
+                    if len(text.strip()) > 5:
                         logger.debug(f"直接提取第 {page_num + 1} 页文本: {len(text.strip())} 字符")
                         return text.strip()
             
@@ -198,23 +209,23 @@ class PDFSplitterV2:
             logger.error(f"提取页面文本失败: {e}")
             return ""
     
-    def analyze_chapter_boundaries(self, pdf_path, sample_rate=0.1):
+    def analyze_chapter_boundaries(self, pdf_path, sample_rate=0.1, document=None):
         """
         分析章节边界（基础版本）
         
         Args:
             pdf_path: PDF文件路径
             sample_rate: 采样率（0-1）
+            document: 共享的PDFDocument句柄（可选）
             
         Returns:
             list: 建议的章节起始页码
         """
         try:
-            import PyPDF2
+            from pdf_document import use_document
             
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                total_pages = len(pdf_reader.pages)
+            with use_document(pdf_path, document) as doc:
+                total_pages = doc.total_pages
                 
                 # 基础版本：按固定页数拆分
                 # 后续Sprint会实现智能检测
@@ -263,10 +274,6 @@ class PDFSplitterV2:
             logger.info(f"输出目录: {output_dir}")
             logger.info(f"OCR模式: {'启用' if self.use_ocr else '禁用'}")
             
-            # 检测PDF类型
-            pdf_type = self.detect_pdf_type(input_path)
-            logger.info(f"PDF类型: {pdf_type}")
-            
             # 导入PyPDF2
             try:
                 import PyPDF2
@@ -274,11 +281,18 @@ class PDFSplitterV2:
                 logger.error("需要安装PyPDF2库: pip install PyPDF2")
                 return []
             
+            from pdf_document import PDFDocument
+            
             chapters = []
             try:
-                with open(input_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    total_pages = len(pdf_reader.pages)
+                # 整个拆分过程共享一个文档句柄（输入文件只映射、解析一次）
+                with PDFDocument(input_path) as doc:
+                    # 检测PDF类型
+                    pdf_type = self.detect_pdf_type(input_path, document=doc)
+                    logger.info(f"PDF类型: {pdf_type}")
+                    
+                    pdf_reader = doc.reader
+                    total_pages = doc.total_pages
                     
                     logger.info(f"PDF总页数: {total_pages}")
                     
@@ -290,7 +304,7 @@ class PDFSplitterV2:
                     if use_smart_split and self.use_ocr:
                         logger.info("使用智能章节检测（预留功能）")
                         # 后续Sprint实现
-                        boundaries = self.analyze_chapter_boundaries(input_path)
+                        boundaries = self.analyze_chapter_boundaries(input_path, document=doc)
                     else:
                         # 基础版本：按固定页数
                         num_chapters = (total_pages + self.pages_per_chapter - 1) // self.pages_per_chapter
@@ -325,7 +339,7 @@ class PDFSplitterV2:
                         chapter_title = f"第 {chapter_idx + 1} 章"
                         if self.use_ocr:
                             # 尝试从第一页提取标题
-                            first_page_text = self.extract_page_text(input_path, start_page)
+                            first_page_text = self.extract_page_text(input_path, start_page, document=doc)
                             if first_page_text:
                                 # 简单提取前几行作为标题
                                 lines = first_page_text.split('\n')
@@ -370,18 +384,32 @@ class PDFSplitterV2:
             # 测试前3页
             pages = [0, 1, 2]
         
+        from pdf_document import PDFDocument
+        
         results = {}
-        for page_num in pages:
-            text = self.extract_page_text(pdf_path, page_num)
-            results[page_num] = text
-            
-            if text:
-                logger.info(f"第 {page_num + 1} 页: 提取 {len(text)} 字符")
-                # 显示前100个字符
-                preview = text[:100] + ("..." if len(text) > 100 else "")
-                logger.info(f"  预览: {preview}")
-            else:
-                logger.warning(f"第 {page_num + 1} 页: 未提取到文本")
+        # 所有测试页共享一个文档句柄（不再每页打开一次）
+        try:
+            doc = PDFDocument(pdf_path).open()
+        except Exception as e:
+            # 文件不存在或损坏：与逐页提取时一样，每页结果为空字符串
+            logger.error(f"提取页面文本失败: {e}")
+            doc = None
+        
+        try:
+            for page_num in pages:
+                text = self.extract_page_text(pdf_path, page_num, document=doc) if doc is not None else ""
+                results[page_num] = text
+                
+                if text:
+                    logger.info(f"第 {page_num + 1} 页: 提取 {len(text)} 字符")
+                    # 显示前100个字符
+                    preview = text[:100] + ("..." if len(text) > 100 else "")
+                    logger.info(f"  预览: {preview}")
+                else:
+                    logger.warning(f"第 {page_num + 1} 页: 未提取到文本")
+        finally:
+            if doc is not None:
+                doc.close()
         
         # 统计
         successful = sum(1 for text in results.values() if text)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+扫描件处理检查点 - 性能优化
+记录已完成的页面和章节，中断后可以从断点继续；输出文件原子写入
+"""
+
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 1
+
+@contextmanager
+def atomic_open(path, mode='w', encoding='utf-8'):
+    """
+    原子写入文件：先写同目录临时文件，成功后再替换目标文件
+
+    Args:
+        path: 目标文件路径
+        mode: 'w' 或 'wb'
+        encoding: 文本模式编码
+
+    Yields:
+        file: 临时文件对象
+    """
+    path = Path(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix='.tmp', dir=str(path.parent))
+
+    try:
+        if 'b' in mode:
+            f = os.fdopen(fd, mode)
+        else:
+            f = os.fdopen(fd, mode, encoding=encoding)
+        with f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+class ProcessingCheckpoint:
+    """单个文档的处理检查点（检查点清单 + 页面日志）"""
+
+    def __init__(self, output_dir, pdf_stem, fingerprint):
+        """
+        初始化检查点
+
+        Args:
+            output_dir: 输出目录
+            pdf_stem: PDF文件名（不含扩展名）
+            fingerprint: 文档和处理参数的指纹，不一致时不能续跑
+        """
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / f"{pdf_stem}_checkpoint.json"
+        self.journal_path = self.output_dir / f"{pdf_stem}_pages.jsonl"
+        self.fingerprint = fingerprint
+
+        self.completed_chapters = {}
+        self.journal_pages = {}
+        self.completed = False
+        self._journal = None
+
+    def load(self):
+        """
+        加载已有检查点
+
+        Returns:
+            bool: 是否可以从检查点继续
+        """
+        if not self.path.exists():
+            return False
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"检查点文件损坏，重新开始: {e}")
+            return False
+
+        if data.get('version') != CHECKPOINT_VERSION or data.get('fingerprint') != self.fingerprint:
+            logger.warning("检查点与当前文档或参数不一致，重新开始")
+            return False
+
+        self.completed = data.get('completed', False)
+
+        # 只信任输出文件仍然存在的章节
+        for index, info in data.get('chapters', {}).items():
+            files = [info.get('text_file'), info.get('pdf_file')]
+            if all(f is None or (self.output_dir / f).exists() for f in files):
+                self.completed_chapters[int(index)] = info
+
+        if self.journal_path.exists():
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 中断时最后一行可能不完整
+                        continue
+                    self.journal_pages[entry['page']] = entry['text']
+
+        logger.info(f"从检查点继续: 已完成 {len(self.completed_chapters)} 章, "
+                    f"日志中 {len(self.journal_pages)} 页")
+        return True
+
+    def reset(self):
+        """丢弃旧的检查点和页面日志，从头开始"""
+        self.close()
+        self.completed_chapters = {}
+        self.journal_pages = {}
+        self.completed = False
+        for path in (self.path, self.journal_path):
+            if path.exists():
+                os.remove(path)
+
+    def is_chapter_done(self, chapter_idx):
+        """章节是否已完成"""
+        return chapter_idx in self.completed_chapters
+
+    def record_page(self, page_num, text):
+        """把已完成页面的OCR文本追加到页面日志"""
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._journal.write(json.dumps({'page': page_num, 'text': text}, ensure_ascii=False) + '\n')
+        self._journal.flush()
+
+    def record_chapter(self, chapter_idx, info):
+        """
+        记录完成的章节并保存检查点
+
+        章节按顺序完成，此前日志中的页面都已写入章节文件，
+        所以保存后清空页面日志。
+        """
+        self.completed_chapters[chapter_idx] = info
+        self.save()
+
+        self.journal_pages.clear()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if self.journal_path.exists():
+            os.remove(self.journal_path)
+
+    def mark_completed(self):
+        """标记整个文档处理完成"""
+        self.completed = True
+        self.save()
+        self.close()
+
+    def save(self):
+        """原子写入检查点清单"""
+        data = {
+            'version': CHECKPOINT_VERSION,
+            'fingerprint': self.fingerprint,
+            'completed': self.completed,
+            'updated_at': datetime.now().isoformat(),
+            'chapters': {str(k): v for k, v in sorted(self.completed_chapters.items())}
+        }
+        with atomic_open(self.path, 'w') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    def close(self):
+        """关闭页面日志"""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+PDF文档句柄 - 性能优化
+每个文档只打开并解析一次（reader、页数、页面对象），
+在OCR模块、OCR处理器和拆分器之间共享；输入文件经pdf_input在进程内只映射一次，
+页面文本经page_texts备忘，每页最多提取一次
+"""
+
+import hashlib
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+
+from pdf_input import map_file
+from pdf_page_text import PageTextMemo
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class PDFDocument:
+    """共享的PDF文档句柄 - 每个文档只解析一次xref表"""
+
+    # 默认通过共享内存映射读取输入（False时使用普通文件读取，基准测试对比用）
+    use_mmap = True
+
+    def __init__(self, pdf_path, use_mmap=None):
+        """
+        初始化文档句柄（延迟打开，首次访问时才解析）
+
+        Args:
+            pdf_path: PDF文件路径
+            use_mmap: 是否通过共享内存映射读取（None表示使用类默认值）
+        """
+        self.path = Path(pdf_path)
+        if use_mmap is not None:
+            self.use_mmap = use_mmap
+        self._mapped = None
+        self._file = None
+        self._reader = None
+        self._total_pages = None
+        self._content_hash = None
+        self._structure = None
+        self._page_texts = None
+        # 流式拆分时的内存守卫（见pdf_memory.MemoryGuard），每次取页面时回调
+        self.memory_guard = None
+
+    def open(self):
+        """打开文件并创建PdfReader（重复调用无副作用）"""
+        if self._reader is not None:
+            return self
+
+        import PyPDF2
+
+        if self.use_mmap:
+            self._mapped = map_file(self.path)
+        if self._mapped is not None:
+            self._file = self._mapped.open_stream()
+        else:
+            self._file = open(self.path, 'rb')
+        try:
+            self._reader = PyPDF2.PdfReader(self._file)
+            self._total_pages = len(self._reader.pages)
+        except Exception:
+            self.close()
+            raise
+
+        logger.debug(f"打开PDF文档: {self.path.name} ({self._total_pages} 页)")
+        return self
+
+    def close(self):
+        """关闭底层文件，释放reader"""
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+        self._file = None
+        self._reader = None
+        if self._page_texts is not None:
+            self._page_texts.close()
+            self._page_texts = None
+        if self._mapped is not None:
+            self._mapped.release()
+            self._mapped = None
+
+    def release_objects(self):
+        """
+        释放PyPDF2已解析对象的缓存
+
+        页面对象本身保留（页面树只展开一次），它们引用的内容流、图像、
+        字体等对象下次访问时从文件重新读取；已访问的文件映射页同时退出常驻内存
+        """
+        if self._reader is not None:
+            self._reader.resolved_objects.clear()
+        if self._mapped is not None:
+            self._mapped.drop_resident_pages()
+
+    @property
+    def is_open(self):
+        """文档是否已打开"""
+        return self._reader is not None
+
+    @property
+    def buffer(self):
+        """输入文件的零拷贝只读缓冲区（memoryview，未使用映射时为None）"""
+        self.open()
+        return self._mapped.buffer if self._mapped is not None else None
+
+    @property
+    def reader(self):
+        """PyPDF2.PdfReader对象"""
+        self.open()
+        return self._reader
+
+    @property
+    def total_pages(self):
+        """总页数"""
+        self.open()
+        return self._total_pages
+
+    @property
+    def pages(self):
+        """页面对象列表（PyPDF2按需解析）"""
+        return self.reader.pages
+
+    @property
+    def content_hash(self):
+        """文档内容的SHA-256（首次访问时计算并缓存）"""
+        if self._content_hash is None:
+            if self._mapped is not None:
+                # 直接对映射内存求哈希（不复制，hashlib计算时释放GIL）
+                self._content_hash = hashlib.sha256(self._mapped.buffer).hexdigest()
+                return self._content_hash
+            file_hash = hashlib.sha256()
+            with open(self.path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    file_hash.update(chunk)
+            self._content_hash = file_hash.hexdigest()
+        return self._content_hash
+
+    @property
+    def structure(self):
+        """页面结构分类结果（首次访问时计算并缓存，见pdf_structure_classifier）"""
+        if self._structure is None:
+            from pdf_structure_classifier import classify_pdf_structure
+            self._structure = classify_pdf_structure(self)
+        return self._structure
+
+    @property
+    def page_texts(self):
+        """页面文本备忘（PageTextMemo，首次访问时创建，关闭文档时丢弃）"""
+        if self._page_texts is None:
+            self._page_texts = PageTextMemo(self)
+        return self._page_texts
+
+    def get_page(self, page_num):
+        """
+        获取页面对象
+
+        Args:
+            page_num: 页面编号（从0开始）
+
+        Returns:
+            PageObject: 页面对象
+        """
+        if page_num < 0 or page_num >= self.total_pages:
+            raise IndexError(f"页面编号超出范围: {page_num} (总页数: {self.total_pages})")
+        if self.memory_guard is not None:
+            self.memory_guard.page_accessed()
+        return self.reader.pages[page_num]
+
+    def __len__(self):
+        return self.total_pages
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+@contextmanager
+def use_document(pdf_path, document=None):
+    """
+    复用调用方传入的文档句柄，否则临时打开一个
+
+    传入的document由调用方负责关闭；临时打开的在退出时关闭。
+
+    Args:
+        pdf_path: PDF文件路径
+        document: 已打开的PDFDocument（可选）
+
+    Yields:
+        PDFDocument: 文档句柄
+    """
+    if document is not None:
+        yield document
+    else:
+        with PDFDocument(pdf_path) as doc:
+            yield doc
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+OCR图像预处理 - 性能优化
+灰度化后全程在一个uint8数组上原地处理：向量化直方图均衡化、
+分块积分自适应阈值（按行分块，临时内存有界），最后零拷贝转回PIL图像
+"""
+
+import logging
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 自适应阈值的分块边长（像素）和窗口包含的块数：200 DPI下窗口约48像素，两行文字高
+DEFAULT_TILE_SIZE = 16
+DEFAULT_WINDOW_TILES = 3
+
+# 像素比窗口均值暗多少百分比时判为前景（Bradley-Roth方法）
+DEFAULT_OFFSET = 15
+
+# 按行分块处理时每块的行数
+STRIP_ROWS = 256
+
+def to_gray_array(image, denoise=True):
+    """
+    转为可写的uint8灰度数组（之后的步骤都在这个数组上原地进行）
+
+    Args:
+        image: PIL Image对象
+        denoise: 是否先做3x3中值滤波
+
+    Returns:
+        (numpy.ndarray, list): 二维uint8数组、灰度直方图
+    """
+    import numpy as np
+    from PIL import ImageFilter
+
+    gray = image if image.mode == 'L' else image.convert('L')
+
+    if denoise:
+        try:
+            gray = gray.filter(ImageFilter.MedianFilter(size=3))
+        except Exception:
+            pass  # 如果失败，使用未去噪的灰度图
+
+    return np.array(gray, dtype=np.uint8), gray.histogram()
+
+def equalize_histogram(array, histogram=None):
+    """
+    原地直方图均衡化（查找表与PIL ImageOps.equalize相同）
+
+    Args:
+        array: 二维uint8数组，会被原地修改
+        histogram: 已知的256级直方图（可选，如PIL的Image.histogram()，省去一次全图统计）
+
+    Returns:
+        numpy.ndarray: 同一个数组
+    """
+    import numpy as np
+
+    if histogram is None:
+        histogram = np.bincount(array.ravel(), minlength=256)
+    else:
+        histogram = np.asarray(histogram[:256], dtype=np.int64)
+    nonzero = np.flatnonzero(histogram)
+    if nonzero.size <= 1:
+        return array
+
+    step = (histogram.sum() - histogram[nonzero[-1]]) // 255
+    if step == 0:
+        return array
+
+    # lut[i] = (小于i的像素数 + step // 2) // step
+    below = np.concatenate(([0], np.cumsum(histogram)[:-1]))
+    lut = np.minimum((below + step // 2) // step, 255).astype(np.uint8)
+
+    # mode='clip'时take不做缓冲，可以直接写回原数组；
+    # 按行分块是因为take会把索引转成intp，整幅图转换要多占8倍内存
+    for start in range(0, array.shape[0], STRIP_ROWS):
+        strip = array[start:start + STRIP_ROWS]
+        np.take(lut, strip, out=strip, mode='clip')
+    return array
+
+def adaptive_threshold(array, tile_size=DEFAULT_TILE_SIZE, window_tiles=DEFAULT_WINDOW_TILES,
+                       offset=DEFAULT_OFFSET):
+    """
+    原地自适应二值化（分块积分 + Bradley-Roth局部均值阈值）
+
+    图像按tile_size分块，先求每块像素和，再在块网格上用积分图求
+    window_tiles x window_tiles个块的窗口和。像素值低于所在块窗口均值的
+    (100 - offset)%时为黑色(0)，否则为白色(255)。
+    块网格很小，全分辨率上只剩按行分块的比较，临时内存有界。
+
+    Args:
+        array: 二维uint8数组，会被原地修改
+        tile_size: 分块边长（像素）
+        window_tiles: 窗口包含的块数（每个方向，奇数）
+        offset: 阈值偏移百分比
+
+    Returns:
+        numpy.ndarray: 同一个数组
+    """
+    import numpy as np
+
+    height, width = array.shape
+    tile_sums, tile_counts = _tile_sums(array, tile_size)
+
+    # 块网格上的积分图，求每块周围窗口的像素和与像素数
+    radius = window_tiles // 2
+    grid_rows, grid_cols = tile_sums.shape
+    sums = np.zeros((grid_rows + 1, grid_cols + 1), dtype=np.int64)
+    counts = np.zeros((grid_rows + 1, grid_cols + 1), dtype=np.int64)
+    sums[1:, 1:] = tile_sums.cumsum(axis=0).cumsum(axis=1)
+    counts[1:, 1:] = tile_counts.cumsum(axis=0).cumsum(axis=1)
+
+    r0 = np.clip(np.arange(grid_rows) - radius, 0, grid_rows)
+    r1 = np.clip(np.arange(grid_rows) + radius + 1, 0, grid_rows)
+    c0 = np.clip(np.arange(grid_cols) - radius, 0, grid_cols)
+    c1 = np.clip(np.arange(grid_cols) + radius + 1, 0, grid_cols)
+
+    def window(table):
+        return table[r1][:, c1] - table[r0][:, c1] - table[r1][:, c0] + table[r0][:, c0]
+
+    # pixel * area * 100 <= sum * (100 - offset)  <=>  pixel <= 下面的整数阈值
+    thresholds = (window(sums) * (100 - offset) // (window(counts) * 100)).astype(np.uint8)
+
+    strip_tiles = max(STRIP_ROWS // tile_size, 1)
+    background = np.empty((strip_tiles * tile_size, width), dtype=bool)
+
+    for tile_row in range(0, grid_rows, strip_tiles):
+        start = tile_row * tile_size
+        end = min(start + strip_tiles * tile_size, height)
+        strip = array[start:end]
+
+        # 把块阈值展开到像素分辨率（只展开当前行块）
+        strip_thresholds = np.repeat(
+            np.repeat(thresholds[tile_row:tile_row + strip_tiles], tile_size, axis=0)[:end - start],
+            tile_size, axis=1
+        )[:, :width]
+
+        mask = background[:end - start]
+        np.greater(strip, strip_thresholds, out=mask)
+        np.multiply(mask, np.uint8(255), out=strip)
+
+    return array
+
+def _tile_sums(array, tile_size):
+    """
+    每个分块的像素和与像素数（最后一行/列的分块可能不满）
+
+    Returns:
+        (numpy.ndarray, numpy.ndarray): 块像素和、块像素数
+    """
+    import numpy as np
+
+    height, width = array.shape
+    full_rows, full_cols = height // tile_size, width // tile_size
+    grid_rows, grid_cols = -(-height // tile_size), -(-width // tile_size)
+    rest_rows, rest_cols = height - full_rows * tile_size, width - full_cols * tile_size
+
+    sums = np.zeros((grid_rows, grid_cols), dtype=np.int64)
+    body = array[:full_rows * tile_size, :full_cols * tile_size]
+    sums[:full_rows, :full_cols] = body.reshape(
+        full_rows, tile_size, full_cols, tile_size
+    ).sum(axis=(1, 3), dtype=np.int64)
+
+    if rest_cols:
+        right = array[:full_rows * tile_size, full_cols * tile_size:]
+        sums[:full_rows, full_cols] = right.reshape(full_rows, tile_size, rest_cols).sum(axis=(1, 2))
+    if rest_rows:
+        bottom = array[full_rows * tile_size:, :full_cols * tile_size]
+        sums[full_rows, :full_cols] = bottom.reshape(rest_rows, full_cols, tile_size).sum(axis=(0, 2))
+    if rest_rows and rest_cols:
+        sums[full_rows, full_cols] = array[full_rows * tile_size:, full_cols * tile_size:].sum()
+
+    row_heights = np.full(grid_rows, tile_size, dtype=np.int64)
+    col_widths = np.full(grid_cols, tile_size, dtype=np.int64)
+    if rest_rows:
+        row_heights[-1] = rest_rows
+    if rest_cols:
+        col_widths[-1] = rest_cols
+
+    return sums, np.outer(row_heights, col_widths)
+
+def preprocess_for_ocr(image, denoise=True, equalize=True,
+                       tile_size=DEFAULT_TILE_SIZE, window_tiles=DEFAULT_WINDOW_TILES,
+                       offset=DEFAULT_OFFSET):
+    """
+    OCR图像预处理：灰度 -> 去噪 -> 直方图均衡化 -> 自适应二值化
+
+    Args:
+        image: PIL Image对象
+        denoise: 是否中值滤波去噪
+        equalize: 是否直方图均衡化
+        tile_size: 自适应阈值分块边长
+        window_tiles: 自适应阈值窗口包含的块数
+        offset: 自适应阈值偏移百分比
+
+    Returns:
+        PIL Image: 二值化后的灰度图像（与处理数组共享内存）
+    """
+    from PIL import Image
+
+    array, histogram = to_gray_array(image, denoise=denoise)
+
+    if equalize:
+        equalize_histogram(array, histogram)
+
+    adaptive_threshold(array, tile_size=tile_size, window_tiles=window_tiles, offset=offset)
+
+    height, width = array.shape
+    return Image.frombuffer('L', (width, height), array, 'raw', 'L', 0, 1)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+PDF输入层 - 性能优化
+每个输入PDF在进程内只映射一次（mmap，只读），同一进程中的所有文档句柄和线程
+共享这份映射：PyPDF2通过各自独立读取位置的流读取（解析时的小块读取直接从映射内存复制，
+不再经过read系统调用；整段读取图像等大对象时用preadv从页缓存复制，避免逐页缺页），
+原始对象复制和内容哈希直接使用映射的零拷贝缓冲区。
+映射失败（空文件、不支持mmap的文件系统）时由调用方退回普通文件读取。
+注意：映射期间文件被其他进程截断会导致进程收到SIGBUS，收件箱等场景应等文件稳定后再打开。
+"""
+
+import io
+import logging
+import mmap
+import os
+import threading
+from pathlib import Path
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# PyPDF2读取流的缓冲区大小：对象在文件中随机分布，缓冲区过大时每次定位都会多复制
+STREAM_BUFFER_SIZE = 8192
+
+# 单次读取超过此大小时用preadv（反正要复制到PyPDF2的缓冲区，内核复制比映射缺页快）
+BULK_READ_SIZE = 256 * 1024
+
+# 进程内的共享映射：(真实路径, inode, 大小, 修改时间) -> MappedFile
+_mapped_files = {}
+_lock = threading.Lock()
+
+class MappedFile:
+    """一个文件的共享只读映射（引用计数，最后一个使用者释放时解除映射）"""
+
+    def __init__(self, key, path):
+        self.key = key
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self.fileno = self._file.fileno()
+        self.buffer = memoryview(self._mmap)
+        self.size = len(self.buffer)
+        self._refs = 0
+
+    def open_stream(self):
+        """
+        创建独立读取位置的只读流（供PyPDF2.PdfReader使用）
+
+        Returns:
+            io.BufferedReader: 底层从共享映射复制数据的流
+        """
+        return io.BufferedReader(MappedStream(self), STREAM_BUFFER_SIZE)
+
+    def drop_resident_pages(self):
+        """
+        让已访问的映射页退出本进程的常驻内存（页仍在系统页缓存中，再次访问时重新映射）
+
+        只读文件映射上的MADV_DONTNEED不会丢失数据；平台不支持时什么也不做
+        """
+        advice = getattr(mmap, 'MADV_DONTNEED', None)
+        if advice is None:
+            return
+        try:
+            self._mmap.madvise(advice)
+        except (OSError, ValueError):
+            pass
+
+    def release(self):
+        """使用者计数-1，归零时解除映射"""
+        with _lock:
+            self._refs -= 1
+            if self._refs > 0:
+                return
+            if _mapped_files.get(self.key) is self:
+                del _mapped_files[self.key]
+
+        self._file.close()
+        try:
+            self.buffer.release()
+            self._mmap.close()
+        except BufferError:
+            # 仍有切片在使用（如未关闭的流），由垃圾回收在最后一个引用消失时解除映射
+            logger.debug(f"映射仍在使用，延迟解除: {self.path.name}")
+
+class MappedStream(io.RawIOBase):
+    """共享映射上的只读原始流，每个流有自己的读取位置"""
+
+    def __init__(self, mapped):
+        self._view = mapped.buffer
+        self._fileno = mapped.fileno
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, target):
+        count = max(0, min(len(target), len(self._view) - self._position))
+        if count >= BULK_READ_SIZE and hasattr(os, 'preadv'):
+            with memoryview(target) as view:
+                count = os.preadv(self._fileno, [view[:count]], self._position)
+        else:
+            target[:count] = self._view[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = len(self._view) + offset
+        else:
+            raise ValueError(f"无效的whence: {whence}")
+        if position < 0:
+            raise ValueError(f"无效的位置: {position}")
+        self._position = position
+        return position
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        # 只断开对映射的引用，映射本身由MappedFile.release解除
+        self._view = memoryview(b'')
+        super().close()
+
+def map_file(path):
+    """
+    取得文件的共享映射（使用者计数+1，用完调用release）
+
+    同一进程中同一文件（路径、inode、大小、修改时间都相同）只映射一次；
+    文件内容变化后再打开会得到新的映射。
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        MappedFile 或 None: 无法映射（空文件等）时返回None
+    """
+    path = Path(path)
+    stat = path.stat()
+    if stat.st_size == 0:
+        return None
+
+    key = (os.path.realpath(path), stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        mapped = _mapped_files.get(key)
+        if mapped is None:
+            try:
+                mapped = MappedFile(key, path)
+            except (OSError, ValueError) as e:
+                logger.debug(f"无法映射文件，使用普通读取: {path.name}: {e}")
+                return None
+            _mapped_files[key] = mapped
+        mapped._refs += 1
+        return mapped
+
+def mapped_file_count():
+    """当前进程中的共享映射数量"""
+    with _lock:
+        return len(_mapped_files)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+内存上限 - 性能优化
+流式拆分时限制进程私有常驻内存（RSS）：PyPDF2会缓存所有解析过的对象（包括扫描件的
+整张图像），按页定期释放这些缓存，超过上限时再回收堆内存，仍然超过时中止处理，
+而不是被系统OOM杀掉。报告中记录处理该文档期间采样到的私有常驻内存峰值，
+以及进程启动以来的常驻内存峰值（批量处理时包含之前处理的文档）
+"""
+
+import gc
+import logging
+import os
+import sys
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 每访问多少页释放一次已解析对象缓存
+DEFAULT_RELEASE_INTERVAL = 32
+
+_MB = 1024 * 1024
+
+class MemoryLimitExceeded(MemoryError):
+    """释放缓存后常驻内存仍超过上限"""
+
+def parse_size(value):
+    """
+    解析大小字符串，如 '512M'、'2G'、'1048576'
+
+    Returns:
+        int: 字节数
+    """
+    value = str(value).strip().upper()
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+    if value.endswith('B'):
+        value = value[:-1]
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+def private_rss():
+    """
+    当前私有常驻内存（字节，不含文件映射页），无法读取时返回None
+
+    输入PDF经mmap读取（见pdf_input），访问过的文件页也计入RSS，
+    但它们属于页缓存、可随时回收，上限只针对私有内存。
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            fields = f.read().split()
+        return (int(fields[1]) - int(fields[2])) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def peak_rss():
+    """进程启动以来的常驻内存峰值（字节），无法读取时返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def release_memory():
+    """回收循环引用，并把空闲堆内存还给操作系统（仅glibc）"""
+    gc.collect()
+    try:
+        import ctypes
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def _format_mb(value):
+    return f"{value / _MB:.0f}MB" if value is not None else "未知"
+
+class MemoryGuard:
+    """
+    文档的内存守卫（挂在PDFDocument.memory_guard上）
+
+    每访问release_interval页、每写完一章释放一次文档的已解析对象缓存（以及已访问的
+    文件映射页）；私有常驻内存超过max_memory时回收堆内存后再检查，仍然超过则抛出MemoryLimitExceeded。
+    """
+
+    def __init__(self, document, max_memory=None, release_interval=DEFAULT_RELEASE_INTERVAL):
+        """
+        Args:
+            document: PDFDocument
+            max_memory: 私有常驻内存上限（字节，None表示只释放缓存、不检查上限）
+            release_interval: 每访问多少页释放一次缓存
+        """
+        self.document = document
+        self.max_memory = max_memory
+        self.release_interval = max(1, release_interval)
+        self.start_rss = private_rss()
+        self.max_sampled_rss = self.start_rss or 0
+        self.releases = 0
+        self.deep_releases = 0
+        self.exceeded = False
+        self._page_accesses = 0
+
+    def page_accessed(self):
+        """PDFDocument.get_page的回调：定期释放缓存并检查上限"""
+        self._page_accesses += 1
+        if self._page_accesses % self.release_interval == 0:
+            self.check()
+
+    def check(self, label=None):
+        """
+        释放已解析对象缓存并检查常驻内存
+
+        Args:
+            label: 超过上限时错误信息中的位置说明
+
+        Returns:
+            int: 当前私有常驻内存（字节，无法读取时为None）
+
+        Raises:
+            MemoryLimitExceeded: 回收后仍超过上限
+        """
+        self.document.release_objects()
+        self.releases += 1
+        rss = self._sample()
+        if self.max_memory is None or rss is None or rss <= self.max_memory:
+            return rss
+
+        release_memory()
+        self.deep_releases += 1
+        rss = self._sample()
+        if rss > self.max_memory:
+            self.exceeded = True
+            where = f"（{label}）" if label else ""
+            raise MemoryLimitExceeded(
+                f"常驻内存 {_format_mb(rss)} 超过上限 {_format_mb(self.max_memory)}{where}"
+            )
+        return rss
+
+    def report(self):
+        """
+        处理报告中的内存统计
+
+        peak_rss是守卫创建以来采样到的私有常驻内存峰值（只反映该文档的处理）；
+        process_peak_rss是进程启动以来的常驻内存峰值（含文件映射页和之前处理的文档）
+        """
+        self._sample()
+        return {
+            'max_memory': self.max_memory,
+            'start_rss': self.start_rss,
+            'peak_rss': self.max_sampled_rss if self.start_rss is not None else None,
+            'process_peak_rss': peak_rss(),
+            'releases': self.releases,
+            'deep_releases': self.deep_releases,
+            'exceeded': self.exceeded
+        }
+
+    def _sample(self):
+        rss = private_rss()
+        if rss is not None:
+            self.max_sampled_rss = max(self.max_sampled_rss, rss)
+        return rss
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+OCR后端 - 性能优化
+后端 = 栅格化(rasterize) + 识别(recognize)，通过注册表按名称选择：
+tesseract（pdf2image + tesserocr/pytesseract引擎）和进程内stub（合成文本、可配置延迟，
+用于在没有tesseract的环境中压测批量处理和调度）
+"""
+
+import logging
+import os
+import threading
+import time
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class OCREngine:
+    """
+    OCR识别引擎接口
+
+    引擎实例长期持有（每个进程/工作进程一个），语言模型只在创建时加载一次。
+    """
+
+    name = None
+
+    def __init__(self, lang):
+        self.lang = lang
+
+    @classmethod
+    def is_installed(cls):
+        """引擎依赖是否已安装（只检查导入，不加载模型）"""
+        raise NotImplementedError
+
+    def recognize(self, image):
+        """识别图像，返回文本"""
+        raise NotImplementedError
+
+    def recognize_with_confidence(self, image):
+        """识别图像，返回(文本, 平均词置信度0-100或None)"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放引擎资源"""
+
+class TesserocrEngine(OCREngine):
+    """
+    tesserocr引擎：进程内直接调用libtesseract
+
+    创建时加载一次traineddata（chi_sim有几十MB），之后每页只做识别，
+    不再写临时图像、不再启动tesseract子进程。
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, lang):
+        super().__init__(lang)
+        import tesserocr
+        self.api = tesserocr.PyTessBaseAPI(lang=lang)
+        # 同一个API实例不能被多个线程同时使用
+        self._lock = threading.Lock()
+        logger.info(f"✅ tesserocr引擎已加载语言模型: {lang}")
+
+    @classmethod
+    def is_installed(cls):
+        try:
+            import tesserocr
+            return True
+        except ImportError:
+            return False
+
+    def recognize(self, image):
+        with self._lock:
+            self.api.SetImage(image)
+            return self.api.GetUTF8Text().strip()
+
+    def recognize_with_confidence(self, image):
+        with self._lock:
+            self.api.SetImage(image)
+            text = self.api.GetUTF8Text().strip()
+            confidence = float(self.api.MeanTextConf()) if text else None
+        return text, confidence
+
+    def close(self):
+        if self.api is not None:
+            self.api.End()
+            self.api = None
+
+class PytesseractEngine(OCREngine):
+    """pytesseract引擎（回退方案）：每页写临时图像并启动一次tesseract进程"""
+
+    name = 'pytesseract'
+
+    @classmethod
+    def is_installed(cls):
+        try:
+            import pytesseract
+            return True
+        except ImportError:
+            return False
+
+    def recognize(self, image):
+        import pytesseract
+        return pytesseract.image_to_string(image, lang=self.lang).strip()
+
+    def recognize_with_confidence(self, image):
+        import pytesseract
+
+        # 只调用一次tesseract（image_to_data），按块/段/行重建文本
+        data = pytesseract.image_to_data(
+            image, lang=self.lang, output_type=pytesseract.Output.DICT
+        )
+        return _data_to_text(data), _mean_confidence(data)
+
+# 可用的OCR引擎，'auto'按顺序选择第一个已安装的
+OCR_ENGINES = {
+    'tesserocr': TesserocrEngine,
+    'pytesseract': PytesseractEngine
+}
+
+def resolve_engine_class(engine='auto'):
+    """
+    选择OCR引擎类
+
+    Args:
+        engine: 'auto'、'tesserocr' 或 'pytesseract'
+
+    Returns:
+        OCREngine子类，没有可用引擎时为None
+    """
+    if engine == 'auto':
+        candidates = list(OCR_ENGINES.values())
+    elif engine in OCR_ENGINES:
+        candidates = [OCR_ENGINES[engine]]
+    else:
+        raise ValueError(f"未知的OCR引擎: {engine} (可选: auto, {', '.join(OCR_ENGINES)})")
+
+    for engine_class in candidates:
+        if engine_class.is_installed():
+            return engine_class
+    return None
+
+# 后端注册表：名称 -> OCRBackend子类
+OCR_BACKENDS = {}
+
+def register_ocr_backend(backend_class):
+    """注册OCR后端（类装饰器）"""
+    OCR_BACKENDS[backend_class.name] = backend_class
+    return backend_class
+
+class OCRBackend:
+    """
+    OCR后端接口
+
+    后端实例长期持有（每个进程/工作进程一个），栅格化和识别都通过它完成，
+    方便替换为更快的引擎或离线替身。
+    """
+
+    name = None
+
+    # 识别结果不同于tesseract的后端使用独立的OCR缓存命名空间
+    cache_namespace = None
+
+    def __init__(self, lang, **options):
+        self.lang = lang
+        self.options = options
+
+    def is_available(self):
+        """后端依赖是否齐全"""
+        raise NotImplementedError
+
+    def rasterize(self, pdf_path, first_page, last_page, dpi, output_folder=None, paths_only=False):
+        """
+        渲染一段连续页面
+
+        Args:
+            pdf_path: PDF文件路径
+            first_page: 起始页面编号（从1开始）
+            last_page: 结束页面编号（从1开始，包含）
+            dpi: 图像分辨率
+            output_folder: 图像输出目录（可选）
+            paths_only: 只返回图像文件路径（需要output_folder）
+
+        Returns:
+            list: PIL Image对象列表，paths_only时为文件路径列表
+        """
+        raise NotImplementedError
+
+    def recognize(self, image):
+        """识别图像，返回文本"""
+        raise NotImplementedError
+
+    def recognize_with_confidence(self, image):
+        """识别图像，返回(文本, 平均词置信度0-100或None)"""
+        raise NotImplementedError
+
+    def describe(self):
+        """报告和日志中使用的后端名称"""
+        return self.name
+
+    def close(self):
+        """释放后端资源"""
+
+@register_ocr_backend
+class TesseractBackend(OCRBackend):
+    """tesseract后端：pdf2image(poppler)栅格化 + tesserocr/pytesseract识别"""
+
+    name = 'tesseract'
+
+    def __init__(self, lang, engine='auto', **options):
+        super().__init__(lang, **options)
+        self.engine_class = resolve_engine_class(engine)
+        self._engine = None
+        # 调度和流水线模式下多个线程可能同时首次识别，引擎只能创建一个
+        self._engine_lock = threading.Lock()
+
+    def is_available(self):
+        available = True
+
+        if self.engine_class is not None:
+            logger.info(f"✅ {self.engine_class.name}可用，语言: {self.lang}")
+        else:
+            available = False
+            logger.warning("⚠️  tesserocr/pytesseract未安装，OCR功能不可用")
+            logger.info("安装命令: pip install tesserocr 或 pip install pytesseract")
+
+        try:
+            import pdf2image
+            logger.info("✅ pdf2image可用")
+        except ImportError:
+            available = False
+            logger.warning("⚠️  pdf2image未安装，OCR功能不可用")
+            logger.info("安装命令: pip install pdf2image")
+
+        try:
+            from PIL import Image
+            logger.info("✅ PIL/Pillow可用")
+        except ImportError:
+            available = False
+            logger.warning("⚠️  PIL/Pillow未安装，OCR功能不可用")
+            logger.info("安装命令: pip install Pillow")
+
+        return available
+
+    @property
+    def engine(self):
+        """
+        OCR引擎实例（首次识别时创建，之后在本进程内复用）
+
+        tesserocr初始化失败（如缺少traineddata）时回退到pytesseract。
+        """
+        engine = self._engine
+        if engine is not None:
+            return engine
+
+        with self._engine_lock:
+            if self._engine is None:
+                try:
+                    self._engine = self.engine_class(self.lang)
+                except Exception as e:
+                    if self.engine_class is PytesseractEngine or not PytesseractEngine.is_installed():
+                        raise
+                    logger.warning(f"{self.engine_class.name}引擎初始化失败: {e}，回退到pytesseract")
+                    self.engine_class = PytesseractEngine
+                    self._engine = PytesseractEngine(self.lang)
+            return self._engine
+
+    def rasterize(self, pdf_path, first_page, last_page, dpi, output_folder=None, paths_only=False):
+        import pdf2image
+
+        options = {
+            'first_page': first_page,
+            'last_page': last_page,
+            'dpi': dpi
+        }
+        if output_folder is not None:
+            options['output_folder'] = str(output_folder)
+            options['paths_only'] = paths_only
+
+        return pdf2image.convert_from_path(str(pdf_path), **options)
+
+    def recognize(self, image):
+        return self.engine.recognize(image)
+
+    def recognize_with_confidence(self, image):
+        return self.engine.recognize_with_confidence(image)
+
+    def describe(self):
+        engine_name = self.engine_class.name if self.engine_class is not None else 'none'
+        return f"{self.name}/{engine_name}"
+
+    def close(self):
+        with self._engine_lock:
+            if self._engine is not None:
+                self._engine.close()
+                self._engine = None
+
+@register_ocr_backend
+class StubBackend(OCRBackend):
+    """
+    进程内替身后端：不需要tesseract和poppler
+
+    栅格化按页面尺寸和DPI生成带横条的灰度图像（每页横条长度不同），
+    识别按图像内容返回确定的合成文本。两步都可以配置固定延迟，
+    模拟真实引擎的耗时，用于压测批量处理和调度。
+
+    选项:
+        latency_ms: 每页识别延迟（毫秒）
+        raster_ms: 每页渲染延迟（毫秒）
+        confidence: 返回的置信度
+        fail_pages: 渲染时失败的页码（从1开始，与rasterize一致；多个用+连接，如 fail_pages=3+7），测试故障隔离用
+    """
+
+    name = 'stub'
+    cache_namespace = 'stub'
+
+    # Letter页面尺寸（英寸）
+    PAGE_SIZE = (8.5, 11)
+
+    def __init__(self, lang, latency_ms=0, raster_ms=0, confidence=90.0, fail_pages='', **options):
+        super().__init__(lang, **options)
+        self.latency_ms = float(latency_ms)
+        self.raster_ms = float(raster_ms)
+        self.confidence = float(confidence)
+        self.fail_pages = {int(page) for page in str(fail_pages).split('+') if page.strip()}
+
+    def is_available(self):
+        try:
+            from PIL import Image
+        except ImportError:
+            logger.warning("⚠️  PIL/Pillow未安装，stub后端不可用")
+            return False
+        logger.info(f"✅ stub OCR后端 (识别 {self.latency_ms:g} 毫秒/页, 渲染 {self.raster_ms:g} 毫秒/页)")
+        return True
+
+    def rasterize(self, pdf_path, first_page, last_page, dpi, output_folder=None, paths_only=False):
+        from PIL import Image, ImageDraw
+
+        width, height = int(self.PAGE_SIZE[0] * dpi), int(self.PAGE_SIZE[1] * dpi)
+        step = max(dpi // 4, 1)
+        results = []
+
+        for page in range(first_page, last_page + 1):
+            _sleep_ms(self.raster_ms)
+            if page in self.fail_pages:
+                raise RuntimeError(f"stub后端模拟渲染失败: 第 {page} 页")
+
+            image = Image.new('L', (width, height), 255)
+            draw = ImageDraw.Draw(image)
+            for y in range(dpi, height - dpi, step):
+                draw.rectangle([dpi, y, width - dpi - (page * 37) % dpi, y + dpi // 12], fill=0)
+
+            if output_folder is not None:
+                path = os.path.join(str(output_folder), f"stub-{page:05d}.png")
+                image.save(path)
+                results.append(path if paths_only else Image.open(path))
+            else:
+                results.append(image)
+
+        return results
+
+    def recognize(self, image):
+        _sleep_ms(self.latency_ms)
+        # 由图像内容决定文本：同一页多次识别结果相同
+        histogram = image.histogram()
+        dark = sum(histogram[:128])
+        return f"Chapter {dark % 97}\nstub ocr text {image.size[0]}x{image.size[1]}\nbody line"
+
+    def recognize_with_confidence(self, image):
+        return self.recognize(image), self.confidence
+
+def create_ocr_backend(spec='auto', lang='eng+chi_sim'):
+    """
+    按名称创建OCR后端
+
+    spec格式为 "名称" 或 "名称:选项=值,选项=值"，例如 "stub:latency_ms=50"。
+    'auto'、'tesserocr'、'pytesseract' 表示tesseract后端使用对应的识别引擎。
+
+    Args:
+        spec: 后端描述
+        lang: OCR语言
+
+    Returns:
+        OCRBackend: 后端实例
+    """
+    name, _, option_text = (spec or 'auto').partition(':')
+    name = name.strip()
+
+    options = {}
+    for item in filter(None, (part.strip() for part in option_text.split(','))):
+        key, separator, value = item.partition('=')
+        if not separator:
+            raise ValueError(f"OCR后端选项格式错误: {item} (应为 选项=值)")
+        options[key.strip()] = _parse_option_value(value.strip())
+
+    if name == 'auto' or name in OCR_ENGINES:
+        return TesseractBackend(lang, engine=name, **options)
+
+    if name not in OCR_BACKENDS:
+        choices = ', '.join(['auto', *OCR_ENGINES, *OCR_BACKENDS])
+        raise ValueError(f"未知的OCR后端: {name} (可选: {choices})")
+
+    return OCR_BACKENDS[name](lang, **options)
+
+def available_backend_names():
+    """命令行可选的后端名称"""
+    return ['auto', *OCR_ENGINES, *OCR_BACKENDS]
+
+def _parse_option_value(value):
+    """后端选项值：数字转为int/float，其余保持字符串"""
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            continue
+    return value
+
+def _sleep_ms(milliseconds):
+    """模拟固定延迟"""
+    if milliseconds > 0:
+        time.sleep(milliseconds / 1000)
+
+def _data_to_text(data):
+    """把image_to_data的逐词结果按块/段/行拼回文本（段落之间空一行）"""
+    words = data.get('text', [])
+    columns = [data.get(key) or [0] * len(words) for key in ('block_num', 'par_num', 'line_num')]
+
+    lines = []
+    current_line = None
+    current_par = None
+
+    for i, word in enumerate(words):
+        word = str(word).strip()
+        if not word:
+            continue
+
+        block, par, line = (column[i] for column in columns)
+        if (block, par, line) != current_line:
+            if current_par is not None and (block, par) != current_par:
+                lines.append('')
+            lines.append(word)
+            current_line, current_par = (block, par, line), (block, par)
+        else:
+            lines[-1] += ' ' + word
+
+    return '\n'.join(lines)
+
+def _mean_confidence(data):
+    """image_to_data中非空词的平均置信度（-1表示非文字块，不计入）"""
+    confidences = []
+    for word, confidence in zip(data.get('text', []), data.get('conf', [])):
+        try:
+            confidence = float(confidence)
+        except (TypeError, ValueError):
+            continue
+        if confidence >= 0 and str(word).strip():
+            confidences.append(confidence)
+
+    if not confidences:
+        return None
+    return round(sum(confidences) / len(confidences), 1)
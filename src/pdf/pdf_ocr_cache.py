@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+OCR结果缓存 - 性能优化
+按内容寻址的持久化OCR缓存（SQLite），重复处理同一扫描件时跳过栅格化和OCR；
+一个缓存对象可以在多个线程间共享（批量调度时每个文档一个线程），连接访问由锁串行化
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 默认缓存上限（文本字节数）
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+class OCRCache:
+    """OCR结果缓存 - 键为文档内容哈希+页码+OCR参数，按LRU淘汰"""
+
+    DB_NAME = 'ocr_cache.sqlite3'
+
+    def __init__(self, cache_dir, max_size=DEFAULT_CACHE_SIZE):
+        """
+        初始化OCR缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_size: 缓存文本总字节数上限，超出后淘汰最久未使用的条目
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / self.DB_NAME
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # 连接在线程间共享（check_same_thread=False），所有访问都在self._lock内
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS ocr_results ('
+            ' key TEXT PRIMARY KEY,'
+            ' text TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' last_access REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_ocr_results_access ON ocr_results(last_access)'
+        )
+        self._conn.commit()
+        self._size = self._total_size()
+
+        logger.info(f"OCR缓存: {self.db_path} ({self._size / 1024 / 1024:.1f} MB / "
+                    f"{self.max_size / 1024 / 1024:.0f} MB)")
+
+    @staticmethod
+    def make_key(doc_hash, page_num, dpi, lang, enable_preprocessing, namespace=None):
+        """
+        生成缓存键
+
+        Args:
+            doc_hash: 文档内容哈希
+            page_num: 页面编号（从0开始）
+            dpi: 栅格化分辨率
+            lang: OCR语言
+            enable_preprocessing: 是否启用预处理
+            namespace: OCR后端的缓存命名空间（None表示tesseract的结果）
+
+        Returns:
+            str: 缓存键
+        """
+        raw = f"{doc_hash}|{page_num}|{dpi}|{lang}|{int(bool(enable_preprocessing))}"
+        if namespace:
+            raw += f"|{namespace}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        读取缓存（命中时刷新访问时间，命中统计由lookup负责）
+
+        Returns:
+            str 或 None: 缓存的OCR文本
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT text FROM ocr_results WHERE key = ?', (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            self._conn.execute(
+                'UPDATE ocr_results SET last_access = ? WHERE key = ?', (time.time(), key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def lookup(self, keys):
+        """
+        批量检查哪些键已缓存，并计入命中/未命中统计
+
+        Returns:
+            set: 已缓存的键
+        """
+        keys = list(keys)
+        found = set()
+
+        with self._lock:
+            # SQLite参数数量有限制，分批查询
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f'SELECT key FROM ocr_results WHERE key IN ({placeholders})', batch
+                ).fetchall()
+                found.update(row[0] for row in rows)
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, key, text):
+        """写入缓存，超出上限时按LRU淘汰"""
+        size = len(text.encode('utf-8'))
+
+        with self._lock:
+            old = self._conn.execute(
+                'SELECT size FROM ocr_results WHERE key = ?', (key,)
+            ).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO ocr_results (key, text, size, last_access) VALUES (?, ?, ?, ?)',
+                (key, text, size, time.time())
+            )
+            self._conn.commit()
+
+            self._size += size - (old[0] if old else 0)
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        """淘汰最久未使用的条目，直到低于上限的90%（调用方持有self._lock）"""
+        # 多个进程可能共享同一缓存，淘汰前重新统计
+        self._size = self._total_size()
+        target = int(self.max_size * 0.9)
+
+        while self._size > target:
+            rows = self._conn.execute(
+                'SELECT key, size FROM ocr_results ORDER BY last_access LIMIT 100'
+            ).fetchall()
+            if not rows:
+                break
+
+            for key, size in rows:
+                self._conn.execute('DELETE FROM ocr_results WHERE key = ?', (key,))
+                self._size -= size
+                self.evictions += 1
+                if self._size <= target:
+                    break
+
+        self._conn.commit()
+        logger.debug(f"OCR缓存淘汰后大小: {self._size / 1024 / 1024:.1f} MB")
+
+    def _total_size(self):
+        """缓存文本总字节数"""
+        row = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM ocr_results').fetchone()
+        return row[0]
+
+    def stats(self):
+        """缓存统计信息"""
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM ocr_results').fetchone()[0]
+        return {
+            'cache_dir': str(self.cache_dir),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': entries,
+            'size_bytes': self._size,
+            'max_size_bytes': self.max_size
+        }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
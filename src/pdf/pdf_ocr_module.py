@@ -7,71 +7,62 @@ PDF OCR模块 - Sprint 2.1
 import os
 import sys
 import logging
+import tempfile
 from pathlib import Path
 
+from pdf_document import use_document
+from pdf_ocr_backends import create_ocr_backend
+
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 栅格化窗口默认大小（一次pdftoppm调用渲染的最大页数）
+DEFAULT_RASTER_WINDOW = 8
+
 class PDFOCR:
     """PDF OCR处理器 - 改进版本（Sprint 2.2）"""
     
-    def __init__(self, lang='eng+chi_sim', enable_preprocessing=True):
+    def __init__(self, lang='eng+chi_sim', enable_preprocessing=True, backend='auto'):
         """
         初始化OCR处理器
         
         Args:
             lang: OCR语言，默认英文+简体中文
             enable_preprocessing: 是否启用图像预处理
+            backend: OCR后端（见pdf_ocr_backends：'auto'优先tesserocr、回退pytesseract，
+                     'stub'为进程内替身，可带选项如 'stub:latency_ms=50'）
         """
         self.lang = lang
         self.enable_preprocessing = enable_preprocessing
+        self.backend = create_ocr_backend(backend, lang)
         self._check_dependencies()
     
     def _check_dependencies(self):
-        """检查OCR依赖是否可用"""
-        try:
-            import pytesseract
-            self.tesseract_available = True
-            logger.info(f"✅ pytesseract可用，语言: {self.lang}")
-        except ImportError:
-            self.tesseract_available = False
-            logger.warning("⚠️  pytesseract未安装，OCR功能不可用")
-            logger.info("安装命令: pip install pytesseract")
-        
-        try:
-            import pdf2image
-            self.pdf2image_available = True
-            logger.info("✅ pdf2image可用")
-        except ImportError:
-            self.pdf2image_available = False
-            logger.warning("⚠️  pdf2image未安装，OCR功能不可用")
-            logger.info("安装命令: pip install pdf2image")
-        
-        try:
-            from PIL import Image
-            self.pil_available = True
-            logger.info("✅ PIL/Pillow可用")
-        except ImportError:
-            self.pil_available = False
-            logger.warning("⚠️  PIL/Pillow未安装，OCR功能不可用")
-            logger.info("安装命令: pip install Pillow")
+        """检查OCR后端依赖是否可用"""
+        self.backend_available = self.backend.is_available()
     
     def is_ocr_available(self):
         """检查OCR功能是否可用"""
-        return all([
-            self.tesseract_available,
-            self.pdf2image_available,
-            self.pil_available
-        ])
+        return self.backend_available
+    
+    @property
+    def backend_name(self):
+        """当前OCR后端名称（tesseract后端包含识别引擎，如 tesseract/tesserocr）"""
+        return self.backend.describe()
     
-    def extract_text_from_page(self, pdf_path, page_num):
+    def close(self):
+        """释放OCR后端"""
+        self.backend.close()
+    
+    def extract_text_from_page(self, pdf_path, page_num, document=None):
         """
         从PDF的指定页面提取文本（OCR）
         
         Args:
             pdf_path: PDF文件路径
             page_num: 页面编号（从0开始）
+            document: 共享的PDFDocument句柄（可选，避免重复解析）
             
         Returns:
             str: 提取的文本，如果失败返回空字符串
@@ -81,26 +72,20 @@ class PDFOCR:
             return ""
         
         try:
-            import pytesseract
-            import pdf2image
-            from PIL import Image
-            
             # 验证文件
             pdf_path = Path(pdf_path)
             if not pdf_path.exists():
                 logger.error(f"PDF文件不存在: {pdf_path}")
                 return ""
             
-            # 获取PDF总页数
+            # 获取PDF总页数（复用共享文档句柄）
             try:
-                import PyPDF2
-                with open(pdf_path, 'rb') as f:
-                    pdf_reader = PyPDF2.PdfReader(f)
-                    total_pages = len(pdf_reader.pages)
-                    
-                    if page_num >= total_pages:
-                        logger.error(f"页面编号超出范围: {page_num} (总页数: {total_pages})")
-                        return ""
+                with use_document(pdf_path, document) as doc:
+                    total_pages = doc.total_pages
+                
+                if page_num >= total_pages:
+                    logger.error(f"页面编号超出范围: {page_num} (总页数: {total_pages})")
+                    return ""
             except Exception as e:
                 logger.warning(f"无法获取PDF页数: {e}")
                 # 继续尝试，假设页面存在
@@ -110,13 +95,7 @@ class PDFOCR:
             # 将PDF页面转换为图像
             # 注意：pdf2image需要poppler，这里使用简单模式
             try:
-                # 尝试直接使用pdf2image
-                images = pdf2image.convert_from_path(
-                    str(pdf_path),
-                    first_page=page_num + 1,
-                    last_page=page_num + 1,
-                    dpi=150  # 中等分辨率
-                )
+                images = self.rasterize_pages(pdf_path, page_num, page_num, dpi=150)  # 中等分辨率
                 
                 if not images:
                     logger.error("无法将PDF页面转换为图像")
@@ -131,9 +110,9 @@ class PDFOCR:
             
             # OCR处理
             try:
-                text = pytesseract.image_to_string(image, lang=self.lang)
+                text = self.recognize_image(image, preprocess=False)
                 logger.info(f"✅ OCR完成，提取 {len(text)} 个字符")
-                return text.strip()
+                return text
                 
             except Exception as e:
                 logger.error(f"OCR处理失败: {e}")
@@ -143,13 +122,14 @@ class PDFOCR:
             logger.error(f"提取文本时发生错误: {e}")
             return ""
     
-    def extract_text_from_pdf(self, pdf_path, pages=None):
+    def extract_text_from_pdf(self, pdf_path, pages=None, document=None):
         """
         从PDF的多个页面提取文本
         
         Args:
             pdf_path: PDF文件路径
             pages: 页面列表，如[0, 1, 2]，None表示所有页面
+            document: 共享的PDFDocument句柄（可选）
             
         Returns:
             dict: {页面编号: 文本内容}
@@ -159,31 +139,28 @@ class PDFOCR:
             return {}
         
         try:
-            import PyPDF2
-            
             pdf_path = Path(pdf_path)
             if not pdf_path.exists():
                 logger.error(f"PDF文件不存在: {pdf_path}")
                 return {}
             
-            # 获取PDF总页数
-            with open(pdf_path, 'rb') as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                total_pages = len(pdf_reader.pages)
-            
-            # 确定要处理的页面
-            if pages is None:
-                pages_to_process = list(range(total_pages))
-            else:
-                pages_to_process = [p for p in pages if 0 <= p < total_pages]
-            
-            logger.info(f"开始批量OCR处理: {pdf_path.name}")
-            logger.info(f"总页数: {total_pages}, 处理页数: {len(pages_to_process)}")
-            
-            results = {}
-            for page_num in pages_to_process:
-                text = self.extract_text_from_page(pdf_path, page_num)
-                results[page_num] = text
+            # 整个批次只打开并解析一次PDF
+            with use_document(pdf_path, document) as doc:
+                total_pages = doc.total_pages
+                
+                # 确定要处理的页面
+                if pages is None:
+                    pages_to_process = list(range(total_pages))
+                else:
+                    pages_to_process = [p for p in pages if 0 <= p < total_pages]
+                
+                logger.info(f"开始批量OCR处理: {pdf_path.name}")
+                logger.info(f"总页数: {total_pages}, 处理页数: {len(pages_to_process)}")
+                
+                # 按窗口批量栅格化，避免每页启动一次pdftoppm
+                results = self.extract_text_from_pages(
+                    pdf_path, pages_to_process, dpi=150, preprocess=False
+                )
             
             # 统计
             total_chars = sum(len(text) for text in results.values())
@@ -200,13 +177,14 @@ class PDFOCR:
             logger.error(f"批量提取文本时发生错误: {e}")
             return {}
     
-    def analyze_scanned_document(self, pdf_path, sample_pages=3):
+    def analyze_scanned_document(self, pdf_path, sample_pages=3, document=None):
         """
         分析扫描件文档特征
         
         Args:
             pdf_path: PDF文件路径
             sample_pages: 采样页面数
+            document: 共享的PDFDocument句柄（可选）
             
         Returns:
             dict: 分析结果
@@ -216,8 +194,6 @@ class PDFOCR:
             return {}
         
         try:
-            import PyPDF2
-            import pdf2image
             from PIL import Image
             import numpy as np
             
@@ -226,11 +202,32 @@ class PDFOCR:
                 logger.error(f"PDF文件不存在: {pdf_path}")
                 return {}
             
-            # 获取PDF总页数
-            with open(pdf_path, 'rb') as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                total_pages = len(pdf_reader.pages)
+            # 获取PDF总页数和页面结构分类（结构分类不需要栅格化）
+            with use_document(pdf_path, document) as doc:
+                total_pages = doc.total_pages
                 sample_pages = min(sample_pages, total_pages)
+                structure = doc.structure
+            
+            # 结构分类已能确定类型时直接返回，不再栅格化采样页
+            if structure['pdf_type'] != 'unknown':
+                scanned_probability = structure['is_scanned_probability']
+                results = {
+                    'pdf_name': pdf_path.name,
+                    'total_pages': total_pages,
+                    'sample_pages': structure['sampled_pages'],
+                    'is_scanned_probability': scanned_probability,
+                    'detection_metrics': {
+                        'avg_image_coverage': structure['avg_image_coverage'],
+                        'avg_content_length': structure['avg_content_length'],
+                        'page_kinds': structure['page_kinds']
+                    },
+                    'recommendation': self._scan_recommendation(scanned_probability),
+                    'method': 'structure'
+                }
+                logger.info(f"扫描件分析完成（页面结构，{structure['elapsed_ms']:.1f} 毫秒）:")
+                logger.info(f"  扫描件概率: {scanned_probability:.1%}")
+                logger.info(f"  建议: {results['recommendation']}")
+                return results
             
             logger.info(f"分析扫描件特征: {pdf_path.name}")
             logger.info(f"采样页面: {sample_pages}/{total_pages}")
@@ -241,7 +238,8 @@ class PDFOCR:
                 'sample_pages': sample_pages,
                 'is_scanned_probability': 0.0,
                 'detection_metrics': {},
-                'recommendation': ''
+                'recommendation': '',
+                'method': 'raster'
             }
             
             # 检测指标
@@ -258,12 +256,7 @@ class PDFOCR:
             for i in range(sample_pages):
                 try:
                     # 转换为图像
-                    images = pdf2image.convert_from_path(
-                        str(pdf_path),
-                        first_page=i + 1,
-                        last_page=i + 1,
-                        dpi=100  # 低分辨率用于分析
-                    )
+                    images = self.rasterize_pages(pdf_path, i, i, dpi=100)  # 低分辨率用于分析
                     
                     if not images:
                         continue
@@ -313,12 +306,7 @@ class PDFOCR:
                 results['detection_metrics'] = {k: round(v, 3) for k, v in metrics.items()}
                 
                 # 生成建议
-                if scanned_probability > 0.7:
-                    results['recommendation'] = '高概率扫描件，建议使用OCR模式'
-                elif scanned_probability > 0.4:
-                    results['recommendation'] = '可能包含扫描页面，建议测试OCR'
-                else:
-                    results['recommendation'] = '可能是文本PDF，可直接处理'
+                results['recommendation'] = self._scan_recommendation(scanned_probability)
             
             logger.info(f"扫描件分析完成:")
             logger.info(f"  扫描件概率: {results['is_scanned_probability']:.1%}")
@@ -332,10 +320,23 @@ class PDFOCR:
             logger.error(f"分析扫描件特征时出错: {e}")
             return {}
     
+    @staticmethod
+    def _scan_recommendation(scanned_probability):
+        """根据扫描件概率生成处理建议"""
+        if scanned_probability > 0.7:
+            return '高概率扫描件，建议使用OCR模式'
+        elif scanned_probability > 0.4:
+            return '可能包含扫描页面，建议测试OCR'
+        else:
+            return '可能是文本PDF，可直接处理'
+    
     def preprocess_image(self, image):
         """
         预处理图像以提高OCR准确性
         
+        灰度 -> 中值去噪 -> 直方图均衡化 -> 自适应二值化，
+        除去噪外都在同一个uint8数组上原地完成（见pdf_image_preprocess）。
+        
         Args:
             image: PIL Image对象
             
@@ -346,53 +347,190 @@ class PDFOCR:
             return image
         
         try:
-            from PIL import Image, ImageFilter, ImageOps
-            import numpy as np
+            from pdf_image_preprocess import preprocess_for_ocr
             
             logger.debug("开始图像预处理")
+            binary_image = preprocess_for_ocr(image)
+            logger.debug("图像预处理完成")
+            return binary_image
             
-            # 1. 转换为灰度图
-            if image.mode != 'L':
-                gray_image = image.convert('L')
-            else:
-                gray_image = image
+        except Exception as e:
+            logger.warning(f"图像预处理失败: {e}, 使用原图")
+            return image
+    
+    def rasterize_pages(self, pdf_path, first_page, last_page, dpi=200,
+                        output_folder=None, paths_only=False):
+        """
+        一次后端调用渲染一段连续页面（tesseract后端为一次pdftoppm调用）
+        
+        Args:
+            pdf_path: PDF文件路径
+            first_page: 起始页面编号（从0开始）
+            last_page: 结束页面编号（从0开始，包含）
+            dpi: 图像分辨率
+            output_folder: 图像输出目录（可选，渲染到磁盘而不是内存）
+            paths_only: 只返回图像文件路径（需要output_folder）
             
-            # 2. 基础去噪（中值滤波）
-            try:
-                denoised = gray_image.filter(ImageFilter.MedianFilter(size=3))
-            except:
-                denoised = gray_image  # 如果失败，使用原图
+        Returns:
+            list: PIL Image对象列表，paths_only时为文件路径列表
+        """
+        return self.backend.rasterize(pdf_path, first_page + 1, last_page + 1, dpi,
+                                      output_folder=output_folder, paths_only=paths_only)
+    
+    def iter_page_images(self, pdf_path, page_nums, dpi=200,
+                         window_size=DEFAULT_RASTER_WINDOW, paths_only=False):
+        """
+        按窗口批量栅格化页面，逐页产出图像
+        
+        连续页面按window_size分组，每组只启动一次pdftoppm。
+        某个窗口渲染失败时退回逐页渲染，失败页面产出None，
+        不影响其他页面；窗口中途失败时已产出的页面不再重复产出。
+        
+        Args:
+            pdf_path: PDF文件路径
+            page_nums: 页面编号列表（从0开始）
+            dpi: 图像分辨率
+            window_size: 每个窗口的最大页数
+            paths_only: 渲染到临时目录，逐页从磁盘加载（不在内存中保留整个窗口）
             
-            # 3. 增强对比度（直方图均衡化）
-            try:
-                enhanced = ImageOps.equalize(denoised)
-            except:
-                enhanced = denoised
+        Yields:
+            (页面编号, PIL Image或None)
+        """
+        from PIL import Image
+        
+        for window in _split_into_windows(page_nums, window_size):
+            first_page, last_page = window[0], window[-1]
+            yielded = set()
             
-            # 4. 二值化（自适应阈值）
             try:
-                img_array = np.array(enhanced)
-                # 简单阈值处理
-                threshold = np.median(img_array)
-                binary_array = (img_array > threshold).astype(np.uint8) * 255
-                binary_image = Image.fromarray(binary_array)
-            except:
-                binary_image = enhanced
+                if paths_only:
+                    with tempfile.TemporaryDirectory(prefix='rickygb_raster_') as temp_dir:
+                        paths = self.rasterize_pages(pdf_path, first_page, last_page, dpi=dpi,
+                                                     output_folder=temp_dir, paths_only=True)
+                        if len(paths) != len(window):
+                            raise ValueError(f"渲染页数不匹配: {len(paths)}/{len(window)}")
+                        
+                        for page_num, image_path in zip(window, sorted(paths)):
+                            with Image.open(image_path) as image:
+                                image.load()
+                                yielded.add(page_num)
+                                yield page_num, image
+                            os.remove(image_path)
+                else:
+                    images = self.rasterize_pages(pdf_path, first_page, last_page, dpi=dpi)
+                    if len(images) != len(window):
+                        raise ValueError(f"渲染页数不匹配: {len(images)}/{len(window)}")
+                    
+                    for page_num, image in zip(window, images):
+                        yielded.add(page_num)
+                        yield page_num, image
+                    del images
+                continue
+                
+            except Exception as e:
+                logger.warning(f"批量渲染页 {first_page + 1}-{last_page + 1} 失败: {e}，改为逐页渲染")
             
-            logger.debug("图像预处理完成")
-            return binary_image
+            # 窗口失败时逐页渲染尚未产出的页面，隔离失败页面
+            for page_num in window:
+                if page_num in yielded:
+                    continue
+                try:
+                    images = self.rasterize_pages(pdf_path, page_num, page_num, dpi=dpi)
+                    yield page_num, images[0] if images else None
+                except Exception as e:
+                    logger.warning(f"第 {page_num + 1} 页渲染失败: {e}")
+                    yield page_num, None
+    
+    def recognize_image(self, image, preprocess=None):
+        """
+        对已渲染的页面图像执行OCR
+        
+        Args:
+            image: PIL Image对象
+            preprocess: 是否预处理，None表示使用enable_preprocessing设置
             
-        except Exception as e:
-            logger.warning(f"图像预处理失败: {e}, 使用原图")
-            return image
+        Returns:
+            str: 识别的文本
+        """
+        processed_image = self._prepare_image(image, preprocess)
+        
+        # OCR处理（复用本进程的OCR后端）
+        return self.backend.recognize(processed_image)
+    
+    def recognize_image_with_confidence(self, image, preprocess=None):
+        """
+        对已渲染的页面图像执行OCR，同时返回平均词置信度
+        
+        Args:
+            image: PIL Image对象
+            preprocess: 是否预处理，None表示使用enable_preprocessing设置
+            
+        Returns:
+            (str, float或None): 识别的文本、平均词置信度（0-100，没有识别出词时为None）
+        """
+        processed_image = self._prepare_image(image, preprocess)
+        return self.backend.recognize_with_confidence(processed_image)
+    
+    def _prepare_image(self, image, preprocess):
+        """按设置预处理OCR输入图像"""
+        if preprocess is None:
+            preprocess = self.enable_preprocessing
+        
+        # 预处理图像
+        if preprocess:
+            logger.debug(f"使用预处理图像进行OCR")
+            return self.preprocess_image(image)
+        
+        logger.debug(f"使用原始图像进行OCR")
+        return image
     
-    def extract_text_with_preprocessing(self, pdf_path, page_num):
+    def extract_text_from_pages(self, pdf_path, page_nums, dpi=200, preprocess=None,
+                                window_size=DEFAULT_RASTER_WINDOW, paths_only=False):
+        """
+        批量OCR多个页面（窗口化栅格化）
+        
+        Args:
+            pdf_path: PDF文件路径
+            page_nums: 页面编号列表（从0开始）
+            dpi: 图像分辨率
+            preprocess: 是否预处理，None表示使用enable_preprocessing设置
+            window_size: 每个窗口的最大页数
+            paths_only: 渲染到临时目录而不是内存
+            
+        Returns:
+            dict: {页面编号: 文本内容}，失败页面为空字符串
+        """
+        results = {}
+        
+        if not self.is_ocr_available():
+            logger.error("OCR功能不可用")
+            return results
+        
+        for page_num, image in self.iter_page_images(pdf_path, page_nums, dpi=dpi,
+                                                     window_size=window_size,
+                                                     paths_only=paths_only):
+            if image is None:
+                results[page_num] = ""
+                continue
+            
+            try:
+                text = self.recognize_image(image, preprocess=preprocess)
+                logger.info(f"OCR完成: 第 {page_num + 1} 页，提取 {len(text)} 字符")
+                results[page_num] = text
+            except Exception as e:
+                logger.error(f"第 {page_num + 1} 页OCR失败: {e}")
+                results[page_num] = ""
+        
+        return results
+    
+    def extract_text_with_preprocessing(self, pdf_path, page_num, dpi=200):
         """
         提取文本（带预处理）
         
         Args:
             pdf_path: PDF文件路径
             page_num: 页面编号
+            dpi: 图像分辨率（默认200，较高分辨率用于OCR）
             
         Returns:
             str: 提取的文本
@@ -402,36 +540,16 @@ class PDFOCR:
             return ""
         
         try:
-            import pytesseract
-            import pdf2image
-            from PIL import Image
-            
             pdf_path = Path(pdf_path)
             
             # 将PDF页面转换为图像
-            images = pdf2image.convert_from_path(
-                str(pdf_path),
-                first_page=page_num + 1,
-                last_page=page_num + 1,
-                dpi=200  # 较高分辨率用于OCR
-            )
+            images = self.rasterize_pages(pdf_path, page_num, page_num, dpi=dpi)
             
             if not images:
                 logger.error("无法将PDF页面转换为图像")
                 return ""
             
-            image = images[0]
-            
-            # 预处理图像
-            if self.enable_preprocessing:
-                processed_image = self.preprocess_image(image)
-                logger.debug(f"使用预处理图像进行OCR")
-            else:
-                processed_image = image
-                logger.debug(f"使用原始图像进行OCR")
-            
-            # OCR处理
-            text = pytesseract.image_to_string(processed_image, lang=self.lang)
+            text = self.recognize_image(images[0])
             
             char_count = len(text)
             logger.info(f"OCR完成: 第 {page_num + 1} 页，提取 {char_count} 字符")
@@ -439,12 +557,29 @@ class PDFOCR:
             if char_count < 10:
                 logger.warning(f"提取文本较少，可能页面空白或OCR失败")
             
-            return text.strip()
+            return text
             
         except Exception as e:
             logger.error(f"带预处理的OCR提取失败: {e}")
             return ""
 
+def _split_into_windows(page_nums, window_size):
+    """把页面编号列表切分为连续且不超过window_size的窗口"""
+    window_size = max(1, window_size)
+    windows = []
+    current = []
+    
+    for page_num in page_nums:
+        if current and (page_num != current[-1] + 1 or len(current) >= window_size):
+            windows.append(current)
+            current = []
+        current.append(page_num)
+    
+    if current:
+        windows.append(current)
+    
+    return windows
+
 def test_ocr_functionality():
     """测试OCR功能"""
     print("🧪 测试OCR基础功能")
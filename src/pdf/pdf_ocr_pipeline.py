@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+OCR分阶段流水线 - 性能优化
+栅格化、预处理、识别各在一个线程中运行，阶段之间是有界队列，
+调用方（写章节文件）在主线程消费结果：poppler渲染第N+1页时tesseract
+识别第N页，磁盘写入与两者重叠。记录每个阶段的忙碌时间和队列深度
+"""
+
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 阶段之间队列的默认容量（页）
+DEFAULT_QUEUE_DEPTH = 2
+
+# 阻塞等待队列时检查停止标志的间隔（秒）
+_POLL_INTERVAL = 0.1
+
+# 数据流结束标记
+_END = object()
+
+class _Failure:
+    """阶段线程中的异常，沿流水线传给消费者重新抛出"""
+
+    def __init__(self, error):
+        self.error = error
+
+class PipelineStats:
+    """流水线统计：各阶段处理条数和忙碌时间、各队列深度"""
+
+    def __init__(self, queue_depth=DEFAULT_QUEUE_DEPTH):
+        self.queue_depth = queue_depth
+        self.start_time = time.perf_counter()
+        self.stages = {}
+        self.queues = {}
+
+    def stage(self, name):
+        """取得（必要时创建）阶段计数器 {'items', 'busy'}"""
+        return self.stages.setdefault(name, {'items': 0, 'busy': 0.0})
+
+    @contextmanager
+    def timed(self, name):
+        """把一段处理计入阶段的忙碌时间"""
+        stage = self.stage(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage['busy'] += time.perf_counter() - start
+            stage['items'] += 1
+
+    def sample_queue(self, name, depth):
+        """记录一次队列深度采样"""
+        stats = self.queues.setdefault(name, {'max': 0, 'total': 0, 'samples': 0})
+        stats['max'] = max(stats['max'], depth)
+        stats['total'] += depth
+        stats['samples'] += 1
+
+    def report(self):
+        """
+        处理报告中的流水线统计
+
+        utilization为阶段忙碌时间占流水线总时间的比例，
+        多个阶段的利用率之和大于1说明阶段之间确实重叠了。
+        """
+        wall_time = time.perf_counter() - self.start_time
+        return {
+            'queue_depth': self.queue_depth,
+            'wall_time': round(wall_time, 3),
+            'stages': {
+                name: {
+                    'items': stage['items'],
+                    'busy_time': round(stage['busy'], 3),
+                    'utilization': round(stage['busy'] / wall_time, 3) if wall_time > 0 else 0.0
+                }
+                for name, stage in self.stages.items()
+            },
+            'queues': {
+                name: {
+                    'max_depth': stats['max'],
+                    'avg_depth': round(stats['total'] / stats['samples'], 2) if stats['samples'] else 0.0
+                }
+                for name, stats in self.queues.items()
+            }
+        }
+
+class StagedPipeline:
+    """
+    线程流水线
+
+    source在独立线程中迭代，产出的每一项依次经过stages中的各个函数
+    （每个函数一个线程），相邻线程之间是容量为queue_depth的队列，
+    结果按原顺序从迭代器中取出。任一阶段抛出异常时在消费者中重新抛出；
+    消费者提前退出时所有阶段线程都会停止。
+    """
+
+    def __init__(self, source, stages, stats=None, queue_depth=DEFAULT_QUEUE_DEPTH,
+                 source_name='source'):
+        """
+        Args:
+            source: 可迭代对象（在独立线程中迭代）
+            stages: [(阶段名, 函数)]，函数接收上一阶段的一项并返回下一项
+            stats: PipelineStats（可选）
+            queue_depth: 阶段之间队列的容量
+            source_name: source阶段在统计中的名称
+        """
+        self.source = source
+        self.stages = list(stages)
+        self.stats = stats if stats is not None else PipelineStats(queue_depth)
+        self.queue_depth = max(1, queue_depth)
+        self.source_name = source_name
+        self._stop = threading.Event()
+
+    def __iter__(self):
+        names = [self.source_name] + [name for name, _ in self.stages]
+        queues = [queue.Queue(maxsize=self.queue_depth) for _ in names]
+        queue_names = [f"{names[i]}->{names[i + 1]}" for i in range(len(names) - 1)] + [f"{names[-1]}->output"]
+
+        threads = [threading.Thread(
+            target=self._run_source, args=(queues[0], queue_names[0]),
+            name=f"ocr-{self.source_name}", daemon=True
+        )]
+        for i, (name, function) in enumerate(self.stages):
+            threads.append(threading.Thread(
+                target=self._run_stage,
+                args=(name, function, queues[i], queues[i + 1], queue_names[i + 1]),
+                name=f"ocr-{name}", daemon=True
+            ))
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = self._get(queues[-1])
+                if item is _END:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _run_source(self, output_queue, queue_name):
+        """source线程：迭代source并送入第一个队列"""
+        iterator = iter(self.source)
+        try:
+            while not self._stop.is_set():
+                with self.stats.timed(self.source_name):
+                    item = next(iterator, _END)
+                if item is _END:
+                    self.stats.stage(self.source_name)['items'] -= 1
+                    break
+                if not self._put(output_queue, item, queue_name):
+                    return
+        except Exception as e:
+            self._put(output_queue, _Failure(e), queue_name)
+            return
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+        self._put(output_queue, _END, queue_name)
+
+    def _run_stage(self, name, function, input_queue, output_queue, queue_name):
+        """阶段线程：逐项处理并送入下一个队列"""
+        while True:
+            item = self._get(input_queue)
+            if item is None:
+                return
+            if item is _END or isinstance(item, _Failure):
+                self._put(output_queue, item, queue_name)
+                return
+            try:
+                with self.stats.timed(name):
+                    result = function(item)
+            except Exception as e:
+                self._put(output_queue, _Failure(e), queue_name)
+                return
+            if not self._put(output_queue, result, queue_name):
+                return
+
+    def _put(self, target, item, queue_name):
+        """放入队列（满时等待），流水线停止时返回False"""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=_POLL_INTERVAL)
+            except queue.Full:
+                continue
+            self.stats.sample_queue(queue_name, target.qsize())
+            return True
+        return False
+
+    def _get(self, source):
+        """从队列取出一项（空时等待），流水线停止时返回None"""
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return None
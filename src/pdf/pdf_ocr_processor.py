@@ -8,10 +8,18 @@ import os
 import sys
 import logging
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
+from pdf_adaptive_dpi import DEFAULT_MIN_CONFIDENCE
+from pdf_checkpoint import ProcessingCheckpoint, atomic_open
+from pdf_document import use_document
+from pdf_ocr_pipeline import DEFAULT_QUEUE_DEPTH, PipelineStats, StagedPipeline
+from pdf_split_engine import SPLIT_ENGINES, create_chapter_writer
+
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -19,7 +27,11 @@ logger = logging.getLogger(__name__)
 class PDFOCRProcessor:
     """PDF OCR完整处理器 - 端到端流程"""
     
-    def __init__(self, lang='eng+chi_sim', enable_preprocessing=True, dpi=200):
+    def __init__(self, lang='eng+chi_sim', enable_preprocessing=True, dpi=200,
+                 raster_window=8, raster_to_disk=False, workers=1,
+                 cache_dir=None, cache_max_size=None, adaptive_dpi=False,
+                 min_confidence=DEFAULT_MIN_CONFIDENCE, ocr_backend='auto',
+                 pipeline_depth=DEFAULT_QUEUE_DEPTH, split_engine='pypdf2', max_memory=None):
         """
         初始化OCR处理器
         
@@ -27,15 +39,51 @@ class PDFOCRProcessor:
             lang: OCR语言
             enable_preprocessing: 是否启用图像预处理
             dpi: OCR图像分辨率
+            raster_window: 每次pdftoppm调用渲染的页数
+            raster_to_disk: 渲染到临时目录逐页加载，而不是整个窗口保留在内存
+            workers: OCR工作进程数（1表示在当前进程中串行处理）
+            cache_dir: OCR结果缓存目录（None表示不使用缓存）
+            cache_max_size: OCR缓存上限（字节）
+            adaptive_dpi: 按页自适应分辨率（空白页跳过OCR，按文字行高选DPI，置信度不足时提高DPI）
+            min_confidence: 自适应模式下的最低平均词置信度（0-100）
+            ocr_backend: OCR后端（'auto'、'tesserocr'、'pytesseract'、'stub[:选项]'），
+                         每个进程只创建一次（语言模型只加载一次）
+            pipeline_depth: 串行处理时渲染、预处理、识别流水线各阶段之间的队列容量
+                            （0表示不使用流水线，逐页依次处理）
+            split_engine: 章节PDF写出方式（见pdf_split_engine.SPLIT_ENGINES，
+                          'virtual'不写章节PDF，只输出页面范围索引）
+            max_memory: streaming引擎的常驻内存上限（字节）
         """
+        if split_engine not in SPLIT_ENGINES:
+            raise ValueError(f"未知的拆分引擎: {split_engine}（可选: {', '.join(SPLIT_ENGINES)}）")
+        
         self.lang = lang
         self.enable_preprocessing = enable_preprocessing
         self.dpi = dpi
+        self.raster_window = raster_window
+        self.raster_to_disk = raster_to_disk
+        self.workers = max(1, workers or 1)
+        self.adaptive_dpi = adaptive_dpi
+        self.min_confidence = min_confidence
+        self.ocr_backend = ocr_backend
+        self.pipeline_depth = max(0, pipeline_depth or 0)
+        self.split_engine = split_engine
+        self.max_memory = max_memory
+        
+        # 批量处理时的跨文档页面调度器（见batch_process）
+        self._scheduler = None
+        
+        # OCR结果缓存
+        self.cache = None
+        if cache_dir:
+            from pdf_ocr_cache import OCRCache, DEFAULT_CACHE_SIZE
+            self.cache = OCRCache(cache_dir, max_size=cache_max_size or DEFAULT_CACHE_SIZE)
         
         # 导入OCR模块
         try:
             from pdf_ocr_module import PDFOCR
-            self.ocr = PDFOCR(lang=lang, enable_preprocessing=enable_preprocessing)
+            self.ocr = PDFOCR(lang=lang, enable_preprocessing=enable_preprocessing,
+                              backend=ocr_backend)
             self.ocr_available = self.ocr.is_ocr_available()
             logger.info(f"✅ OCR处理器初始化成功，语言: {lang}")
         except ImportError:
@@ -48,7 +96,8 @@ class PDFOCRProcessor:
         return self.ocr_available
     
     def process_scanned_pdf(self, pdf_path, output_dir=None, pages_per_chapter=20, 
-                           sample_pages=3, progress_callback=None):
+                           sample_pages=3, progress_callback=None, document=None,
+                           resume=False):
         """
         处理扫描件PDF - 完整流程
         
@@ -58,11 +107,12 @@ class PDFOCRProcessor:
             pages_per_chapter: 每章节页数
             sample_pages: 采样分析页数
             progress_callback: 进度回调函数
+            document: 共享的PDFDocument句柄（可选，整个流程只解析一次PDF）
+            resume: 从output_dir中的检查点继续，跳过已完成的页面和章节
             
         Returns:
             dict: 处理结果
         """
-        start_time = time.time()
         pdf_path = Path(pdf_path)
         
         if not self.is_available():
@@ -73,16 +123,34 @@ class PDFOCRProcessor:
             logger.error(f"PDF文件不存在: {pdf_path}")
             return {'success': False, 'error': '文件不存在'}
         
+        try:
+            with use_document(pdf_path, document) as doc:
+                return self._process_scanned_document(
+                    doc, output_dir, pages_per_chapter, sample_pages, progress_callback, resume
+                )
+        except Exception as e:
+            logger.error(f"获取PDF信息失败: {e}")
+            return {'success': False, 'error': f'PDF读取失败: {e}'}
+    
+    def _process_scanned_document(self, doc, output_dir, pages_per_chapter,
+                                  sample_pages, progress_callback, resume):
+        """process_scanned_pdf的实现，所有步骤共享同一个文档句柄"""
+        start_time = time.time()
+        pdf_path = doc.path
+        
         logger.info(f"🚀 开始处理扫描件PDF: {pdf_path.name}")
         logger.info(f"   语言: {self.lang}")
         logger.info(f"   预处理: {'启用' if self.enable_preprocessing else '禁用'}")
-        logger.info(f"   分辨率: {self.dpi} DPI")
+        logger.info(f"   分辨率: {'自适应' if self.adaptive_dpi else f'{self.dpi} DPI'}")
+        logger.info(f"   工作进程: {self.workers}")
+        logger.info(f"   流水线: {'启用' if self._use_pipeline() else '禁用'}")
+        logger.info(f"   OCR后端: {self.ocr.backend_name}")
         
         # 步骤1: 分析PDF
         if progress_callback:
             progress_callback(0, "分析PDF类型...")
         
-        analysis = self.ocr.analyze_scanned_document(pdf_path, sample_pages)
+        analysis = self.ocr.analyze_scanned_document(pdf_path, sample_pages, document=doc)
         scanned_prob = analysis.get('is_scanned_probability', 0)
         
         logger.info(f"📊 分析结果: 扫描件概率 {scanned_prob:.1%}")
@@ -92,11 +160,8 @@ class PDFOCRProcessor:
         
         # 步骤2: 获取PDF信息
         try:
-            import PyPDF2
-            with open(pdf_path, 'rb') as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                total_pages = len(pdf_reader.pages)
-                logger.info(f"📄 PDF信息: {total_pages} 页")
+            total_pages = doc.total_pages
+            logger.info(f"📄 PDF信息: {total_pages} 页")
         except Exception as e:
             logger.error(f"获取PDF信息失败: {e}")
             return {'success': False, 'error': f'PDF读取失败: {e}'}
@@ -121,12 +186,44 @@ class PDFOCRProcessor:
             progress_callback(10, "开始OCR处理...")
         
         chapters = []
-        chapter_texts = []  # 存储每章节的OCR文本
+        text_files = []
+        total_text_chars = 0
+        page_results = None
+        chapter_writer = create_chapter_writer(self.split_engine, doc, output_dir, pdf_path.stem,
+                                               max_memory=self.max_memory)
+        
+        # 检查点：记录已完成的页面和章节，中断后可以续跑
+        checkpoint = ProcessingCheckpoint(output_dir, pdf_path.stem, {
+            'content_hash': doc.content_hash,
+            'total_pages': total_pages,
+            'pages_per_chapter': pages_per_chapter,
+            'dpi': self._dpi_setting(),
+            'lang': self.lang,
+            'enable_preprocessing': self.enable_preprocessing,
+            # virtual不写章节PDF，换成其他写出方式续跑时已完成的章节不能沿用
+            'split_engine': self.split_engine
+        })
+        resumed = resume and checkpoint.load()
+        if not resumed:
+            checkpoint.reset()
         
         try:
             # 分章节处理
             num_chapters = (total_pages + pages_per_chapter - 1) // pages_per_chapter
             
+            # 只OCR未完成章节中尚未记录在页面日志里的页面
+            pending_pages = [
+                page_num for page_num in range(total_pages)
+                if not checkpoint.is_chapter_done(page_num // pages_per_chapter)
+                and page_num not in checkpoint.journal_pages
+            ]
+            
+            # 按页序产出OCR结果（缓存命中、串行或多进程）
+            cache_stats = {'hits': 0, 'misses': 0}
+            page_stats = []
+            pipeline_stats = PipelineStats(self.pipeline_depth)
+            page_results = self._iter_page_texts(doc, pending_pages, cache_stats, pipeline_stats)
+            
             for chapter_idx in range(num_chapters):
                 start_page = chapter_idx * pages_per_chapter
                 end_page = min(start_page + pages_per_chapter, total_pages)
@@ -135,75 +232,111 @@ class PDFOCRProcessor:
                     progress = 10 + (chapter_idx / num_chapters) * 80
                     progress_callback(int(progress), f"处理第 {chapter_idx + 1}/{num_chapters} 章...")
                 
-                logger.info(f"处理第 {chapter_idx + 1} 章: 页 {start_page + 1}-{end_page}")
-                
-                # 提取本章节的OCR文本
-                chapter_text = ""
-                for page_num in range(start_page, end_page):
-                    try:
-                        # 使用带预处理的OCR提取
-                        page_text = self.ocr.extract_text_with_preprocessing(pdf_path, page_num)
-                        if page_text:
-                            chapter_text += f"\n--- 第 {page_num + 1} 页 ---\n{page_text}\n"
-                    except Exception as e:
-                        logger.warning(f"第 {page_num + 1} 页OCR失败: {e}")
-                        chapter_text += f"\n--- 第 {page_num + 1} 页 [OCR失败] ---\n"
+                if checkpoint.is_chapter_done(chapter_idx):
+                    info = checkpoint.completed_chapters[chapter_idx]
+                    text_files.append(str(output_dir / info['text_file']))
+                    if info.get('pdf_file'):
+                        chapters.append(str(output_dir / info['pdf_file']))
+                    total_text_chars += info.get('text_chars', 0)
+                    chapter_writer.skip(chapter_idx + 1, start_page, end_page)
+                    logger.info(f"跳过第 {chapter_idx + 1} 章: 检查点中已完成")
+                    continue
                 
-                chapter_texts.append(chapter_text)
+                logger.info(f"处理第 {chapter_idx + 1} 章: 页 {start_page + 1}-{end_page}")
                 
-                # 保存章节文本
+                # 逐页把OCR文本直接写入章节文件（原子写入），只保留字符计数，
+                # 内存占用与文档长度无关
                 text_filename = f"{pdf_path.stem}_chapter_{chapter_idx + 1:03d}.txt"
                 text_path = output_dir / text_filename
+                chapter_chars = 0
                 
-                with open(text_path, 'w', encoding='utf-8') as f:
-                    f.write(chapter_text)
-                
-                logger.info(f"  保存文本: {text_filename} ({len(chapter_text)} 字符)")
-                
-                # 创建章节PDF（使用原始PDF页面）
-                try:
-                    import PyPDF2
-                    with open(pdf_path, 'rb') as f:
-                        pdf_reader = PyPDF2.PdfReader(f)
-                        chapter_pdf = PyPDF2.PdfWriter()
-                        
-                        for page_num in range(start_page, end_page):
-                            page = pdf_reader.pages[page_num]
-                            chapter_pdf.add_page(page)
+                with atomic_open(text_path, 'w') as text_file:
+                    for page_num in range(start_page, end_page):
+                        if page_num in checkpoint.journal_pages:
+                            page_text, error = checkpoint.journal_pages[page_num], None
+                        else:
+                            result_page, page_text, error, page_info = next(page_results)
+                            _check_result_page(result_page, page_num)
+                            page_stats.append({'page': page_num + 1, **page_info})
+                            if error is None:
+                                checkpoint.record_page(page_num, page_text)
                         
-                        pdf_filename = f"{pdf_path.stem}_chapter_{chapter_idx + 1:03d}.pdf"
-                        pdf_path_out = output_dir / pdf_filename
+                        if error is not None:
+                            logger.warning(f"第 {page_num + 1} 页OCR失败: {error}")
+                            segment = f"\n--- 第 {page_num + 1} 页 [OCR失败] ---\n"
+                        elif page_text:
+                            segment = f"\n--- 第 {page_num + 1} 页 ---\n{page_text}\n"
+                        else:
+                            continue
                         
-                        with open(pdf_path_out, 'wb') as pdf_file:
-                            chapter_pdf.write(pdf_file)
+                        with pipeline_stats.timed('write'):
+                            text_file.write(segment)
+                        chapter_chars += len(segment)
+                
+                text_files.append(str(text_path))
+                total_text_chars += chapter_chars
+                logger.info(f"  保存文本: {text_filename} ({chapter_chars} 字符)")
+                
+                # 写入阶段：主线程写文件的同时，流水线继续渲染和识别后续页面
+                with pipeline_stats.timed('write'):
+                    # 创建章节PDF（使用共享文档句柄中的原始页面，虚拟章节只记录页面范围）
+                    pdf_filename = None
+                    try:
+                        pdf_path_out = chapter_writer.write(chapter_idx + 1, start_page, end_page)
                         
-                        chapters.append(str(pdf_path_out))
-                        logger.info(f"  保存PDF: {pdf_filename}")
+                        if pdf_path_out is not None:
+                            pdf_filename = pdf_path_out.name
+                            chapters.append(str(pdf_path_out))
+                            logger.info(f"  保存PDF: {pdf_filename}")
                         
-                except Exception as e:
-                    logger.error(f"创建章节PDF失败: {e}")
-                    # 继续处理，至少保存了文本
+                    except MemoryError:
+                        raise
+                    except Exception as e:
+                        pdf_filename = None
+                        logger.error(f"创建章节PDF失败: {e}")
+                        # 继续处理，至少保存了文本
+                    
+                    checkpoint.record_chapter(chapter_idx, {
+                        'start_page': start_page,
+                        'end_page': end_page,
+                        'text_file': text_filename,
+                        'pdf_file': pdf_filename,
+                        'text_chars': chapter_chars
+                    })
+            
+            # 索引文件和章节PDF全部写出后才标记完成（写出失败时续跑会重做）
+            chapter_index = chapter_writer.close()
+            checkpoint.mark_completed()
             
             # 步骤5: 生成处理报告
             if progress_callback:
                 progress_callback(95, "生成报告...")
             
             # 统计信息
-            total_text_chars = sum(len(text) for text in chapter_texts)
             avg_chars_per_page = total_text_chars / total_pages if total_pages > 0 else 0
             
             report = {
                 'pdf_name': pdf_path.name,
                 'total_pages': total_pages,
-                'chapters_created': len(chapters),
+                'chapters_created': num_chapters if chapter_index is not None else len(chapters),
                 'pages_per_chapter': pages_per_chapter,
                 'total_text_chars': total_text_chars,
                 'avg_chars_per_page': avg_chars_per_page,
                 'scanned_probability': scanned_prob,
+                'workers': self.workers,
+                'ocr_backend': self.ocr.backend_name,
+                'dpi': self._dpi_setting(),
+                'dpi_stats': _summarize_page_stats(page_stats),
+                'pipeline': {'enabled': self._use_pipeline(), **pipeline_stats.report()},
+                'page_stats': page_stats,
+                'ocr_cache': self._cache_report(cache_stats),
+                'resumed': resumed,
+                'checkpoint_file': str(checkpoint.path),
                 'output_dir': str(output_dir),
-                'text_files': [str(output_dir / f"{pdf_path.stem}_chapter_{i+1:03d}.txt") 
-                              for i in range(len(chapter_texts))],
+                'text_files': text_files,
                 'pdf_files': chapters,
+                'chapter_index': str(chapter_index) if chapter_index is not None else None,
+                'split_engine': chapter_writer.stats(),
                 'processing_time': time.time() - start_time
             }
             
@@ -212,7 +345,7 @@ class PDFOCRProcessor:
             report_path = output_dir / report_filename
             
             import json
-            with open(report_path, 'w', encoding='utf-8') as f:
+            with atomic_open(report_path, 'w') as f:
                 json.dump(report, f, indent=2, ensure_ascii=False)
             
             logger.info(f"📋 处理报告: {report_filename}")
@@ -222,7 +355,7 @@ class PDFOCRProcessor:
             
             logger.info(f"✅ 扫描件PDF处理完成!")
             logger.info(f"   处理时间: {report['processing_time']:.1f} 秒")
-            logger.info(f"   生成章节: {len(chapters)}")
+            logger.info(f"   生成章节: {report['chapters_created']}")
             logger.info(f"   总文本字符: {total_text_chars}")
             logger.info(f"   输出目录: {output_dir}")
             
@@ -232,19 +365,193 @@ class PDFOCRProcessor:
         except Exception as e:
             logger.error(f"处理扫描件PDF时出错: {e}")
             return {'success': False, 'error': str(e)}
+        
+        finally:
+            if page_results is not None:
+                # 停止流水线线程（提前退出时它们可能还在渲染后续页面）
+                page_results.close()
+            if self.split_engine in ('raw', 'streaming'):
+                # 关闭原始对象复制打开的源文件句柄（正常结束时已关闭）
+                chapter_writer.close()
+            checkpoint.close()
+    
+    def _iter_page_texts(self, doc, page_nums, cache_stats, pipeline_stats=None):
+        """
+        按页序产出指定页面的OCR结果
+        
+        启用缓存时，命中的页面直接返回缓存文本（跳过栅格化），
+        只有未命中的页面才送去OCR，成功结果写回缓存。
+        
+        Yields:
+            (页面编号, 文本, 错误信息或None, 页面统计)
+        """
+        page_nums = list(page_nums)
+        
+        if self.cache is None:
+            yield from self._ocr_pages(doc.path, page_nums, pipeline_stats)
+            return
+        
+        keys = {page_num: self._cache_key(doc, page_num) for page_num in page_nums}
+        cached = self.cache.lookup(keys.values())
+        missing = [page_num for page_num in page_nums if keys[page_num] not in cached]
+        
+        cache_stats['hits'] = len(page_nums) - len(missing)
+        cache_stats['misses'] = len(missing)
+        logger.info(f"OCR缓存: {cache_stats['hits']} 页命中, {len(missing)} 页需要OCR")
+        
+        ocr_results = self._ocr_pages(doc.path, missing, pipeline_stats)
+        
+        for page_num in page_nums:
+            key = keys[page_num]
+            text = self.cache.get(key) if key in cached else None
+            
+            if text is not None:
+                yield page_num, text, None, {'cached': True}
+                continue
+            
+            if key in cached:
+                # 查询后被其他进程淘汰，单独补做OCR
+                _, text, error, page_info = next(iter(self._ocr_pages(doc.path, [page_num])))
+            else:
+                result_page, text, error, page_info = next(ocr_results)
+                _check_result_page(result_page, page_num)
+            
+            if error is None:
+                self.cache.put(key, text)
+            yield page_num, text, error, page_info
+    
+    def _cache_key(self, doc, page_num):
+        """OCR缓存键：文档内容哈希 + 页码 + 影响识别结果的参数"""
+        from pdf_ocr_cache import OCRCache
+        return OCRCache.make_key(
+            doc.content_hash, page_num, self._dpi_setting(), self.lang, self.enable_preprocessing,
+            namespace=self.ocr.backend.cache_namespace
+        )
     
-    def batch_process(self, pdf_files, output_base_dir, **kwargs):
+    def _dpi_setting(self):
+        """影响识别结果的分辨率设置（用于缓存键、检查点和报告）"""
+        if self.adaptive_dpi:
+            return f"adaptive-{self.min_confidence}"
+        return self.dpi
+    
+    def _cache_report(self, cache_stats):
+        """处理报告中的缓存统计"""
+        if self.cache is None:
+            return {'enabled': False}
+        
+        lookups = cache_stats['hits'] + cache_stats['misses']
+        report = self.cache.stats()
+        report.update({
+            'enabled': True,
+            'hits': cache_stats['hits'],
+            'misses': cache_stats['misses'],
+            'hit_rate': round(cache_stats['hits'] / lookups, 3) if lookups else 0.0
+        })
+        return report
+    
+    def _use_pipeline(self):
+        """串行处理时是否使用渲染、预处理、识别流水线"""
+        return self.workers <= 1 and self.pipeline_depth > 0
+    
+    def _ocr_pages(self, pdf_path, page_nums, pipeline_stats=None):
+        """
+        按页序OCR指定页面
+        
+        串行处理时渲染、预处理、识别在流水线的不同线程中重叠进行；
+        批量处理时交给跨文档页面调度器；
+        workers > 1 时把页面按栅格化窗口分发到进程池（同时提交的窗口数有上限，
+        调用方提前停止时取消尚未开始的窗口，不会等整个文档OCR完），
+        结果仍按页序返回，每页失败互不影响。
+        
+        Yields:
+            (页面编号, 文本, 错误信息或None, 页面统计)
+        """
+        page_nums = list(page_nums)
+        if not page_nums:
+            return
+        
+        min_confidence = self.min_confidence if self.adaptive_dpi else None
+        
+        if self._scheduler is not None:
+            yield from self._scheduler.iter_results(pdf_path, page_nums)
+            return
+        
+        if self._use_pipeline():
+            yield from _iter_pipelined_page_results(
+                self.ocr, pdf_path, page_nums,
+                self.dpi, self.raster_window, self.raster_to_disk, min_confidence,
+                pipeline_stats, self.pipeline_depth
+            )
+            return
+        
+        if self.workers <= 1:
+            yield from _iter_page_results(
+                self.ocr, pdf_path, page_nums,
+                self.dpi, self.raster_window, self.raster_to_disk, min_confidence
+            )
+            return
+        
+        from pdf_ocr_module import _split_into_windows
+        windows = _split_into_windows(page_nums, self.raster_window)
+        
+        logger.info(f"启动OCR进程池: {self.workers} 个工作进程, {len(windows)} 个页面窗口")
+        
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_ocr_worker,
+            initargs=(self.lang, self.enable_preprocessing, self.ocr_backend)
+        )
+        remaining = iter(windows)
+        in_flight = deque()
+        
+        def submit_next():
+            window = next(remaining, None)
+            if window is not None:
+                in_flight.append((window, executor.submit(
+                    _ocr_pages_in_worker, str(pdf_path), window, self.dpi,
+                    self.raster_window, self.raster_to_disk, min_confidence
+                )))
+        
+        try:
+            # 每个工作进程最多两个窗口在排队（一个运行、一个等待），其余按需提交
+            for _ in range(self.workers * 2):
+                submit_next()
+            
+            while in_flight:
+                window, future = in_flight.popleft()
+                try:
+                    results = future.result()
+                except Exception as e:
+                    logger.error(f"页 {window[0] + 1}-{window[-1] + 1} OCR失败: {e}")
+                    results = [(page_num, "", str(e), {}) for page_num in window]
+                submit_next()
+                yield from results
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    def batch_process(self, pdf_files, output_base_dir, scheduling='sjf', memory_budget=None,
+                      max_active_documents=None, **kwargs):
         """
         批量处理多个PDF文件
         
+        workers > 1 时所有文档共享一个OCR进程池，由页面级调度器
+        （pdf_ocr_scheduler.PageScheduler）按策略分配页面窗口，
+        每个文档在自己的线程中写输出，页面全部完成后立即结束；
+        否则逐个文件处理。
+        
         Args:
             pdf_files: PDF文件路径列表
             output_base_dir: 输出基础目录
+            scheduling: 调度策略（'sjf'短作业优先、'fair'公平分享、'fifo'按顺序）
+            memory_budget: 同时OCR的页面图像估计内存上限（字节，None表示不限制）
+            max_active_documents: 同时处理的文档数（默认为工作进程数的2倍）
             **kwargs: 传递给process_scanned_pdf的参数
             
         Returns:
             dict: 批量处理结果
         """
+        from pdf_ocr_scheduler import summarize_latencies
+        
         output_base_dir = Path(output_base_dir)
         output_base_dir.mkdir(parents=True, exist_ok=True)
         
@@ -256,50 +563,47 @@ class PDFOCRProcessor:
             'start_time': datetime.now().isoformat()
         }
         
-        for i, pdf_file in enumerate(pdf_files):
+        existing_files = []
+        for pdf_file in pdf_files:
             pdf_path = Path(pdf_file)
-            if not pdf_path.exists():
+            if pdf_path.exists():
+                existing_files.append(pdf_path)
+            else:
                 logger.error(f"文件不存在: {pdf_path}")
-                results['details'].append({
-                    'file': str(pdf_path),
-                    'success': False,
-                    'error': '文件不存在'
-                })
-                results['failed'] += 1
-                continue
-            
-            logger.info(f"处理文件 {i+1}/{len(pdf_files)}: {pdf_path.name}")
-            
-            # 为每个文件创建单独的输出目录
-            file_output_dir = output_base_dir / pdf_path.stem
-            file_output_dir.mkdir(exist_ok=True)
+        
+        if self.workers > 1 and len(existing_files) > 1:
+            file_results, scheduler_report = self._batch_process_scheduled(
+                existing_files, output_base_dir, scheduling, memory_budget,
+                max_active_documents, kwargs
+            )
+        else:
+            batch_start = time.perf_counter()
+            file_results = {}
+            for i, pdf_path in enumerate(existing_files):
+                logger.info(f"处理文件 {i+1}/{len(existing_files)}: {pdf_path.name}")
+                result = self._batch_process_file(pdf_path, output_base_dir, kwargs)
+                result['latency'] = round(time.perf_counter() - batch_start, 3)
+                file_results[pdf_path] = result
+            scheduler_report = {
+                'policy': 'sequential',
+                'workers': self.workers,
+                **summarize_latencies([result['latency'] for result in file_results.values()])
+            }
+        
+        # 按输入顺序汇总结果
+        for pdf_file in pdf_files:
+            pdf_path = Path(pdf_file)
+            result = file_results.get(pdf_path)
+            if result is None:
+                result = {'file': str(pdf_path), 'success': False, 'error': '文件不存在'}
             
-            try:
-                result = self.process_scanned_pdf(
-                    pdf_path, 
-                    output_dir=file_output_dir,
-                    **kwargs
-                )
-                
-                if result.get('success', False):
-                    results['successful'] += 1
-                    logger.info(f"✅ 处理成功: {pdf_path.name}")
-                else:
-                    results['failed'] += 1
-                    logger.error(f"❌ 处理失败: {pdf_path.name}")
-                
-                result['file'] = str(pdf_path)
-                results['details'].append(result)
-                
-            except Exception as e:
-                logger.error(f"处理文件时出错 {pdf_path.name}: {e}")
-                results['details'].append({
-                    'file': str(pdf_path),
-                    'success': False,
-                    'error': str(e)
-                })
+            if result.get('success', False):
+                results['successful'] += 1
+            else:
                 results['failed'] += 1
+            results['details'].append(result)
         
+        results['scheduler'] = scheduler_report
         results['end_time'] = datetime.now().isoformat()
         
         # 保存批量处理报告
@@ -312,9 +616,328 @@ class PDFOCRProcessor:
         logger.info(f"   总文件: {results['total_files']}")
         logger.info(f"   成功: {results['successful']}")
         logger.info(f"   失败: {results['failed']}")
+        logger.info(f"   完成时间: {scheduler_report['makespan']:.1f} 秒, "
+                    f"p90延迟: {scheduler_report['latency']['p90']:.1f} 秒")
         logger.info(f"   报告: {report_path}")
         
         return results
+    
+    def _batch_process_file(self, pdf_path, output_base_dir, kwargs, document=None):
+        """批量处理中的单个文件，输出到以文件名命名的子目录"""
+        file_output_dir = output_base_dir / pdf_path.stem
+        file_output_dir.mkdir(exist_ok=True)
+        
+        try:
+            result = self.process_scanned_pdf(
+                pdf_path, 
+                output_dir=file_output_dir,
+                document=document,
+                **kwargs
+            )
+            
+            if result.get('success', False):
+                logger.info(f"✅ 处理成功: {pdf_path.name}")
+            else:
+                logger.error(f"❌ 处理失败: {pdf_path.name}")
+            
+            result['file'] = str(pdf_path)
+            return result
+            
+        except Exception as e:
+            logger.error(f"处理文件时出错 {pdf_path.name}: {e}")
+            return {'file': str(pdf_path), 'success': False, 'error': str(e)}
+    
+    def _batch_process_scheduled(self, pdf_paths, output_base_dir, scheduling, memory_budget,
+                                 max_active_documents, kwargs):
+        """
+        共享进程池的批量处理
+        
+        先读取每个文档的页数和页面尺寸登记到调度器，再按调度策略的顺序
+        在线程中处理文档（同时最多max_active_documents个）；文档线程的
+        OCR请求经_ocr_pages交给调度器。
+        
+        Returns:
+            (dict: 路径 -> 处理结果, dict: 调度统计)
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from pdf_document import PDFDocument
+        from pdf_ocr_scheduler import PageScheduler
+        
+        scheduler = PageScheduler(self, self.workers, memory_budget, scheduling)
+        documents = {}
+        for pdf_path in pdf_paths:
+            doc = PDFDocument(pdf_path)
+            total_pages, page_size = 0, None
+            try:
+                with doc:
+                    total_pages = doc.total_pages
+                    if total_pages:
+                        mediabox = doc.get_page(0).mediabox
+                        page_size = (float(mediabox.width), float(mediabox.height))
+            except Exception as e:
+                logger.warning(f"读取PDF页面信息失败 {pdf_path.name}: {e}")
+            documents[pdf_path] = doc
+            scheduler.add_document(pdf_path, total_pages, page_size)
+        
+        def process_document(pdf_path):
+            try:
+                result = self._batch_process_file(pdf_path, output_base_dir, kwargs,
+                                                  document=documents[pdf_path])
+            finally:
+                documents[pdf_path].close()
+            result['latency'] = scheduler.document_finished(pdf_path)
+            return result
+        
+        max_active = max_active_documents or self.workers * 2
+        file_results = {}
+        
+        self._scheduler = scheduler
+        try:
+            with scheduler, ThreadPoolExecutor(max_workers=max_active,
+                                               thread_name_prefix='ocr-document') as executor:
+                futures = {
+                    pdf_path: executor.submit(process_document, pdf_path)
+                    for pdf_path in scheduler.document_order(pdf_paths)
+                }
+                for pdf_path, future in futures.items():
+                    file_results[pdf_path] = future.result()
+        finally:
+            self._scheduler = None
+        
+        return file_results, scheduler.report()
+
+def _iter_page_results(ocr, pdf_path, page_nums, dpi, raster_window, raster_to_disk,
+                       min_confidence=None):
+    """
+    栅格化并OCR一组页面，逐页隔离失败
+    
+    min_confidence不为None时使用自适应分辨率（见_iter_adaptive_page_results），
+    否则所有页面都用dpi渲染。页面统计中的耗时包含渲染，
+    窗口渲染时间计入窗口的第一页。
+    
+    Yields:
+        (页面编号, 文本, 错误信息或None, 页面统计)
+    """
+    if min_confidence is not None:
+        yield from _iter_adaptive_page_results(
+            ocr, pdf_path, page_nums, raster_window, raster_to_disk, min_confidence
+        )
+        return
+    
+    page_images = ocr.iter_page_images(
+        pdf_path,
+        page_nums,
+        dpi=dpi,
+        window_size=raster_window,
+        paths_only=raster_to_disk
+    )
+    page_start = time.perf_counter()
+    for page_num, image in page_images:
+        page_info = {'dpi': dpi}
+        try:
+            if image is None:
+                raise RuntimeError("页面渲染失败")
+            
+            # 使用带预处理的OCR提取
+            page_text = ocr.recognize_image(image)
+            logger.info(f"OCR完成: 第 {page_num + 1} 页，提取 {len(page_text)} 字符")
+            page_info['time_ms'] = _elapsed_ms(page_start)
+            yield page_num, page_text, None, page_info
+        except Exception as e:
+            page_info['time_ms'] = _elapsed_ms(page_start)
+            yield page_num, "", str(e), page_info
+        page_start = time.perf_counter()
+
+def _iter_pipelined_page_results(ocr, pdf_path, page_nums, dpi, raster_window, raster_to_disk,
+                                 min_confidence=None, pipeline_stats=None,
+                                 queue_depth=DEFAULT_QUEUE_DEPTH):
+    """
+    _iter_page_results的流水线版本
+    
+    渲染、预处理、识别各在一个线程中运行，阶段之间是有界队列：
+    poppler渲染后续页面、tesseract识别当前页面、调用方写入前面的章节
+    同时进行（子进程和tesseract识别期间不占用GIL）。
+    自适应模式下渲染和重试依赖识别结果，整个自适应识别作为一个阶段，
+    只与写入重叠。
+    
+    Yields:
+        (页面编号, 文本, 错误信息或None, 页面统计)
+    """
+    if min_confidence is not None:
+        source = _iter_adaptive_page_results(
+            ocr, pdf_path, page_nums, raster_window, raster_to_disk, min_confidence
+        )
+        yield from StagedPipeline(source, [], pipeline_stats, queue_depth, source_name='ocr')
+        return
+    
+    def rasterize():
+        page_start = time.perf_counter()
+        for page_num, image in ocr.iter_page_images(pdf_path, page_nums, dpi=dpi,
+                                                    window_size=raster_window,
+                                                    paths_only=raster_to_disk):
+            if raster_to_disk and image is not None:
+                # 从磁盘加载的图像在取下一页时关闭，交给后续阶段前先复制
+                image = image.copy()
+            yield page_num, image, {'dpi': dpi, 'time_ms': _elapsed_ms(page_start)}
+            page_start = time.perf_counter()
+    
+    def preprocess(item):
+        page_num, image, page_info = item
+        if image is not None:
+            start = time.perf_counter()
+            image = ocr.preprocess_image(image)
+            page_info['time_ms'] = round(page_info['time_ms'] + _elapsed_ms(start), 1)
+        return page_num, image, page_info
+    
+    def recognize(item):
+        page_num, image, page_info = item
+        start = time.perf_counter()
+        try:
+            if image is None:
+                raise RuntimeError("页面渲染失败")
+            page_text = ocr.recognize_image(image, preprocess=False)
+            logger.info(f"OCR完成: 第 {page_num + 1} 页，提取 {len(page_text)} 字符")
+            error = None
+        except Exception as e:
+            page_text, error = "", str(e)
+        page_info['time_ms'] = round(page_info['time_ms'] + _elapsed_ms(start), 1)
+        return page_num, page_text, error, page_info
+    
+    yield from StagedPipeline(
+        rasterize(),
+        [('preprocess', preprocess), ('recognize', recognize)],
+        pipeline_stats, queue_depth, source_name='rasterize'
+    )
+
+def _iter_adaptive_page_results(ocr, pdf_path, page_nums, raster_window, raster_to_disk,
+                                min_confidence):
+    """
+    自适应分辨率OCR
+    
+    每个窗口先渲染一次低分辨率缩略图：空白页直接跳过OCR，
+    其余页面按估计的文字行高选择最低的够用DPI，相同DPI的连续页面
+    一起渲染；平均词置信度低于min_confidence时逐级提高DPI重试，
+    保留置信度最高的结果。
+    
+    Yields:
+        (页面编号, 文本, 错误信息或None, 页面统计)
+    """
+    from pdf_adaptive_dpi import THUMBNAIL_DPI, analyze_thumbnail, choose_dpi, next_dpi
+    from pdf_ocr_module import _split_into_windows
+    
+    for window in _split_into_windows(page_nums, raster_window):
+        thumbnail_start = time.perf_counter()
+        plans = {}
+        for page_num, thumbnail in ocr.iter_page_images(pdf_path, window, dpi=THUMBNAIL_DPI,
+                                                        window_size=raster_window):
+            if thumbnail is None:
+                plans[page_num] = {'blank': False, 'line_height_pt': None}
+            else:
+                plans[page_num] = analyze_thumbnail(thumbnail, THUMBNAIL_DPI)
+        thumbnail_ms = _elapsed_ms(thumbnail_start) / len(window)
+        
+        # 把窗口切成“空白页”和“相同DPI的连续页面”两种段，保持页序
+        runs = []
+        for page_num in window:
+            plan = plans[page_num]
+            dpi = None if plan['blank'] else choose_dpi(plan['line_height_pt'])
+            if runs and runs[-1][0] == dpi and dpi is not None:
+                runs[-1][1].append(page_num)
+            else:
+                runs.append((dpi, [page_num]))
+        
+        for dpi, run_pages in runs:
+            if dpi is None:
+                page_num = run_pages[0]
+                logger.info(f"跳过空白页: 第 {page_num + 1} 页")
+                yield page_num, "", None, {
+                    'dpi': None, 'blank': True, 'time_ms': round(thumbnail_ms, 1)
+                }
+                continue
+            
+            page_start = time.perf_counter()
+            page_images = ocr.iter_page_images(pdf_path, run_pages, dpi=dpi,
+                                               window_size=raster_window,
+                                               paths_only=raster_to_disk)
+            for page_num, image in page_images:
+                page_info = {'dpi': dpi, 'line_height_pt': plans[page_num]['line_height_pt']}
+                try:
+                    if image is None:
+                        raise RuntimeError("页面渲染失败")
+                    
+                    page_text, confidence = ocr.recognize_image_with_confidence(image)
+                    page_dpi = dpi
+                    
+                    # 置信度不足时逐级提高分辨率
+                    while confidence is not None and confidence < min_confidence:
+                        higher_dpi = next_dpi(page_dpi)
+                        if higher_dpi is None:
+                            break
+                        page_dpi = higher_dpi
+                        page_info.setdefault('retries', []).append(higher_dpi)
+                        try:
+                            images = ocr.rasterize_pages(pdf_path, page_num, page_num, dpi=higher_dpi)
+                            retry_text, retry_confidence = ocr.recognize_image_with_confidence(images[0])
+                        except Exception as e:
+                            logger.warning(f"第 {page_num + 1} 页 {higher_dpi} DPI重试失败: {e}")
+                            break
+                        if retry_confidence is not None and retry_confidence > confidence:
+                            page_text, confidence = retry_text, retry_confidence
+                            page_info['dpi'] = higher_dpi
+                    
+                    page_info['confidence'] = confidence
+                    page_info['time_ms'] = round(thumbnail_ms + _elapsed_ms(page_start), 1)
+                    logger.info(f"OCR完成: 第 {page_num + 1} 页 ({page_info['dpi']} DPI)，"
+                                f"提取 {len(page_text)} 字符")
+                    yield page_num, page_text, None, page_info
+                except Exception as e:
+                    page_info['time_ms'] = round(thumbnail_ms + _elapsed_ms(page_start), 1)
+                    yield page_num, "", str(e), page_info
+                page_start = time.perf_counter()
+
+def _check_result_page(result_page, expected_page):
+    """OCR结果必须按请求的页序到达，错位时中止而不是把文本写到错误的页面"""
+    if result_page != expected_page:
+        raise RuntimeError(f"OCR结果页序错乱: 期望第 {expected_page + 1} 页，收到第 {result_page + 1} 页")
+
+def _elapsed_ms(start):
+    """从start（perf_counter）到现在的毫秒数"""
+    return round((time.perf_counter() - start) * 1000, 1)
+
+def _summarize_page_stats(page_stats):
+    """处理报告中的分辨率统计：各DPI页数、跳过的空白页、平均每页耗时"""
+    ocr_pages = [info for info in page_stats if not info.get('cached')]
+    pages_by_dpi = {}
+    for info in ocr_pages:
+        if info.get('dpi') is not None:
+            key = str(info['dpi'])
+            pages_by_dpi[key] = pages_by_dpi.get(key, 0) + 1
+    
+    total_ms = sum(info.get('time_ms', 0) for info in ocr_pages)
+    return {
+        'ocr_pages': len(ocr_pages),
+        'blank_pages_skipped': sum(1 for info in ocr_pages if info.get('blank')),
+        'pages_by_dpi': pages_by_dpi,
+        'retried_pages': sum(1 for info in ocr_pages if info.get('retries')),
+        'avg_page_ms': round(total_ms / len(ocr_pages), 1) if ocr_pages else 0.0
+    }
+
+# 工作进程内的OCR实例（每个进程初始化一次）
+_worker_ocr = None
+
+def _init_ocr_worker(lang, enable_preprocessing, ocr_backend='auto'):
+    """进程池初始化：每个工作进程创建一个PDFOCR（OCR后端和语言模型在进程内复用）"""
+    global _worker_ocr
+    from pdf_ocr_module import PDFOCR
+    _worker_ocr = PDFOCR(lang=lang, enable_preprocessing=enable_preprocessing,
+                         backend=ocr_backend)
+
+def _ocr_pages_in_worker(pdf_path, page_nums, dpi, raster_window, raster_to_disk,
+                        min_confidence=None):
+    """在工作进程中OCR一个页面窗口"""
+    return list(_iter_page_results(
+        _worker_ocr, pdf_path, page_nums, dpi, raster_window, raster_to_disk, min_confidence
+    ))
 
 def test_ocr_processor():
     """测试OCR处理器"""
@@ -348,13 +971,42 @@ def test_ocr_processor():
 def main():
     """命令行接口"""
     import argparse
+    from pdf_ocr_backends import available_backend_names
+    from pdf_ocr_scheduler import SCHEDULING_POLICIES
     
     parser = argparse.ArgumentParser(description='PDF OCR完整处理器')
     parser.add_argument('--test', action='store_true', help='测试OCR功能')
-    parser.add_argument('--pdf', type=str, help='PDF文件路径')
+    parser.add_argument('--pdf', type=str, help='PDF文件路径（目录时批量处理其中所有PDF）')
     parser.add_argument('--output', '-o', type=str, help='输出目录')
     parser.add_argument('--pages', '-p', type=int, default=20, help='每章节页数')
     parser.add_argument('--lang', type=str, default='eng+chi_sim', help='OCR语言')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                       help='OCR工作进程数 (默认: 1)')
+    parser.add_argument('--ocr-cache', type=str, default=None,
+                       help='OCR结果缓存目录（重复处理时跳过已识别页面）')
+    parser.add_argument('--ocr-cache-size', type=str, default='256M',
+                       help='OCR缓存上限 (默认: 256M)')
+    parser.add_argument('--resume', action='store_true',
+                       help='从输出目录中的检查点继续，跳过已完成的页面和章节')
+    parser.add_argument('--adaptive-dpi', action='store_true',
+                       help='按页自适应分辨率：跳过空白页，按文字大小选择DPI')
+    parser.add_argument('--ocr-backend', type=str, default='auto',
+                       help=f'OCR后端: {", ".join(available_backend_names())}，'
+                            f'可带选项如 stub:latency_ms=50 (默认: auto)')
+    parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE,
+                       help=f'自适应模式下的最低OCR置信度 (默认: {DEFAULT_MIN_CONFIDENCE})')
+    parser.add_argument('--pipeline-depth', type=int, default=DEFAULT_QUEUE_DEPTH,
+                       help=f'渲染/预处理/识别流水线的队列容量，0表示逐页依次处理 (默认: {DEFAULT_QUEUE_DEPTH})')
+    parser.add_argument('--split-engine', choices=SPLIT_ENGINES, default='pypdf2',
+                       help='章节PDF写出方式: pypdf2, raw (直接复制对象字节), streaming (raw加内存上限), '
+                            'virtual (只输出页面范围索引) (默认: pypdf2)')
+    parser.add_argument('--max-memory', type=str, default=None,
+                       help='streaming引擎的常驻内存上限，如 512M')
+    
+    parser.add_argument('--scheduling', choices=SCHEDULING_POLICIES, default='sjf',
+                       help='批量处理的页面调度策略 (默认: sjf)')
+    parser.add_argument('--memory-budget', type=str, default=None,
+                       help='批量处理时同时OCR的页面图像内存上限，如 2G')
     
     args = parser.parse_args()
     
@@ -363,7 +1015,19 @@ def main():
         return
     
     if args.pdf and args.output:
-        processor = PDFOCRProcessor(lang=args.lang)
+        from pdf_memory import parse_size
+        processor = PDFOCRProcessor(
+            lang=args.lang,
+            workers=args.workers,
+            cache_dir=args.ocr_cache,
+            cache_max_size=parse_size(args.ocr_cache_size),
+            adaptive_dpi=args.adaptive_dpi,
+            min_confidence=args.min_confidence,
+            ocr_backend=args.ocr_backend,
+            pipeline_depth=args.pipeline_depth,
+            split_engine=args.split_engine,
+            max_memory=parse_size(args.max_memory) if args.max_memory else None
+        )
         
         if not processor.is_available():
             print("❌ OCR功能不可用")
@@ -374,21 +1038,42 @@ def main():
         print(f"   输出到: {args.output}")
         print(f"   语言: {args.lang}")
         print(f"   每章节页数: {args.pages}")
+        print(f"   工作进程: {args.workers}")
         
         def progress_callback(percent, message):
             print(f"进度: {percent}% - {message}")
         
+        if Path(args.pdf).is_dir():
+            pdf_files = sorted(Path(args.pdf).glob('*.pdf'))
+            batch = processor.batch_process(
+                pdf_files,
+                args.output,
+                scheduling=args.scheduling,
+                memory_budget=parse_size(args.memory_budget) if args.memory_budget else None,
+                pages_per_chapter=args.pages,
+                resume=args.resume
+            )
+            print(f"\n📊 批量处理: 成功 {batch['successful']}, 失败 {batch['failed']}")
+            print(f"   完成时间: {batch['scheduler']['makespan']:.1f}秒, "
+                  f"p50/p90延迟: {batch['scheduler']['latency']['p50']:.1f}/"
+                  f"{batch['scheduler']['latency']['p90']:.1f}秒")
+            return
+        
         result = processor.process_scanned_pdf(
             args.pdf,
             args.output,
             pages_per_chapter=args.pages,
-            progress_callback=progress_callback
+            progress_callback=progress_callback,
+            resume=args.resume
         )
         
         if result.get('success', False):
             print(f"\n✅ 处理成功!")
             print(f"   章节数: {result.get('chapters_created', 0)}")
             print(f"   处理时间: {result.get('processing_time', 0):.1f}秒")
+            cache_report = result.get('ocr_cache', {})
+            if cache_report.get('enabled'):
+                print(f"   OCR缓存: 命中 {cache_report['hits']}, 未命中 {cache_report['misses']}")
             print(f"   输出目录: {result.get('output_dir', '')}")
         else:
             print(f"\n❌ 处理失败: {result.get('error', '未知错误')}")
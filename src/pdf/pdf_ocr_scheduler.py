@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+跨文档页面级OCR调度器 - 性能优化
+批量处理时所有文档共享一个OCR进程池，按页面窗口调度：
+小文档不再排在大文档后面，每个文档的页面一完成就可以输出。
+并发受CPU预算（工作进程数）和内存预算（渲染图像的估计大小）限制。
+"""
+
+import logging
+import math
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from pathlib import Path
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 调度策略
+#   sjf: 短作业优先（页数少的文档先调度），平均等待时间最短
+#   fair: 公平分享（已调度页数最少的文档先调度），大文档不会饿死
+#   fifo: 按提交顺序
+SCHEDULING_POLICIES = ('sjf', 'fair', 'fifo')
+
+# 页面尺寸未知时按A4估算（点）
+DEFAULT_PAGE_SIZE = (595, 842)
+
+# 渲染图像之外预处理副本等的内存系数
+IMAGE_MEMORY_FACTOR = 2
+
+def estimate_page_memory(page_size, dpi):
+    """
+    估算一页渲染为RGB图像后OCR过程中的内存占用（字节）
+
+    Args:
+        page_size: (宽, 高)，单位为点
+        dpi: 渲染分辨率
+    """
+    width, height = page_size or DEFAULT_PAGE_SIZE
+    pixels = (width / 72 * dpi) * (height / 72 * dpi)
+    return int(pixels * 3 * IMAGE_MEMORY_FACTOR)
+
+def percentile(values, fraction):
+    """最近秩法百分位数（values为空时返回0）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+def summarize_latencies(latencies):
+    """文档完成延迟（秒）的统计：makespan即最后一个文档的完成时间"""
+    makespan = max(latencies) if latencies else 0.0
+    return {
+        'makespan': round(makespan, 3),
+        'latency': {
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p90': round(percentile(latencies, 0.90), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'max': round(makespan, 3)
+        }
+    }
+
+class _PageRequest:
+    """一次iter_results调用提交的页面（同一文档可能同时有多个请求，如缓存淘汰后的补做）"""
+
+    def __init__(self, page_nums):
+        self.page_nums = set(page_nums)
+        # 调用方不再取结果（提前结束）后，仍在运行的单元完成时丢弃结果
+        self.closed = False
+
+class _DocumentJob:
+    """调度器中的一个文档"""
+
+    def __init__(self, key, order, total_pages, page_memory):
+        self.key = key
+        self.order = order
+        self.total_pages = total_pages
+        self.page_memory = page_memory
+        # [(请求, 工作单元)]
+        self.pending_units = []
+        self.results = {}
+        self.dispatched_pages = 0
+        self.finished_at = None
+
+class PageScheduler:
+    """
+    页面级OCR调度器
+
+    文档先用add_document登记（页数用于短作业优先），处理文档的线程调用
+    iter_results提交需要OCR的页面并按页序取回结果。页面按栅格化窗口
+    切成工作单元，由调度线程按策略提交到共享进程池：同时运行的单元数
+    不超过workers，估计内存之和不超过memory_budget（至少运行一个单元）。
+    """
+
+    def __init__(self, processor, workers, memory_budget=None, policy='sjf'):
+        """
+        Args:
+            processor: PDFOCRProcessor（提供语言、分辨率、栅格化窗口等设置）
+            workers: 工作进程数（CPU预算）
+            memory_budget: 同时运行的工作单元估计内存上限（字节，None表示不限制）
+            policy: 调度策略，见SCHEDULING_POLICIES
+        """
+        if policy not in SCHEDULING_POLICIES:
+            raise ValueError(f"未知的调度策略: {policy}（可选: {', '.join(SCHEDULING_POLICIES)}）")
+
+        self.processor = processor
+        self.workers = max(1, workers)
+        self.memory_budget = memory_budget
+        self.policy = policy
+
+        self._condition = threading.Condition()
+        self._jobs = {}
+        self._in_flight = 0
+        self._memory_in_use = 0
+        self._closed = False
+        # 调度线程因进程池不可用（工作进程被杀）退出时的错误信息
+        self._dispatch_error = None
+        self._executor = None
+        self._dispatcher = None
+
+        self.start_time = None
+        self.units_dispatched = 0
+        self.max_in_flight = 0
+        self.peak_memory_estimate = 0
+
+    def start(self):
+        """启动共享进程池和调度线程"""
+        from pdf_ocr_processor import _init_ocr_worker
+
+        processor = self.processor
+        self.start_time = time.perf_counter()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_ocr_worker,
+            initargs=(processor.lang, processor.enable_preprocessing, processor.ocr_backend)
+        )
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='ocr-scheduler', daemon=True)
+        self._dispatcher.start()
+        logger.info(f"启动页面调度器: {self.workers} 个工作进程, 策略 {self.policy}")
+        return self
+
+    def close(self):
+        """停止调度线程并关闭进程池"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def add_document(self, pdf_path, total_pages, page_size=None):
+        """登记一个文档（在处理它之前调用，页数用于排序）"""
+        dpi = 300 if self.processor.adaptive_dpi else self.processor.dpi
+        with self._condition:
+            key = str(Path(pdf_path))
+            self._jobs[key] = _DocumentJob(key, len(self._jobs), total_pages,
+                                           estimate_page_memory(page_size, dpi))
+
+    def document_order(self, pdf_paths):
+        """按调度策略排列文档的开始顺序（短作业优先时小文档先开始）"""
+        if self.policy != 'sjf':
+            return list(pdf_paths)
+        return sorted(pdf_paths, key=lambda path: self._job(path).total_pages)
+
+    def iter_results(self, pdf_path, page_nums):
+        """
+        提交一个文档需要OCR的页面，按页序产出结果
+
+        Yields:
+            (页面编号, 文本, 错误信息或None, 页面统计)
+        """
+        from pdf_ocr_module import _split_into_windows
+
+        page_nums = list(page_nums)
+        job = self._job(pdf_path)
+        request = _PageRequest(page_nums)
+        with self._condition:
+            job.pending_units.extend(
+                (request, unit) for unit in _split_into_windows(page_nums, self.processor.raster_window)
+            )
+            self._condition.notify_all()
+
+        try:
+            for page_num in page_nums:
+                with self._condition:
+                    # 调度器关闭或调度线程退出后不会再有结果，剩余页面按失败返回
+                    while page_num not in job.results and not self._stopped():
+                        self._condition.wait()
+                    result = job.results.pop(page_num, None)
+                    if result is None:
+                        result = (page_num, "", self._dispatch_error or "页面调度器已关闭", {})
+                yield result
+        finally:
+            # 请求提前结束（出错）时撤回它尚未调度的单元，丢弃未取走的结果；
+            # 已在运行的单元之后完成时也不再写入结果。同一文档的其他请求不受影响
+            with self._condition:
+                request.closed = True
+                job.pending_units = [(owner, unit) for owner, unit in job.pending_units
+                                     if owner is not request]
+                for page_num in request.page_nums:
+                    job.results.pop(page_num, None)
+
+    def document_finished(self, pdf_path):
+        """记录文档完成时间，返回从调度器启动到完成的秒数"""
+        job = self._job(pdf_path)
+        job.finished_at = time.perf_counter()
+        return round(job.finished_at - self.start_time, 3)
+
+    def report(self):
+        """批量报告中的调度统计：完成时间（makespan）和文档延迟百分位数"""
+        latencies = [job.finished_at - self.start_time for job in self._jobs.values()
+                     if job.finished_at is not None]
+        return {
+            'policy': self.policy,
+            'workers': self.workers,
+            'memory_budget': self.memory_budget,
+            'peak_memory_estimate': self.peak_memory_estimate,
+            'max_in_flight': self.max_in_flight,
+            'units_dispatched': self.units_dispatched,
+            **summarize_latencies(latencies)
+        }
+
+    def _job(self, pdf_path):
+        return self._jobs[str(Path(pdf_path))]
+
+    def _stopped(self):
+        """调度器已关闭或调度线程已退出（调用方持有锁）"""
+        return self._closed or self._dispatch_error is not None
+
+    def _unit_memory(self, job, unit):
+        """工作单元的估计内存：渲染到磁盘时只有一页在内存中，否则是整个窗口"""
+        pages_in_memory = 1 if self.processor.raster_to_disk else len(unit)
+        return job.page_memory * pages_in_memory
+
+    def _next_job(self):
+        """按策略选择下一个要调度的文档（调用方持有锁）"""
+        candidates = [job for job in self._jobs.values() if job.pending_units]
+        if not candidates:
+            return None
+        if self.policy == 'sjf':
+            return min(candidates, key=lambda job: (job.total_pages, job.order))
+        if self.policy == 'fair':
+            return min(candidates, key=lambda job: (job.dispatched_pages, job.order))
+        return min(candidates, key=lambda job: job.order)
+
+    def _dispatch_loop(self):
+        """调度线程：在CPU和内存预算内按策略提交工作单元"""
+        with self._condition:
+            while not self._closed:
+                job = self._next_job() if self._in_flight < self.workers else None
+                if job is not None:
+                    request, unit = job.pending_units[0]
+                    memory = self._unit_memory(job, unit)
+                    fits = (self.memory_budget is None or self._in_flight == 0
+                            or self._memory_in_use + memory <= self.memory_budget)
+                    if fits:
+                        try:
+                            self._submit(job, request, unit, memory)
+                        except Exception as e:
+                            # 工作进程被杀（OOM、引擎崩溃）后进程池不再接受任务
+                            logger.error(f"OCR进程池不可用，停止调度: {e}")
+                            self._dispatch_error = f"OCR进程池不可用: {e}"
+                            self._fail_pending(self._dispatch_error)
+                            self._condition.notify_all()
+                            return
+                        job.pending_units.pop(0)
+                        continue
+                self._condition.wait()
+
+    def _fail_pending(self, error):
+        """所有尚未调度的单元按失败返回（调用方持有锁）"""
+        for job in self._jobs.values():
+            for request, unit in job.pending_units:
+                if not request.closed:
+                    for page_num in unit:
+                        job.results[page_num] = (page_num, "", error, {})
+            job.pending_units = []
+
+    def _submit(self, job, request, unit, memory):
+        """提交一个工作单元（调用方持有锁）"""
+        from pdf_ocr_processor import _ocr_pages_in_worker
+
+        processor = self.processor
+        min_confidence = processor.min_confidence if processor.adaptive_dpi else None
+
+        future = self._executor.submit(
+            _ocr_pages_in_worker, job.key, unit, processor.dpi, processor.raster_window,
+            processor.raster_to_disk, min_confidence
+        )
+
+        self._in_flight += 1
+        self._memory_in_use += memory
+        self.units_dispatched += 1
+        self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        self.peak_memory_estimate = max(self.peak_memory_estimate, self._memory_in_use)
+        job.dispatched_pages += len(unit)
+
+        future.add_done_callback(lambda done: self._on_unit_done(job, request, unit, memory, done))
+
+    def _on_unit_done(self, job, request, unit, memory, future):
+        """工作单元完成：保存结果、释放预算、唤醒等待的文档线程和调度线程"""
+        try:
+            results = future.result()
+        except (Exception, CancelledError) as e:
+            logger.error(f"{Path(job.key).name} 页 {unit[0] + 1}-{unit[-1] + 1} OCR失败: {e}")
+            results = [(page_num, "", str(e), {}) for page_num in unit]
+
+        with self._condition:
+            if not request.closed:
+                for result in results:
+                    job.results[result[0]] = result
+            self._in_flight -= 1
+            self._memory_in_use -= memory
+            self._condition.notify_all()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+页面文本索引 - 性能优化
+一次流式遍历提取全文档每页文本（可按页面范围多进程并行），
+按文档内容哈希缓存到磁盘，供章节检测扫描整个文档；
+构建好的索引挂到文档的页面文本备忘上（PDFDocument.page_texts），之后的标题等查询直接命中
+"""
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from pdf_checkpoint import atomic_open
+from pdf_document import PDFDocument
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+# 每个并行任务的最少页数（太小时进程调度开销超过提取时间）
+MIN_RANGE_PAGES = 50
+
+class PageTextIndex:
+    """全文档页面文本索引（页面编号 -> 原始文本，附带每页提取耗时）"""
+
+    def __init__(self, texts, page_times, build_time=0.0, cached=False, workers=1):
+        """
+        Args:
+            texts: 按页序排列的页面文本列表
+            page_times: 每页提取耗时（秒）
+            build_time: 构建索引总耗时（秒）
+            cached: 是否从磁盘缓存加载
+            workers: 构建时使用的进程数
+        """
+        self.texts = texts
+        self.page_times = page_times
+        self.build_time = build_time
+        self.cached = cached
+        self.workers = workers
+
+    @property
+    def total_pages(self):
+        return len(self.texts)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, page_num):
+        return self.texts[page_num]
+
+    def stats(self):
+        """索引统计信息（每页耗时的平均值、P95、最大值）"""
+        total_pages = len(self.page_times)
+        stats = {
+            'total_pages': total_pages,
+            'cached': self.cached,
+            'workers': self.workers,
+            'build_time': round(self.build_time, 3),
+            'avg_page_ms': 0.0,
+            'p95_page_ms': 0.0,
+            'max_page_ms': 0.0,
+            'slowest_pages': []
+        }
+        if not total_pages:
+            return stats
+
+        times = sorted(self.page_times)
+        slowest = sorted(range(total_pages), key=lambda i: self.page_times[i], reverse=True)[:5]
+        stats.update({
+            'avg_page_ms': round(sum(times) / total_pages * 1000, 3),
+            'p95_page_ms': round(times[min(total_pages - 1, int(total_pages * 0.95))] * 1000, 3),
+            'max_page_ms': round(times[-1] * 1000, 3),
+            'slowest_pages': [page_num + 1 for page_num in slowest]
+        })
+        return stats
+
+    def save(self, path, content_hash):
+        """原子写入磁盘缓存"""
+        data = {
+            'version': INDEX_VERSION,
+            'content_hash': content_hash,
+            'texts': self.texts,
+            'page_times': self.page_times
+        }
+        with atomic_open(path, 'w') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, content_hash):
+        """
+        从磁盘缓存加载索引
+
+        Returns:
+            PageTextIndex 或 None: 缓存不存在或不匹配时返回None
+        """
+        path = Path(path)
+        if not path.exists():
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"页面文本索引缓存损坏，重新构建: {e}")
+            return None
+
+        if data.get('version') != INDEX_VERSION or data.get('content_hash') != content_hash:
+            return None
+
+        return cls(data['texts'], data['page_times'], cached=True)
+
+def build_page_text_index(document, workers=1, cache_dir=None):
+    """
+    构建全文档页面文本索引
+
+    Args:
+        document: 共享的PDFDocument句柄
+        workers: 并行提取的进程数（按页面范围分发）
+        cache_dir: 索引缓存目录（None表示不缓存）
+
+    Returns:
+        PageTextIndex: 页面文本索引
+    """
+    start_time = time.time()
+    cache_path = None
+
+    if cache_dir is not None:
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        cache_path = cache_dir / f"{document.content_hash}.pagetext.json"
+
+        index = PageTextIndex.load(cache_path, document.content_hash)
+        if index is not None and index.total_pages == document.total_pages:
+            index.build_time = time.time() - start_time
+            logger.info(f"页面文本索引命中缓存: {cache_path.name} ({index.total_pages} 页)")
+            document.page_texts.attach_index(index)
+            return index
+
+    total_pages = document.total_pages
+    # 文本提取是纯CPU任务，进程数超过CPU核数只会增加调度开销
+    workers = max(1, min(workers, os.cpu_count() or 1))
+    ranges = _split_page_ranges(total_pages, workers)
+
+    if workers <= 1 or len(ranges) <= 1:
+        workers = 1
+        # 本进程提取时复用类型检测等已经提取过的页面
+        results = _extract_range_from_document(document, 0, total_pages, memo=document.page_texts)
+    else:
+        logger.info(f"并行构建页面文本索引: {workers} 个进程, {len(ranges)} 个页面范围")
+        results = []
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_index_worker,
+            initargs=(str(document.path),)
+        ) as executor:
+            futures = [
+                executor.submit(_extract_range_in_worker, start, end)
+                for start, end in ranges
+            ]
+            for future in futures:
+                results.extend(future.result())
+
+    index = PageTextIndex(
+        [text for text, _ in results],
+        [seconds for _, seconds in results],
+        workers=workers
+    )
+    index.build_time = time.time() - start_time
+    document.page_texts.attach_index(index)
+    logger.info(f"页面文本索引: {total_pages} 页, 耗时 {index.build_time:.2f} 秒")
+
+    if cache_path is not None:
+        try:
+            index.save(cache_path, document.content_hash)
+        except Exception as e:
+            logger.warning(f"保存页面文本索引缓存失败: {e}")
+
+    return index
+
+def _split_page_ranges(total_pages, workers):
+    """按进程数把页面切分为连续范围（每个进程约4个范围，便于负载均衡）"""
+    if total_pages == 0:
+        return []
+    range_size = max(MIN_RANGE_PAGES, -(-total_pages // (max(workers, 1) * 4)))
+    return [(start, min(start + range_size, total_pages))
+            for start in range(0, total_pages, range_size)]
+
+def _extract_range_from_document(document, start_page, end_page, memo=None):
+    """
+    顺序提取页面范围内的文本（memo中已有的页面直接复用，新提取的页面计入memo的提取次数），
+    返回 [(文本, 耗时秒)]
+    """
+    results = []
+    extracted = 0
+    for page_num in range(start_page, end_page):
+        page_start = time.perf_counter()
+        text = memo.lookup(page_num) if memo is not None else None
+        if text is not None:
+            results.append((text, time.perf_counter() - page_start))
+            continue
+        try:
+            text = document.get_page(page_num).extract_text() or ''
+        except MemoryError:
+            raise
+        except Exception as e:
+            logger.debug(f"第 {page_num + 1} 页文本提取失败: {e}")
+            text = ''
+        results.append((text, time.perf_counter() - page_start))
+        extracted += 1
+    if memo is not None:
+        memo.count_extractions(extracted)
+    return results
+
+# 工作进程内的文档句柄（每个进程只打开一次）
+_worker_document = None
+
+def _init_index_worker(pdf_path):
+    """工作进程初始化：打开文档"""
+    global _worker_document
+    _worker_document = PDFDocument(pdf_path).open()
+
+def _extract_range_in_worker(start_page, end_page):
+    """工作进程中提取页面范围"""
+    return _extract_range_from_document(_worker_document, start_page, end_page)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+页面文本备忘 - 性能优化
+每个文档一份页面文本备忘（PDFDocument.page_texts），类型检测、章节检测采样、
+章节标题和v2逐页提取共用，同一次处理中每页最多调用一次extract_text()。
+最近使用的页面文本保存在内存中（LRU），超出容量的文本写入临时文件，需要时再读回；
+已构建的全文档页面文本索引可以挂到备忘上，命中索引的页面不再提取也不占LRU容量。
+"""
+
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 内存中保留的页面文本数（普通书籍每页几KB，约数MB）
+DEFAULT_CAPACITY = 2048
+
+class PageTextMemo:
+    """页面文本备忘（LRU + 可选的磁盘溢出）"""
+
+    # 默认值（类属性，基准测试和测试可整体调整）
+    capacity = DEFAULT_CAPACITY
+    spill = True
+
+    def __init__(self, document, capacity=None, spill=None, spill_dir=None):
+        """
+        Args:
+            document: PDFDocument（未命中时从它提取文本）
+            capacity: 内存中保留的页面文本数（None表示使用类默认值）
+            spill: 淘汰的文本是否写入临时文件（False时淘汰后再访问会重新提取）
+            spill_dir: 临时文件目录（None表示系统临时目录）
+        """
+        self.document = document
+        if capacity is not None:
+            self.capacity = capacity
+        self.capacity = max(1, self.capacity)
+        if spill is not None:
+            self.spill = spill
+        self.spill_dir = spill_dir
+        self._texts = OrderedDict()
+        self._index_texts = None
+        self._spill_file = None
+        self._spill_offsets = {}
+        self._spill_size = 0
+        self._lock = threading.Lock()
+        self.extractions = 0
+        self.hits = 0
+        self.index_hits = 0
+        self.spill_hits = 0
+        self.spilled = 0
+        self.evictions = 0
+
+    def attach_index(self, index):
+        """
+        挂载已构建的页面文本索引（PageTextIndex或按页序排列的文本列表）
+
+        索引中的页面直接从索引读取，不再提取也不复制到LRU中
+        """
+        texts = getattr(index, 'texts', index)
+        with self._lock:
+            self._index_texts = texts
+
+    def lookup(self, page_num):
+        """
+        只查找已有的文本，不提取
+
+        Returns:
+            str 或 None: 没有记录时为None
+        """
+        with self._lock:
+            return self._lookup(page_num)
+
+    def get(self, page_num):
+        """
+        获取页面原始文本（提取失败时为空字符串）
+
+        Args:
+            page_num: 页面编号（从0开始）
+
+        Returns:
+            str: 页面文本
+        """
+        with self._lock:
+            text = self._lookup(page_num)
+        if text is not None:
+            return text
+
+        try:
+            text = self.document.get_page(page_num).extract_text() or ''
+        except MemoryError:
+            raise
+        except IndexError:
+            raise
+        except Exception as e:
+            logger.debug(f"第 {page_num + 1} 页文本提取失败: {e}")
+            text = ''
+
+        with self._lock:
+            self.extractions += 1
+            self._store(page_num, text)
+        return text
+
+    def put(self, page_num, text):
+        """记录其他途径得到的页面文本（如工作进程提取的结果）"""
+        with self._lock:
+            self._store(page_num, text or '')
+
+    def count_extractions(self, count):
+        """计入绕过get直接提取的页面数（如构建页面文本索引时的顺序提取）"""
+        with self._lock:
+            self.extractions += count
+
+    def stats(self):
+        """备忘统计（处理报告用）"""
+        with self._lock:
+            return {
+                'capacity': self.capacity,
+                'resident': len(self._texts),
+                'extractions': self.extractions,
+                'hits': self.hits,
+                'index_hits': self.index_hits,
+                'spill_hits': self.spill_hits,
+                'spilled': self.spilled,
+                'spill_bytes': self._spill_size,
+                'evictions': self.evictions
+            }
+
+    def close(self):
+        """丢弃所有文本并删除临时文件"""
+        with self._lock:
+            self._texts.clear()
+            self._index_texts = None
+            self._spill_offsets.clear()
+            self._spill_size = 0
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._texts) + len(self._spill_offsets)
+
+    def _lookup(self, page_num):
+        if self._index_texts is not None and 0 <= page_num < len(self._index_texts):
+            self.index_hits += 1
+            return self._index_texts[page_num]
+
+        text = self._texts.get(page_num)
+        if text is not None:
+            self._texts.move_to_end(page_num)
+            self.hits += 1
+            return text
+
+        location = self._spill_offsets.get(page_num)
+        if location is None:
+            return None
+        offset, length = location
+        data = os.pread(self._spill_file.fileno(), length, offset)
+        text = data.decode('utf-8', errors='surrogatepass')
+        self.spill_hits += 1
+        # 读回的文本重新进入LRU（磁盘上的副本保留，再次淘汰时无需重写）
+        self._texts[page_num] = text
+        self._evict()
+        return text
+
+    def _store(self, page_num, text):
+        self._texts[page_num] = text
+        self._texts.move_to_end(page_num)
+        self._evict()
+
+    def _evict(self):
+        while len(self._texts) > self.capacity:
+            page_num, text = self._texts.popitem(last=False)
+            self.evictions += 1
+            if self.spill and page_num not in self._spill_offsets:
+                self._spill_text(page_num, text)
+
+    def _spill_text(self, page_num, text):
+        try:
+            if self._spill_file is None:
+                self._spill_file = tempfile.TemporaryFile(prefix='pagetext_', dir=self.spill_dir)
+            data = text.encode('utf-8', errors='surrogatepass')
+            os.pwrite(self._spill_file.fileno(), data, self._spill_size)
+        except OSError as e:
+            # 写不了临时文件时退化为纯LRU（淘汰的页面再访问时重新提取）
+            logger.warning(f"页面文本溢出到磁盘失败，停用溢出: {e}")
+            self.spill = False
+            return
+        self._spill_offsets[page_num] = (self._spill_size, len(data))
+        self._spill_size += len(data)
+        self.spilled += 1
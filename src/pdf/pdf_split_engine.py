@@ -0,0 +1,658 @@
+#!/usr/bin/env python3
+"""
+单遍拆分引擎 - 性能优化
+每页文本最多提取一次（检测和章节标题共用），章节PDF逐章流式写出。
+章节写出方式（SPLIT_ENGINES）：
+  pypdf2  - PyPDF2.PdfWriter逐页add_page（重新解析、序列化所有对象）
+  raw     - 直接复制源文件中的对象字节，只改写对象引用，同一输出中内容相同的对象只写一次
+  streaming - raw加内存上限：每章写完释放已解析对象缓存，常驻内存超过上限时中止（超大扫描件）
+  virtual - 不写章节PDF，只输出页面范围索引（虚拟章节），适合只需要文本的下游
+"""
+
+import hashlib
+import io
+import json
+import logging
+import re
+from pathlib import Path
+
+from pdf_checkpoint import atomic_open
+from pdf_memory import MemoryGuard
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class PageTextCache:
+    """页面文本缓存 - 每页只调用一次extract_text()（基于文档的页面文本备忘，与类型检测等共用）"""
+
+    def __init__(self, document, index=None):
+        """
+        Args:
+            document: 共享的PDFDocument句柄
+            index: 已构建的页面文本索引（可选，命中的页面不再提取）
+        """
+        self.document = document
+        self.memo = document.page_texts
+        if index is not None:
+            self.memo.attach_index(index)
+
+    @property
+    def extractions(self):
+        """该文档实际调用extract_text()的页数"""
+        return self.memo.extractions
+
+    def get(self, page_num):
+        """
+        获取页面原始文本（提取失败时为空字符串）
+
+        Args:
+            page_num: 页面编号（从0开始）
+
+        Returns:
+            str: 页面文本
+        """
+        return self.memo.get(page_num)
+
+    def detection_texts(self, page_nums, min_length=5):
+        """
+        章节检测用的页面文本（去掉首尾空白，跳过过短的页面）
+
+        Returns:
+            dict: {页面编号: 文本}
+        """
+        page_texts = {}
+        for page_num in page_nums:
+            text = self.get(page_num).strip()
+            if len(text) > min_length:
+                page_texts[page_num] = text
+        return page_texts
+
+    def chapter_title(self, page_num, default):
+        """取章节首页第一行作为标题，过短时使用默认标题"""
+        lines = self.get(page_num).split('\n')
+        if lines and len(lines[0].strip()) > 3:
+            return lines[0].strip()[:50]
+        return default
+
+class ChapterStreamWriter:
+    """章节流式写出 - 每章写完立即释放写入器，内存不随章节数增长"""
+
+    def __init__(self, document, output_dir, stem):
+        """
+        Args:
+            document: 共享的PDFDocument句柄
+            output_dir: 输出目录
+            stem: 输出文件名前缀
+        """
+        self.document = document
+        self.output_dir = Path(output_dir)
+        self.stem = stem
+        self.chapters_written = 0
+
+    def write(self, chapter_number, start_page, end_page):
+        """
+        写出一个章节PDF（原子写入）
+
+        Args:
+            chapter_number: 章节编号（从1开始）
+            start_page: 起始页（包含）
+            end_page: 结束页（不包含）
+
+        Returns:
+            Path: 章节文件路径
+        """
+        import PyPDF2
+
+        writer = PyPDF2.PdfWriter()
+        for page_num in range(start_page, end_page):
+            writer.add_page(self.document.get_page(page_num))
+
+        chapter_path = self.output_dir / f"{self.stem}_chapter_{chapter_number:03d}.pdf"
+        with atomic_open(chapter_path, 'wb') as chapter_file:
+            writer.write(chapter_file)
+
+        self.chapters_written += 1
+        return chapter_path
+
+    def skip(self, chapter_number, start_page, end_page):
+        """续跑时跳过检查点中已完成的章节（章节PDF已在之前的运行中写出）"""
+        return None
+
+    def close(self):
+        """写出结束（没有需要释放的资源）"""
+        return None
+
+    def stats(self):
+        """写出统计"""
+        return {'engine': 'pypdf2', 'chapters_written': self.chapters_written}
+
+# 章节写出方式
+SPLIT_ENGINES = ('pypdf2', 'raw', 'streaming', 'virtual')
+
+# 对象头部中的间接引用，以及需要跳过的字符串、十六进制字符串、注释和结束关键字
+_OBJECT_TOKENS = re.compile(
+    rb'(?<![\w.#/+-])(\d+)\s+(\d+)\s+R(?![\w])|\(|%|(?<!<)<(?!<)|(?<![\w/])(stream|endobj)(?![\w])'
+)
+_STREAM_LENGTH = re.compile(rb'/Length(?![\w])\s+(\d+)(?:\s+(\d+)\s+R(?![\w]))?')
+_OBJECT_HEADER = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj(?![\w])')
+
+# 读取对象头部的初始块大小（找不到stream/endobj时加倍）
+_HEADER_CHUNK = 8192
+
+# 流数据复制块大小
+_COPY_CHUNK = 1024 * 1024
+
+class _SourceObject:
+    """待写出的源对象：头部（引用已定位）和可选的流数据位置"""
+
+    def __init__(self, header, refs, data=None, data_range=None):
+        self.header = header
+        self.refs = refs
+        self.data = data
+        self.data_range = data_range
+
+def _scan_object(buffer, start=0):
+    """
+    扫描对象体，定位其中的间接引用，在stream或endobj关键字处停止
+
+    Returns:
+        (关键字位置或None, 关键字, [(开始, 结束, 对象号, 代号)])
+    """
+    refs = []
+    pos = start
+    length = len(buffer)
+
+    while True:
+        match = _OBJECT_TOKENS.search(buffer, pos)
+        if match is None:
+            return None, None, refs
+
+        if match.group(1) is not None:
+            refs.append((match.start(), match.end(), int(match.group(1)), int(match.group(2))))
+            pos = match.end()
+        elif match.group(3) is not None:
+            return match.start(), match.group(3), refs
+        else:
+            token = buffer[match.start():match.start() + 1]
+            pos = match.end()
+            if token == b'(':
+                # 字面字符串：支持嵌套括号和反斜杠转义
+                depth = 1
+                while pos < length and depth:
+                    char = buffer[pos]
+                    if char == 0x5C:
+                        pos += 2
+                        continue
+                    if char == 0x28:
+                        depth += 1
+                    elif char == 0x29:
+                        depth -= 1
+                    pos += 1
+                if depth:
+                    return None, None, refs
+            elif token == b'%':
+                end = min((i for i in (buffer.find(b'\n', pos), buffer.find(b'\r', pos)) if i >= 0),
+                          default=-1)
+                if end < 0:
+                    return None, None, refs
+                pos = end
+            else:
+                end = buffer.find(b'>', pos)
+                if end < 0:
+                    return None, None, refs
+                pos = end + 1
+
+def _rewrite_refs(header, refs, mapping):
+    """按mapping（源对象号 -> 新对象号，None表示改为null）改写头部中的引用"""
+    parts = []
+    pos = 0
+    for start, end, idnum, _ in refs:
+        parts.append(header[pos:start])
+        new_id = mapping[idnum]
+        parts.append(b'null' if new_id is None else b'%d 0 R' % new_id)
+        pos = end
+    parts.append(header[pos:])
+    return b''.join(parts)
+
+class RawChapterWriter:
+    """
+    原始对象复制的章节写出器
+
+    从章节页面出发遍历引用到的对象，直接从源文件复制对象字节（流数据不解码、
+    不重新编码），只改写其中的对象引用；内容完全相同的对象在同一输出中只写一次。
+    页面对象本身经PyPDF2序列化（合并继承的Resources/MediaBox等属性），
+    指向章节外页面的引用（链接注释等）改为null。
+    源文件加密、对象在对象流中或字节与xref不符时退回PyPDF2读取该对象；
+    整章写出失败时退回PdfWriter。
+    """
+
+    def __init__(self, document, output_dir, stem):
+        """
+        Args:
+            document: 共享的PDFDocument句柄
+            output_dir: 输出目录
+            stem: 输出文件名前缀
+        """
+        self.document = document
+        self.output_dir = Path(output_dir)
+        self.stem = stem
+        self.chapters_written = 0
+        self.objects_written = 0
+        self.objects_deduplicated = 0
+        self.fallbacks = 0
+        self._page_ids = None
+        self._source = None
+        self._fallback_writer = None
+
+    def write(self, chapter_number, start_page, end_page):
+        """
+        写出一个章节PDF（原子写入）
+
+        Args:
+            chapter_number: 章节编号（从1开始）
+            start_page: 起始页（包含）
+            end_page: 结束页（不包含）
+
+        Returns:
+            Path: 章节文件路径
+        """
+        chapter_path = self.output_dir / f"{self.stem}_chapter_{chapter_number:03d}.pdf"
+
+        if not self.document.reader.is_encrypted:
+            try:
+                with atomic_open(chapter_path, 'wb') as chapter_file:
+                    self._write_chapter(chapter_file, start_page, end_page)
+                self.chapters_written += 1
+                return chapter_path
+            except MemoryError:
+                raise
+            except Exception as e:
+                logger.warning(f"原始对象复制失败（第 {chapter_number} 章），改用PdfWriter: {e}")
+
+        self.fallbacks += 1
+        if self._fallback_writer is None:
+            self._fallback_writer = ChapterStreamWriter(self.document, self.output_dir, self.stem)
+        chapter_path = self._fallback_writer.write(chapter_number, start_page, end_page)
+        self.chapters_written += 1
+        return chapter_path
+
+    def skip(self, chapter_number, start_page, end_page):
+        """续跑时跳过检查点中已完成的章节（章节PDF已在之前的运行中写出）"""
+        return None
+
+    def close(self):
+        """关闭源文件句柄（使用共享映射时没有单独的句柄）"""
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+        return None
+
+    def stats(self):
+        """写出统计"""
+        return {
+            'engine': 'raw',
+            'chapters_written': self.chapters_written,
+            'objects_written': self.objects_written,
+            'objects_deduplicated': self.objects_deduplicated,
+            'fallbacks': self.fallbacks
+        }
+
+    def _write_chapter(self, output, start_page, end_page):
+        """遍历章节引用的对象并写出完整的PDF文件"""
+        reader = self.document.reader
+        if self._page_ids is None:
+            self._page_ids = {
+                page.indirect_reference.idnum: page_num
+                for page_num, page in enumerate(reader.pages)
+                if page.indirect_reference is not None
+            }
+
+        # 新对象号：1为页面树，2为目录，其余按发现顺序分配
+        pages_id, catalog_id = 1, 2
+        mapping = {}
+        objects = {}
+        content_ids = {}
+        next_id = 3
+
+        page_ids = []
+        pending = []
+        for page_num in range(start_page, end_page):
+            page = self.document.get_page(page_num)
+            source_id = page.indirect_reference.idnum if page.indirect_reference is not None else None
+            header, refs = self._page_header(page)
+            new_id = next_id
+            next_id += 1
+            page_ids.append(new_id)
+            objects[new_id] = _SourceObject(header, refs)
+            if source_id is not None:
+                mapping[source_id] = new_id
+            pending.extend(refs)
+
+        chapter_pages = set(range(start_page, end_page))
+        while pending:
+            _, _, idnum, generation = pending.pop()
+            if idnum in mapping:
+                continue
+            if idnum in self._page_ids and self._page_ids[idnum] not in chapter_pages:
+                mapping[idnum] = None
+                continue
+
+            source = self._read_object(idnum, generation)
+            key = self._content_key(source)
+            if key in content_ids:
+                mapping[idnum] = content_ids[key]
+                self.objects_deduplicated += 1
+                continue
+
+            new_id = next_id
+            next_id += 1
+            content_ids[key] = new_id
+            mapping[idnum] = new_id
+            objects[new_id] = source
+            pending.extend(source.refs)
+
+        # 写出
+        offsets = {}
+        position = 0
+
+        def emit(data):
+            nonlocal position
+            output.write(data)
+            position += len(data)
+
+        emit(self.document.reader.pdf_header.encode('latin-1') + b'\n%\xe2\xe3\xcf\xd3\n')
+
+        offsets[pages_id] = position
+        emit(b'1 0 obj\n<< /Type /Pages /Kids [' + b' '.join(b'%d 0 R' % i for i in page_ids)
+             + b'] /Count %d >>\nendobj\n' % len(page_ids))
+        offsets[catalog_id] = position
+        emit(b'2 0 obj\n<< /Type /Catalog /Pages 1 0 R >>\nendobj\n')
+
+        for new_id in sorted(objects):
+            source = objects[new_id]
+            offsets[new_id] = position
+            header = _rewrite_refs(source.header, source.refs, mapping)
+            if new_id in page_ids:
+                header = b'<< /Parent 1 0 R ' + header[2:]
+            emit(b'%d 0 obj\n' % new_id + header)
+            if source.data is not None:
+                emit(source.data)
+            elif source.data_range is not None:
+                self._copy_range(source.data_range, emit)
+                emit(b'\nendstream')
+            emit(b'\nendobj\n')
+            self.objects_written += 1
+
+        xref_offset = position
+        size = next_id
+        emit(b'xref\n0 %d\n0000000000 65535 f \n' % size)
+        emit(b''.join(b'%010d 00000 n \n' % offsets[i] for i in range(1, size)))
+        emit(b'trailer\n<< /Size %d /Root 2 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, xref_offset))
+
+    def _page_header(self, page):
+        """页面字典（去掉/Parent，继承属性已由PyPDF2合并）及其中的引用"""
+        from PyPDF2.generic import DictionaryObject, NameObject
+
+        page_dict = DictionaryObject({
+            NameObject(key): value for key, value in page.items() if key != '/Parent'
+        })
+        buffer = io.BytesIO()
+        page_dict.write_to_stream(buffer, None)
+        header = buffer.getvalue()
+        _, _, refs = _scan_object(header)
+        return header, refs
+
+    def _read_object(self, idnum, generation):
+        """读取源对象：优先直接取源文件字节，否则经PyPDF2序列化"""
+        reader = self.document.reader
+        offset = reader.xref.get(generation, {}).get(idnum)
+        if offset is not None:
+            source = self._read_raw_object(idnum, offset)
+            if source is not None:
+                return source
+
+        from PyPDF2.generic import IndirectObject
+
+        obj = reader.get_object(IndirectObject(idnum, generation, reader))
+        buffer = io.BytesIO()
+        if obj is None:
+            buffer.write(b'null')
+        else:
+            obj.write_to_stream(buffer, None)
+        body = buffer.getvalue()
+        keyword_pos, keyword, refs = _scan_object(body)
+        if keyword == b'stream':
+            return _SourceObject(body[:keyword_pos], refs, data=body[keyword_pos:])
+        return _SourceObject(body, refs)
+
+    def _read_at(self, offset, size):
+        """读取源文件中的一段字节（优先从文档的共享映射切取）"""
+        view = self.document.buffer
+        if view is not None:
+            return bytes(view[offset:offset + size])
+        if self._source is None:
+            self._source = open(self.document.path, 'rb')
+        self._source.seek(offset)
+        return self._source.read(size)
+
+    def _read_raw_object(self, idnum, offset):
+        """从源文件偏移处读取对象，格式与预期不符时返回None"""
+        chunk_size = _HEADER_CHUNK
+        while True:
+            buffer = self._read_at(offset, chunk_size)
+            match = _OBJECT_HEADER.match(buffer)
+            if match is None or int(match.group(1)) != idnum:
+                return None
+
+            keyword_pos, keyword, refs = _scan_object(buffer, match.end())
+            if keyword is not None:
+                break
+            if len(buffer) < chunk_size:
+                return None
+            chunk_size *= 2
+
+        body_start = match.end()
+        header = buffer[body_start:keyword_pos]
+        refs = [(start - body_start, end - body_start, ref_id, gen) for start, end, ref_id, gen in refs]
+
+        if keyword == b'endobj':
+            return _SourceObject(header.rstrip(), refs)
+
+        # 流对象：按/Length定位数据，数据本身不读入内存
+        length = self._stream_length(header)
+        data_start = keyword_pos + len(b'stream')
+        if buffer[data_start:data_start + 2] == b'\r\n':
+            data_start += 2
+        elif buffer[data_start:data_start + 1] in (b'\n', b'\r'):
+            data_start += 1
+        else:
+            return None
+        if length is None:
+            return None
+
+        data_offset = offset + data_start
+        tail = self._read_at(data_offset + length, 32)
+        if not tail.lstrip().startswith(b'endstream'):
+            return None
+
+        return _SourceObject(header.rstrip() + b'\nstream\n', refs,
+                             data_range=(data_offset, length))
+
+    def _stream_length(self, header):
+        """流对象头部中的/Length（间接引用时解析）"""
+        match = _STREAM_LENGTH.search(header)
+        if match is None:
+            return None
+        if match.group(2) is None:
+            return int(match.group(1))
+
+        from PyPDF2.generic import IndirectObject
+        reader = self.document.reader
+        value = reader.get_object(IndirectObject(int(match.group(1)), int(match.group(2)), reader))
+        return int(value)
+
+    def _content_key(self, source):
+        """对象内容的哈希（同一输出中相同内容只写一次）"""
+        digest = hashlib.blake2b(source.header, digest_size=20)
+        if source.data is not None:
+            digest.update(source.data)
+        elif source.data_range is not None:
+            self._copy_range(source.data_range, digest.update)
+        return digest.digest()
+
+    def _copy_range(self, data_range, sink):
+        """分块复制源文件中的一段字节（共享映射时直接传递切片，不复制）"""
+        offset, length = data_range
+        view = self.document.buffer
+        if view is not None:
+            for start in range(offset, offset + length, _COPY_CHUNK):
+                with view[start:min(start + _COPY_CHUNK, offset + length)] as chunk:
+                    sink(chunk)
+            return
+
+        self._source.seek(offset)
+        while length > 0:
+            chunk = self._source.read(min(_COPY_CHUNK, length))
+            if not chunk:
+                raise IOError("源文件意外结束")
+            sink(chunk)
+            length -= len(chunk)
+
+class StreamingChapterWriter(RawChapterWriter):
+    """
+    有内存上限的流式章节写出器
+
+    在原始对象复制的基础上给文档挂一个MemoryGuard：流数据按块复制，
+    每章写完立即释放PyPDF2已解析对象缓存（文本提取等按页访问时也定期释放），
+    内存占用只与单章大小有关；回收后常驻内存仍超过上限时抛出MemoryLimitExceeded
+    """
+
+    def __init__(self, document, output_dir, stem, max_memory=None):
+        """
+        Args:
+            document: 共享的PDFDocument句柄（已挂有MemoryGuard时沿用）
+            output_dir: 输出目录
+            stem: 输出文件名前缀
+            max_memory: 常驻内存上限（字节，None表示只释放缓存）
+        """
+        super().__init__(document, output_dir, stem)
+        if document.memory_guard is None:
+            document.memory_guard = MemoryGuard(document, max_memory)
+        self.memory_guard = document.memory_guard
+
+    def write(self, chapter_number, start_page, end_page):
+        """写出一个章节PDF，写完后释放缓存并检查内存上限"""
+        chapter_path = super().write(chapter_number, start_page, end_page)
+        self.memory_guard.check(f"第 {chapter_number} 章")
+        return chapter_path
+
+    def stats(self):
+        """写出统计（含内存统计）"""
+        return {**super().stats(), 'engine': 'streaming', 'memory': self.memory_guard.report()}
+
+class VirtualChapterIndex:
+    """
+    虚拟章节：不写章节PDF，只记录每章的页面范围和页面对象在源文件中的偏移，
+    结束时写出一个索引文件 <stem>_chapters.json
+    """
+
+    def __init__(self, document, output_dir, stem):
+        """
+        Args:
+            document: 共享的PDFDocument句柄
+            output_dir: 输出目录
+            stem: 输出文件名前缀
+        """
+        self.document = document
+        self.output_dir = Path(output_dir)
+        self.stem = stem
+        self.chapters = []
+        self.path = self.output_dir / f"{stem}_chapters.json"
+
+    @property
+    def chapters_written(self):
+        return len(self.chapters)
+
+    def write(self, chapter_number, start_page, end_page):
+        """
+        记录一个章节（不写文件）
+
+        Returns:
+            None: 虚拟章节没有对应的PDF文件
+        """
+        reader = self.document.reader
+        offsets = []
+        for page_num in range(start_page, end_page):
+            reference = self.document.get_page(page_num).indirect_reference
+            offset = None
+            if reference is not None:
+                offset = reader.xref.get(reference.generation, {}).get(reference.idnum)
+            offsets.append(offset)
+
+        self.chapters.append({
+            'chapter_number': chapter_number,
+            'start_page': start_page,
+            'end_page': end_page,
+            'page_count': end_page - start_page,
+            'page_object_offsets': offsets
+        })
+        return None
+
+    def skip(self, chapter_number, start_page, end_page):
+        """
+        续跑时检查点中已完成的章节：索引文件在close时整体重写，
+        已完成的章节也要记录，索引才能覆盖整个文档
+        """
+        return self.write(chapter_number, start_page, end_page)
+
+    def close(self):
+        """写出索引文件（原子写入）"""
+        index = {
+            'source': str(self.document.path),
+            'source_size': self.document.path.stat().st_size,
+            'content_hash': self.document.content_hash,
+            'total_pages': self.document.total_pages,
+            'chapters': self.chapters
+        }
+        with atomic_open(self.path, 'w') as f:
+            json.dump(index, f, indent=2, ensure_ascii=False)
+        return self.path
+
+    def stats(self):
+        """写出统计"""
+        return {'engine': 'virtual', 'chapters_written': len(self.chapters), 'index_file': str(self.path)}
+
+def create_chapter_writer(engine, document, output_dir, stem, max_memory=None):
+    """
+    按名称创建章节写出器（见SPLIT_ENGINES），max_memory只用于streaming
+
+    写出器接口：write(章节编号, 起始页, 结束页) -> 章节PDF路径（虚拟章节为None），
+    skip(章节编号, 起始页, 结束页) -> 续跑时登记之前已完成的章节，
+    close() -> 索引文件路径或None，stats() -> 统计
+
+    Raises:
+        ValueError: 未知的写出方式
+    """
+    writers = {
+        'pypdf2': ChapterStreamWriter,
+        'raw': RawChapterWriter,
+        'streaming': StreamingChapterWriter,
+        'virtual': VirtualChapterIndex
+    }
+    if engine not in writers:
+        raise ValueError(f"未知的拆分引擎: {engine}（可选: {', '.join(SPLIT_ENGINES)}）")
+    if engine == 'streaming':
+        return StreamingChapterWriter(document, output_dir, stem, max_memory)
+    return writers[engine](document, output_dir, stem)
+
+def chapter_ranges(boundaries, total_pages):
+    """
+    把章节起始页列表转换为页面范围
+
+    Yields:
+        (章节编号, 起始页, 结束页)，结束页不包含
+    """
+    for chapter_idx, start_page in enumerate(boundaries):
+        end_page = boundaries[chapter_idx + 1] if chapter_idx + 1 < len(boundaries) else total_pages
+        yield chapter_idx + 1, start_page, end_page
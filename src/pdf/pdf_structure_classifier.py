@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+PDF结构分类器 - 性能优化
+不栅格化，只读页面资源和内容流（图像XObject覆盖率、字体、文本操作符、内容流长度），
+毫秒级判断文本PDF还是扫描件；结果不确定时才需要栅格化分析
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 默认采样页数（在全文档中均匀分布）
+DEFAULT_SAMPLE_PAGES = 10
+
+# 图像覆盖页面面积超过该比例时视为整页图像
+FULL_PAGE_COVERAGE = 0.5
+
+# 某类页面占比达到该值时判定文档类型，否则为不确定
+DECISION_RATIO = 0.7
+
+# 内容流中的 q / Q / cm / Do / BI 操作符
+_NUMBER = rb'([-+]?(?:\d+\.?\d*|\.\d+))'
+_CONTENT_OPERATORS = re.compile(
+    rb'(?:' + rb'\s+'.join([_NUMBER] * 6) + rb'\s+cm\b)'
+    rb'|/([^\s/\[\]()<>{}%]+)\s+Do\b'
+    rb'|(?<![A-Za-z])(q|Q|BI)(?![A-Za-z])'
+)
+_TEXT_OPERATORS = re.compile(rb'(?<![A-Za-z])T[jJ](?![A-Za-z])')
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+def classify_pdf_structure(document, sample_pages=DEFAULT_SAMPLE_PAGES):
+    """
+    按页面结构判断PDF类型
+
+    Args:
+        document: 共享的PDFDocument句柄
+        sample_pages: 采样页数（均匀分布在全文档中）
+
+    Returns:
+        dict: 分类结果
+            pdf_type: 'text'、'scanned' 或 'unknown'（不确定，需要回退到文本提取/栅格化）
+            is_scanned_probability: 扫描件概率
+            confidence: 判定页面类型的占比
+            page_kinds: 各类页面数量（text/scanned/mixed/empty）
+    """
+    start_time = time.perf_counter()
+    total_pages = document.total_pages
+    pages = _sample_page_numbers(total_pages, sample_pages)
+
+    kinds = Counter()
+    page_details = []
+
+    for page_num in pages:
+        try:
+            info = analyze_page_structure(document.get_page(page_num))
+        except Exception as e:
+            logger.debug(f"第 {page_num + 1} 页结构分析失败: {e}")
+            continue
+        info['page'] = page_num
+        kinds[info['kind']] += 1
+        page_details.append(info)
+
+    analyzed = len(page_details)
+    content_pages = analyzed - kinds['empty']
+
+    if content_pages > 0:
+        text_ratio = kinds['text'] / content_pages
+        scanned_ratio = kinds['scanned'] / content_pages
+        scanned_probability = (kinds['scanned'] + 0.5 * kinds['mixed']) / content_pages
+    else:
+        text_ratio = scanned_ratio = scanned_probability = 0.0
+
+    if content_pages and text_ratio >= DECISION_RATIO:
+        pdf_type = 'text'
+    elif content_pages and scanned_ratio >= DECISION_RATIO:
+        pdf_type = 'scanned'
+    else:
+        pdf_type = 'unknown'
+
+    result = {
+        'pdf_type': pdf_type,
+        'method': 'structure',
+        'is_scanned_probability': round(scanned_probability, 3),
+        'confidence': round(max(text_ratio, scanned_ratio), 3),
+        'total_pages': total_pages,
+        'sampled_pages': analyzed,
+        'page_kinds': dict(kinds),
+        'avg_image_coverage': round(
+            sum(info['image_coverage'] for info in page_details) / analyzed, 3
+        ) if analyzed else 0.0,
+        'avg_content_length': round(
+            sum(info['content_length'] for info in page_details) / analyzed, 1
+        ) if analyzed else 0.0,
+        'elapsed_ms': round((time.perf_counter() - start_time) * 1000, 2)
+    }
+
+    logger.info(f"结构分类: {pdf_type} (采样 {analyzed} 页, {dict(kinds)}, "
+                f"耗时 {result['elapsed_ms']:.1f} 毫秒)")
+    return result
+
+def analyze_page_structure(page):
+    """
+    分析单页结构（不解码图像数据）
+
+    Args:
+        page: PyPDF2页面对象
+
+    Returns:
+        dict: kind、has_fonts、text_operators、image_coverage、content_length
+    """
+    width = float(page.mediabox.width)
+    height = float(page.mediabox.height)
+    page_area = abs(width * height) or 1.0
+
+    resources = _resolve(page.get('/Resources')) or {}
+    content = _content_bytes(page.get('/Contents'))
+
+    stats = {'text_operators': 0, 'image_area': 0.0, 'has_fonts': False}
+    _scan_content(content, resources, IDENTITY, stats, depth=0)
+
+    coverage = min(stats['image_area'] / page_area, 1.0)
+    has_text = stats['text_operators'] > 0 and stats['has_fonts']
+
+    if coverage >= FULL_PAGE_COVERAGE:
+        kind = 'mixed' if has_text else 'scanned'
+    elif has_text:
+        kind = 'text'
+    else:
+        kind = 'empty'
+
+    return {
+        'kind': kind,
+        'has_fonts': stats['has_fonts'],
+        'text_operators': stats['text_operators'],
+        'image_coverage': round(coverage, 3),
+        'content_length': len(content)
+    }
+
+def _scan_content(content, resources, ctm, stats, depth):
+    """扫描内容流：累计文本操作符、图像绘制面积（按q/Q/cm跟踪变换矩阵）"""
+    fonts = _resolve(resources.get('/Font'))
+    if fonts:
+        stats['has_fonts'] = True
+    stats['text_operators'] += len(_TEXT_OPERATORS.findall(content))
+
+    xobjects = _resolve(resources.get('/XObject')) or {}
+    stack = []
+
+    for match in _CONTENT_OPERATORS.finditer(content):
+        name, operator = match.group(7), match.group(8)
+
+        if operator == b'q':
+            stack.append(ctm)
+        elif operator == b'Q':
+            ctm = stack.pop() if stack else IDENTITY
+        elif operator == b'BI':
+            # 内联图像按当前变换矩阵绘制在单位正方形上
+            stats['image_area'] += _unit_square_area(ctm)
+        elif name is not None:
+            xobject = _resolve(xobjects.get('/' + name.decode('latin-1')))
+            if xobject is None:
+                continue
+            subtype = xobject.get('/Subtype')
+            if subtype == '/Image':
+                stats['image_area'] += _unit_square_area(ctm)
+            elif subtype == '/Form' and depth < 2:
+                # 表单XObject：用自己的资源和矩阵递归一层
+                form_matrix = tuple(float(v) for v in xobject.get('/Matrix', IDENTITY))
+                form_resources = _resolve(xobject.get('/Resources')) or resources
+                _scan_content(xobject.get_data(), form_resources,
+                              _multiply(form_matrix, ctm), stats, depth + 1)
+        else:
+            matrix = tuple(float(value) for value in match.groups()[:6])
+            ctm = _multiply(matrix, ctm)
+
+def _sample_page_numbers(total_pages, sample_pages):
+    """在全文档中均匀选取采样页"""
+    if total_pages <= sample_pages:
+        return list(range(total_pages))
+    if sample_pages <= 1:
+        return [0]
+    step = (total_pages - 1) / (sample_pages - 1)
+    return sorted({round(i * step) for i in range(sample_pages)})
+
+def _content_bytes(contents):
+    """页面内容流（可能是数组）解码后的字节"""
+    contents = _resolve(contents)
+    if contents is None:
+        return b''
+    if isinstance(contents, list):
+        return b'\n'.join(_resolve(item).get_data() for item in contents)
+    return contents.get_data()
+
+def _resolve(value):
+    """解析间接引用"""
+    if value is not None and hasattr(value, 'get_object'):
+        return value.get_object()
+    return value
+
+def _multiply(m, n):
+    """PDF变换矩阵乘法 m x n（6元组表示）"""
+    a1, b1, c1, d1, e1, f1 = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (
+        a1 * a2 + b1 * c2,
+        a1 * b2 + b1 * d2,
+        c1 * a2 + d1 * c2,
+        c1 * b2 + d1 * d2,
+        e1 * a2 + f1 * c2 + e2,
+        e1 * b2 + f1 * d2 + f2
+    )
+
+def _unit_square_area(ctm):
+    """单位正方形经变换矩阵映射后的面积"""
+    a, b, c, d, _, _ = ctm
+    return abs(a * d - b * c)
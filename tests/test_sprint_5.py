@@ -0,0 +1,1240 @@
+#!/usr/bin/env python3
+"""
+Sprint 5 功能测试
+测试PDF处理流程的性能优化
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加PDF模块目录到Python路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src' / 'pdf'))
+
+def print_header(title):
+    """打印标题"""
+    print("\n" + "=" * 60)
+    print(f" {title}")
+    print("=" * 60)
+
+def create_blank_pdf(path, num_pages):
+    """创建空白测试PDF，PyPDF2不可用时返回False"""
+    try:
+        import PyPDF2
+    except ImportError:
+        return False
+
+    writer = PyPDF2.PdfWriter()
+    for _ in range(num_pages):
+        writer.add_blank_page(width=612, height=792)
+    with open(path, 'wb') as f:
+        writer.write(f)
+    return True
+
+def test_shared_document_handle():
+    """测试共享文档句柄只解析一次PDF"""
+    print_header("测试共享文档句柄")
+
+    from pdf_document import PDFDocument, use_document
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "blank.pdf"
+        if not create_blank_pdf(pdf_path, 5):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+
+        with PDFDocument(pdf_path) as doc:
+            reader = doc.reader
+            assert doc.total_pages == 5
+            assert doc.get_page(4) is not None
+
+            # 复用句柄时不会重新创建reader
+            with use_document(pdf_path, doc) as shared:
+                assert shared is doc
+                assert shared.reader is reader
+            assert doc.is_open
+
+        assert not doc.is_open
+        print("✅ 文档句柄复用正常")
+
+    return True
+
+def test_raster_windows():
+    """测试栅格化窗口划分"""
+    print_header("测试栅格化窗口划分")
+
+    from pdf_ocr_module import _split_into_windows
+
+    windows = _split_into_windows([0, 1, 2, 3, 4, 7, 8, 12], 3)
+    assert windows == [[0, 1, 2], [3, 4], [7, 8], [12]]
+    assert _split_into_windows([], 8) == []
+    print(f"✅ 窗口划分正确: {windows}")
+
+    try:
+        from PIL import Image
+    except ImportError:
+        print("⚠️  PIL未安装，跳过窗口回退测试")
+        return True
+
+    from pdf_ocr_module import PDFOCR
+
+    # 窗口渲染到磁盘后第2页文件损坏：已产出的第1页不重复，只对其余页面逐页渲染
+    def rasterize_pages(pdf_path, first_page, last_page, dpi=200, output_folder=None, paths_only=False):
+        if not paths_only:
+            return [Image.new('L', (8, 8), first_page)]
+        paths = []
+        for page_num in range(first_page, last_page + 1):
+            image_path = Path(output_folder) / f"page-{page_num:03d}.png"
+            if page_num == 1:
+                image_path.write_bytes(b'not an image')
+            else:
+                Image.new('L', (8, 8), page_num).save(image_path)
+            paths.append(str(image_path))
+        return paths
+
+    ocr = PDFOCR(backend='stub')
+    ocr.rasterize_pages = rasterize_pages
+    pages = [page_num for page_num, _ in ocr.iter_page_images("unused.pdf", [0, 1, 2], window_size=3,
+                                                               paths_only=True)]
+    assert pages == [0, 1, 2], pages
+    print("✅ 窗口中途失败时已产出的页面不重复")
+
+    return True
+
+def test_ocr_cache():
+    """测试OCR结果缓存的命中统计和LRU淘汰"""
+    print_header("测试OCR结果缓存")
+
+    from pdf_memory import parse_size
+    from pdf_ocr_cache import OCRCache
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = OCRCache(temp_dir, max_size=1000)
+
+        key = OCRCache.make_key('doc', 0, 200, 'eng', True)
+        assert key != OCRCache.make_key('doc', 0, 300, 'eng', True)
+
+        cache.put(key, '第一页文本')
+        assert cache.lookup([key, 'missing']) == {key}
+        assert cache.get(key) == '第一页文本'
+
+        # 超出上限后淘汰最久未使用的条目
+        for i in range(20):
+            cache.put(f'page-{i}', 'x' * 100)
+        stats = cache.stats()
+        assert stats['size_bytes'] <= 1000
+        assert stats['evictions'] > 0
+        assert cache.get('page-19') == 'x' * 100
+        assert stats['hits'] == 1 and stats['misses'] == 1
+        cache.close()
+
+        # 重新打开后缓存仍然有效
+        reopened = OCRCache(temp_dir, max_size=1000)
+        assert reopened.get('page-19') == 'x' * 100
+        reopened.close()
+
+    assert parse_size('512M') == 512 * 1024 * 1024
+    assert parse_size('2g') == 2 * 1024 ** 3
+    print("✅ OCR缓存正常")
+
+    return True
+
+def test_processing_checkpoint():
+    """测试检查点的原子写入、页面日志和续跑"""
+    print_header("测试处理检查点")
+
+    from pdf_checkpoint import ProcessingCheckpoint, atomic_open
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_dir = Path(temp_dir)
+        fingerprint = {'content_hash': 'abc', 'pages_per_chapter': 2}
+
+        # 写入失败时不留下半成品文件
+        target = output_dir / "chapter.txt"
+        try:
+            with atomic_open(target) as f:
+                f.write("半成品")
+                raise RuntimeError("中断")
+        except RuntimeError:
+            pass
+        assert not target.exists()
+        assert os.listdir(output_dir) == []
+
+        with atomic_open(target) as f:
+            f.write("第一章")
+        assert target.read_text(encoding='utf-8') == "第一章"
+
+        checkpoint = ProcessingCheckpoint(output_dir, "book", fingerprint)
+        checkpoint.record_page(0, "第1页")
+        checkpoint.record_page(1, "第2页")
+        checkpoint.record_chapter(0, {'text_file': 'chapter.txt', 'pdf_file': None, 'text_chars': 3})
+        checkpoint.record_page(2, "第3页")
+        checkpoint.close()
+
+        # 模拟中断时写了一半的日志行
+        with open(checkpoint.journal_path, 'a', encoding='utf-8') as f:
+            f.write('{"page": 3, "te')
+
+        resumed = ProcessingCheckpoint(output_dir, "book", fingerprint)
+        assert resumed.load()
+        assert resumed.is_chapter_done(0) and not resumed.is_chapter_done(1)
+        assert resumed.journal_pages == {2: "第3页"}
+
+        # 参数变化或输出文件丢失时不能续跑
+        assert not ProcessingCheckpoint(output_dir, "book", {'content_hash': 'xyz'}).load()
+        os.remove(target)
+        missing = ProcessingCheckpoint(output_dir, "book", fingerprint)
+        assert missing.load() and not missing.is_chapter_done(0)
+
+        missing.reset()
+        assert not missing.path.exists() and not missing.journal_path.exists()
+        print("✅ 检查点续跑正常")
+
+        try:
+            import PIL
+        except ImportError:
+            print("⚠️  PIL未安装，跳过端到端测试")
+            return True
+
+        import json
+        import pdf_split_engine
+        from pdf_ocr_processor import PDFOCRProcessor
+
+        pdf_path = output_dir / "scan.pdf"
+        if not create_blank_pdf(pdf_path, 4):
+            print("⚠️  PyPDF2未安装，跳过端到端测试")
+            return True
+
+        # 章节写完但写出器关闭（写索引）失败：检查点不能标记为完成
+        def fail_close(self):
+            raise OSError("磁盘已满")
+
+        processor = PDFOCRProcessor(dpi=30, ocr_backend='stub', split_engine='virtual')
+        close = pdf_split_engine.VirtualChapterIndex.close
+        pdf_split_engine.VirtualChapterIndex.close = fail_close
+        try:
+            result = processor.process_scanned_pdf(pdf_path, output_dir / "scan", pages_per_chapter=2)
+        finally:
+            pdf_split_engine.VirtualChapterIndex.close = close
+        assert not result['success']
+        checkpoint_path = output_dir / "scan" / "scan_checkpoint.json"
+        assert not json.loads(checkpoint_path.read_text(encoding='utf-8'))['completed']
+
+        result = processor.process_scanned_pdf(pdf_path, output_dir / "scan", pages_per_chapter=2, resume=True)
+        assert result['success'] and Path(result['chapter_index']).exists()
+        assert json.loads(checkpoint_path.read_text(encoding='utf-8'))['completed']
+        print("✅ 写出器关闭失败时检查点未标记完成")
+
+    return True
+
+def test_single_pass_split():
+    """测试单遍拆分引擎：页面文本只提取一次，章节逐章写出"""
+    print_header("测试单遍拆分引擎")
+
+    from pdf_document import PDFDocument
+    from pdf_split_engine import ChapterStreamWriter, PageTextCache, chapter_ranges
+
+    assert list(chapter_ranges([0, 3, 7], 10)) == [(1, 0, 3), (2, 3, 7), (3, 7, 10)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "blank.pdf"
+        if not create_blank_pdf(pdf_path, 10):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+
+        with PDFDocument(pdf_path) as doc:
+            page_texts = PageTextCache(doc)
+            assert page_texts.detection_texts(range(5)) == {}
+            assert page_texts.chapter_title(0, "第 1 章") == "第 1 章"
+            assert page_texts.extractions == 5
+
+            writer = ChapterStreamWriter(doc, temp_dir, "blank")
+            paths = [writer.write(*chapter) for chapter in chapter_ranges([0, 4], 10)]
+            assert writer.chapters_written == 2
+
+        import PyPDF2
+        assert [len(PyPDF2.PdfReader(str(p)).pages) for p in paths] == [4, 6]
+        print("✅ 单遍拆分正常")
+
+    return True
+
+def test_page_text_index():
+    """测试全文档页面文本索引和磁盘缓存"""
+    print_header("测试页面文本索引")
+
+    from pdf_document import PDFDocument
+    from pdf_page_index import _split_page_ranges, build_page_text_index
+
+    assert _split_page_ranges(0, 4) == []
+    ranges = _split_page_ranges(1000, 4)
+    assert ranges[0][0] == 0 and ranges[-1][1] == 1000
+    assert all(end - start >= 50 for start, end in ranges[:-1])
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "blank.pdf"
+        if not create_blank_pdf(pdf_path, 30):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+
+        cache_dir = Path(temp_dir) / "index"
+        with PDFDocument(pdf_path) as doc:
+            index = build_page_text_index(doc, cache_dir=cache_dir)
+            assert len(index) == 30 and not index.cached
+            assert len(index.page_times) == 30
+
+            cached = build_page_text_index(doc, cache_dir=cache_dir)
+            assert cached.cached and cached.texts == index.texts
+
+        stats = cached.stats()
+        assert stats['total_pages'] == 30 and len(stats['slowest_pages']) == 5
+        print(f"✅ 页面文本索引正常: 平均 {stats['avg_page_ms']} 毫秒/页")
+
+    return True
+
+def test_batch_chapter_detection():
+    """测试合并正则的批量章节检测与逐页判断一致"""
+    print_header("测试批量章节检测")
+
+    from pdf_chapter_detector import ChapterDetector
+
+    detector = ChapterDetector()
+    page_texts = {
+        0: "第一章 引言\n\n本文介绍PDF章节检测技术...",
+        1: "这是引言部分的继续内容，没有标题。",
+        2: "some words\nmore words\nChapter 3 begins here\nbody",
+        3: "x\ny\nz\nSection 5 hidden below the title lines",
+        4: "x\nA title with a capital\nbody text here.",
+        5: "正文内容。\n正文继续\n正文继续\n正文继续",
+    }
+
+    scores = detector.detect_from_text_batch(page_texts)
+    assert scores == {page: detector._is_chapter_start(text, page) for page, text in page_texts.items()}
+    assert scores[0][0] and scores[2][0]
+    assert not scores[3][0] and not scores[5][0]
+    # ^开头的模式只匹配第一行，\s不跨行
+    assert not detector.combined_pattern.search("x\nA title")
+    print(f"✅ 批量检测结果一致: {sorted(p for p, s in scores.items() if s[0])}")
+
+    return True
+
+def test_numpy_preprocessing():
+    """测试NumPy原地预处理：均衡化与PIL一致，自适应阈值不受底色渐变影响"""
+    print_header("测试NumPy图像预处理")
+
+    try:
+        import numpy as np
+        from PIL import Image, ImageOps
+    except ImportError:
+        print("⚠️  NumPy/PIL未安装，跳过测试")
+        return True
+
+    from pdf_image_preprocess import adaptive_threshold, equalize_histogram, preprocess_for_ocr
+
+    rng = np.random.default_rng(0)
+    array = rng.integers(0, 200, (120, 90)).astype(np.uint8)
+    expected = np.array(ImageOps.equalize(Image.fromarray(array)))
+    assert equalize_histogram(array) is array
+    assert (array == expected).all()
+
+    # 左暗右亮的底色上画一条深色横线：全局阈值会把左半边整片判为黑色
+    background = np.tile(np.linspace(100, 250, 200).astype(np.uint8), (100, 1))
+    background[48:52, 10:190] = (background[48:52, 10:190] * 0.3).astype(np.uint8)
+    binary = adaptive_threshold(background.copy(), tile_size=8, window_tiles=3)
+    assert set(np.unique(binary)) <= {0, 255}
+    assert (binary[48:52, 16:184] == 0).all()
+    assert (binary[:30] == 255).mean() > 0.95
+
+    image = preprocess_for_ocr(Image.fromarray(np.dstack([background] * 3)))
+    assert image.mode == 'L' and image.size == (200, 100)
+    print("✅ NumPy预处理正常")
+
+    return True
+
+def test_structure_classifier():
+    """测试按页面结构判断文本PDF/扫描件，结果缓存在文档句柄上"""
+    print_header("测试页面结构分类")
+
+    from pdf_document import PDFDocument
+    from pdf_structure_classifier import _multiply, _sample_page_numbers, _unit_square_area
+
+    assert _sample_page_numbers(5, 10) == [0, 1, 2, 3, 4]
+    assert _sample_page_numbers(100, 3) == [0, 50, 99]
+    # 整页图像: 先缩放到页面大小再平移
+    ctm = _multiply((612, 0, 0, 792, 0, 0), _multiply((1, 0, 0, 1, 10, 10), (1, 0, 0, 1, 0, 0)))
+    assert _unit_square_area(ctm) == 612 * 792
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "blank.pdf"
+        if not create_blank_pdf(pdf_path, 5):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+
+        # 空白页既无文本也无图像，结构无法判断，交给文本提取/栅格化
+        with PDFDocument(pdf_path) as doc:
+            structure = doc.structure
+            assert structure['pdf_type'] == 'unknown'
+            assert structure['page_kinds'] == {'empty': 5}
+            assert doc.structure is structure
+
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+        from synthetic_pdf import make_pdf
+
+        for image_only, expected in ((False, 'text'), (True, 'scanned')):
+            path = Path(temp_dir) / f"{expected}.pdf"
+            make_pdf(path, 30, image_only=image_only)
+            with PDFDocument(path) as doc:
+                assert doc.structure['pdf_type'] == expected
+                assert doc.structure['sampled_pages'] == 10
+
+        print("✅ 页面结构分类正常")
+
+    return True
+
+def test_adaptive_dpi():
+    """测试自适应分辨率：空白页检测、行高估计、DPI选择和置信度统计"""
+    print_header("测试自适应OCR分辨率")
+
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        print("⚠️  PIL未安装，跳过测试")
+        return True
+
+    from pdf_adaptive_dpi import analyze_thumbnail, choose_dpi, next_dpi
+    from pdf_ocr_backends import _data_to_text, _mean_confidence
+
+    # 72 DPI缩略图上1像素=1磅
+    blank = Image.new('L', (612, 792), 250)
+    assert analyze_thumbnail(blank)['blank']
+
+    page = blank.copy()
+    draw = ImageDraw.Draw(page)
+    for y in range(72, 700, 24):
+        draw.rectangle([72, y, 540, y + 9], fill=30)
+    info = analyze_thumbnail(page)
+    assert not info['blank'] and info['line_height_pt'] == 10.0
+
+    # 大字号用低分辨率，小字号和未知行高的处理
+    assert choose_dpi(30) == 150 and choose_dpi(10) == 200 and choose_dpi(4) == 300
+    assert choose_dpi(None) == 150
+    assert next_dpi(200) == 250 and next_dpi(300) is None
+
+    data = {
+        'text': ['第一行', 'words', '', '第二段'],
+        'conf': ['90', '80', '-1', '40'],
+        'block_num': [1, 1, 1, 1], 'par_num': [1, 1, 1, 2], 'line_num': [1, 1, 2, 1]
+    }
+    assert _data_to_text(data) == "第一行 words\n\n第二段"
+    assert _mean_confidence(data) == 70.0
+    assert _mean_confidence({'text': [''], 'conf': ['-1']}) is None
+    print("✅ 自适应分辨率正常")
+
+    return True
+
+def test_persistent_ocr_engine():
+    """测试OCR引擎在进程内只创建一次（语言模型只加载一次）"""
+    print_header("测试持久OCR引擎")
+
+    import types
+    from pdf_ocr_backends import resolve_engine_class
+    from pdf_ocr_module import PDFOCR
+
+    class FakeTessAPI:
+        instances = 0
+
+        def __init__(self, lang):
+            # 加载语言模型较慢，多个线程同时首次识别时容易各自创建一个
+            time.sleep(0.05)
+            FakeTessAPI.instances += 1
+            self.image = None
+
+        def SetImage(self, image):
+            self.image = image
+
+        def GetUTF8Text(self):
+            return f"page {self.image}\n"
+
+        def MeanTextConf(self):
+            return 88
+
+        def End(self):
+            pass
+
+    fake_module = types.ModuleType('tesserocr')
+    fake_module.PyTessBaseAPI = FakeTessAPI
+    original = sys.modules.get('tesserocr')
+    sys.modules['tesserocr'] = fake_module
+    try:
+        ocr = PDFOCR(lang='eng+chi_sim', enable_preprocessing=False, backend='tesserocr')
+        assert ocr.backend_name == 'tesseract/tesserocr'
+        texts = [ocr.recognize_image(page) for page in range(3)]
+        assert texts == ["page 0", "page 1", "page 2"]
+        assert ocr.recognize_image_with_confidence(3) == ("page 3", 88.0)
+        assert FakeTessAPI.instances == 1
+        ocr.close()
+
+        # 多个线程同时首次识别（调度和流水线模式）：仍然只创建一个引擎
+        from concurrent.futures import ThreadPoolExecutor
+        ocr = PDFOCR(lang='eng', enable_preprocessing=False, backend='tesserocr')
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            texts = list(executor.map(ocr.recognize_image, range(8)))
+        assert texts == [f"page {page}" for page in range(8)]
+        assert FakeTessAPI.instances == 2
+        ocr.close()
+    finally:
+        if original is None:
+            del sys.modules['tesserocr']
+        else:
+            sys.modules['tesserocr'] = original
+
+    try:
+        resolve_engine_class('unknown')
+        assert False, "未知引擎应该报错"
+    except ValueError:
+        pass
+    print("✅ OCR引擎只初始化一次")
+
+    return True
+
+def test_stub_ocr_backend():
+    """测试OCR后端注册表和stub后端：不需要tesseract也能跑完整OCR流程"""
+    print_header("测试stub OCR后端")
+
+    try:
+        import PIL
+    except ImportError:
+        print("⚠️  PIL未安装，跳过测试")
+        return True
+
+    from pdf_ocr_backends import StubBackend, create_ocr_backend
+    from pdf_ocr_processor import PDFOCRProcessor
+
+    backend = create_ocr_backend('stub:latency_ms=1,raster_ms=0', 'eng')
+    assert isinstance(backend, StubBackend) and backend.latency_ms == 1
+    for bad_spec in ('unknown', 'stub:latency_ms'):
+        try:
+            create_ocr_backend(bad_spec)
+            assert False, f"{bad_spec} 应该报错"
+        except ValueError:
+            pass
+
+    # 同一页的合成文本是确定的，不同页不同
+    first, second = backend.rasterize('unused.pdf', 1, 2, dpi=50)
+    again = backend.rasterize('unused.pdf', 1, 1, dpi=50)[0]
+    assert backend.recognize(first) == backend.recognize(again) != backend.recognize(second)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "scan.pdf"
+        if not create_blank_pdf(pdf_path, 6):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+
+        processor = PDFOCRProcessor(dpi=50, ocr_backend='stub', enable_preprocessing=False)
+        assert processor.is_available()
+        result = processor.process_scanned_pdf(pdf_path, Path(temp_dir) / "out", pages_per_chapter=4)
+        assert result['success'] and result['chapters_created'] == 2
+        assert result['ocr_backend'] == 'stub'
+        assert result['total_text_chars'] > 0
+        print(f"✅ stub后端处理 {result['total_pages']} 页")
+
+    return True
+
+def test_ocr_pipeline():
+    """测试OCR流水线：结果保持页序、异常传给消费者、提前退出时线程停止"""
+    print_header("测试OCR流水线")
+
+    import threading
+    from pdf_ocr_pipeline import PipelineStats, StagedPipeline
+
+    stats = PipelineStats(queue_depth=2)
+    pipeline = StagedPipeline(range(50), [('double', lambda x: x * 2), ('inc', lambda x: x + 1)],
+                              stats, queue_depth=2)
+    assert list(pipeline) == [x * 2 + 1 for x in range(50)]
+    report = stats.report()
+    assert [report['stages'][name]['items'] for name in ('source', 'double', 'inc')] == [50, 50, 50]
+    assert all(queue['max_depth'] <= 2 for queue in report['queues'].values())
+
+    def fail_on_ten(x):
+        if x == 10:
+            raise ValueError("boom")
+        return x
+
+    try:
+        list(StagedPipeline(range(50), [('check', fail_on_ten)]))
+        assert False, "阶段异常应该传给消费者"
+    except ValueError:
+        pass
+
+    threads_before = threading.active_count()
+    results = iter(StagedPipeline(range(1000), [('noop', lambda x: x)], queue_depth=1))
+    assert next(results) == 0
+    results.close()
+    assert threading.active_count() == threads_before
+    print("✅ 流水线页序、异常和提前退出正常")
+
+    try:
+        import PIL
+    except ImportError:
+        print("⚠️  PIL未安装，跳过端到端测试")
+        return True
+
+    from pdf_ocr_processor import PDFOCRProcessor
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "scan.pdf"
+        if not create_blank_pdf(pdf_path, 5):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+
+        texts = []
+        for depth in (0, 2):
+            processor = PDFOCRProcessor(dpi=50, ocr_backend='stub', pipeline_depth=depth)
+            output_dir = Path(temp_dir) / f"out_{depth}"
+            result = processor.process_scanned_pdf(pdf_path, output_dir, pages_per_chapter=2)
+            assert result['success'] and result['pipeline']['enabled'] == (depth > 0)
+            texts.append([Path(path).read_text(encoding='utf-8') for path in result['text_files']])
+
+        assert texts[0] == texts[1]
+        assert result['pipeline']['stages']['recognize']['items'] == 5
+        print("✅ 流水线与逐页处理的输出一致")
+
+    return True
+
+def test_streamed_chapter_text():
+    """测试章节文本逐页写入文件：字符计数与文件内容一致，失败时不留下半成品"""
+    print_header("测试章节文本流式写入")
+
+    try:
+        import PIL
+    except ImportError:
+        print("⚠️  PIL未安装，跳过测试")
+        return True
+
+    from pdf_ocr_processor import PDFOCRProcessor
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "scan.pdf"
+        if not create_blank_pdf(pdf_path, 7):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+
+        output_dir = Path(temp_dir) / "out"
+        processor = PDFOCRProcessor(dpi=50, ocr_backend='stub', enable_preprocessing=False)
+        result = processor.process_scanned_pdf(pdf_path, output_dir, pages_per_chapter=3)
+        assert result['success'] and len(result['text_files']) == 3
+
+        texts = [Path(path).read_text(encoding='utf-8') for path in result['text_files']]
+        assert result['total_text_chars'] == sum(len(text) for text in texts)
+        assert texts[0].count("--- 第 ") == 3 and "--- 第 7 页 ---" in texts[2]
+        assert not list(output_dir.glob("*.tmp"))
+        print(f"✅ {len(texts)} 个章节文件, {result['total_text_chars']} 字符")
+
+    return True
+
+def test_page_scheduler():
+    """测试批量处理的跨文档页面调度：共享进程池、短作业优先、延迟统计"""
+    print_header("测试跨文档页面调度")
+
+    from pdf_ocr_scheduler import PageScheduler, percentile
+
+    assert percentile([3, 1, 2, 4], 0.5) == 2 and percentile([5], 0.99) == 5
+    try:
+        PageScheduler(None, 2, policy='random')
+        assert False, "未知策略应该报错"
+    except ValueError:
+        pass
+
+    try:
+        import PIL
+    except ImportError:
+        print("⚠️  PIL未安装，跳过端到端测试")
+        return True
+
+    from pdf_ocr_processor import PDFOCRProcessor
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_files = []
+        for name, pages in (("big", 12), ("small_a", 2), ("small_b", 3)):
+            pdf_path = Path(temp_dir) / f"{name}.pdf"
+            if not create_blank_pdf(pdf_path, pages):
+                print("⚠️  PyPDF2未安装，跳过测试")
+                return True
+            pdf_files.append(pdf_path)
+        pdf_files.append(Path(temp_dir) / "missing.pdf")
+
+        processor = PDFOCRProcessor(dpi=50, ocr_backend='stub', workers=2, raster_window=4)
+        results = processor.batch_process(pdf_files, Path(temp_dir) / "out",
+                                          scheduling='sjf', pages_per_chapter=5)
+        assert results['successful'] == 3 and results['failed'] == 1
+        assert [Path(detail['file']).name for detail in results['details']] == \
+            ["big.pdf", "small_a.pdf", "small_b.pdf", "missing.pdf"]
+
+        scheduler = results['scheduler']
+        assert scheduler['policy'] == 'sjf' and scheduler['units_dispatched'] == 3 + 1 + 1
+        assert scheduler['max_in_flight'] <= 2
+        latencies = {Path(detail['file']).stem: detail['latency'] for detail in results['details'][:3]}
+        assert latencies['small_a'] <= latencies['big'] and latencies['small_b'] <= latencies['big']
+        assert scheduler['makespan'] == max(latencies.values())
+        print(f"✅ 完成时间 {scheduler['makespan']}s, 延迟 {latencies}")
+
+        # 多个文档线程共享同一个OCR缓存（SQLite连接跨线程使用）
+        cache_dir = Path(temp_dir) / "cache"
+        for run in range(2):
+            cached = PDFOCRProcessor(dpi=50, ocr_backend='stub', workers=2, raster_window=4,
+                                     cache_dir=cache_dir)
+            results = cached.batch_process(pdf_files[:3], Path(temp_dir) / f"cached_{run}",
+                                           scheduling='sjf', pages_per_chapter=5)
+            assert results['successful'] == 3 and results['failed'] == 0, results['details']
+            hits = sum(detail['ocr_cache']['hits'] for detail in results['details'])
+            assert hits == (0 if run == 0 else 12 + 2 + 3)
+        print("✅ 共享缓存的批量调度正常，第二次全部命中")
+
+        # 查询命中后条目被淘汰（get返回None）：第2页在文档主请求开始后单独补做，
+        # 补做的请求结束时不影响主请求之后完成的单元
+        evicting = PDFOCRProcessor(dpi=50, ocr_backend='stub:latency_ms=20', workers=2, raster_window=4,
+                                   cache_dir=Path(temp_dir) / "evicting")
+        lookup = evicting.cache.lookup
+
+        def lookup_then_evict(keys):
+            keys = list(keys)
+            lookup(keys)
+            return {keys[1]}
+
+        evicting.cache.lookup = lookup_then_evict
+        results = evicting.batch_process(pdf_files[:3], Path(temp_dir) / "evicted",
+                                         scheduling='sjf', pages_per_chapter=5)
+        assert results['successful'] == 3 and results['failed'] == 0, results['details']
+        print("✅ 查询后被淘汰的页面补做OCR，文档其余页面正常完成")
+
+    # 文档提前结束后，仍在运行的单元完成时结果被丢弃
+    from concurrent.futures import Future
+
+    scheduler = PageScheduler(processor, 2)
+    scheduler.add_document("late.pdf", 2)
+    results = scheduler.iter_results("late.pdf", [0, 1])
+    scheduler._job("late.pdf").results[0] = (0, "a", None, {})
+    assert next(results)[0] == 0
+    job = scheduler._job("late.pdf")
+    request = job.pending_units[0][0]
+    results.close()
+    assert request.closed and not job.pending_units
+    future = Future()
+    future.set_result([(1, "b", None, {})])
+    scheduler._in_flight = 1
+    scheduler._on_unit_done(job, request, [1], 0, future)
+    assert job.results == {} and scheduler._in_flight == 0
+
+    # 工作进程被杀后进程池不再接受任务：运行中和尚未调度的页面都按失败返回，不会一直等待
+    from concurrent.futures.process import BrokenProcessPool
+
+    class BrokenExecutor:
+        def __init__(self):
+            self.submitted = 0
+
+        def submit(self, *args):
+            self.submitted += 1
+            if self.submitted > 1:
+                raise BrokenProcessPool("工作进程意外退出")
+            future = Future()
+            future.set_exception(BrokenProcessPool("工作进程意外退出"))
+            return future
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            pass
+
+    broken = PageScheduler(PDFOCRProcessor(ocr_backend='stub', raster_window=2), 2)
+    broken.add_document("killed.pdf", 6)
+    with broken:
+        broken._executor.shutdown()
+        with broken._condition:
+            broken._executor = BrokenExecutor()
+        results = list(broken.iter_results("killed.pdf", range(6)))
+        assert [result[0] for result in results] == list(range(6))
+        assert all(result[2] for result in results)
+        assert not broken._dispatcher.is_alive()
+        # 调度线程退出后提交的请求也立即返回
+        assert all(result[2] for result in broken.iter_results("killed.pdf", [0, 1]))
+    print("✅ 进程池不可用时所有页面按失败返回")
+
+    return True
+
+def test_inbox_watcher():
+    """测试收件箱监视：稳定后处理、内容去重、结果移到发件箱、同名新内容替换旧结果"""
+    print_header("测试收件箱监视")
+
+    import json
+    import shutil
+    from pdf_batch_watcher import PDFInboxWatcher
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        inbox, outbox = Path(temp_dir) / "inbox", Path(temp_dir) / "outbox"
+        source_a, source_b = Path(temp_dir) / "a.pdf", Path(temp_dir) / "b.pdf"
+        if not (create_blank_pdf(source_a, 3) and create_blank_pdf(source_b, 5)):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+
+        watcher = PDFInboxWatcher(inbox, outbox, settle_seconds=0, use_watchdog=False,
+                                  pages_per_chapter=2)
+        with watcher:
+            shutil.copy(source_a, inbox / "report.pdf")
+            assert watcher.poll() == 1
+            assert not list(inbox.iterdir())
+            assert (outbox / "report" / "report.pdf").exists()
+            assert watcher.stats['processed'] == 1
+
+            # 相同内容换个名字：不再处理
+            shutil.copy(source_a, inbox / "report_copy.pdf")
+            watcher.poll()
+            assert watcher.stats == {'processed': 1, 'duplicates': 1, 'failed': 0}
+            assert (outbox / "_duplicates" / "report_copy.pdf").exists()
+
+            # 同名文件内容变化：重新处理并替换旧结果
+            shutil.copy(source_b, inbox / "report.pdf")
+            watcher.poll()
+            assert watcher.stats['processed'] == 2
+            assert len(list((outbox / "report").glob("*_chapter_*.pdf"))) == 3
+
+            (inbox / "broken.pdf").write_text("not a pdf")
+            watcher.poll()
+            assert watcher.stats['failed'] == 1 and (outbox / "_failed" / "broken.pdf").exists()
+
+        # 重启后去重状态仍然有效
+        shutil.copy(source_b, inbox / "again.pdf")
+        with PDFInboxWatcher(inbox, outbox, settle_seconds=0, use_watchdog=False,
+                             pages_per_chapter=2) as restarted:
+            restarted.poll()
+            assert restarted.stats['duplicates'] == 1
+
+        events = [json.loads(line) for line in (outbox / "watch_log.jsonl").read_text(encoding='utf-8').splitlines()]
+        assert [event['status'] for event in events] == \
+            ['processed', 'duplicate', 'processed', 'failed', 'duplicate']
+        assert not list((outbox / ".work").iterdir())
+        print(f"✅ 监视事件: {[event['status'] for event in events]}")
+
+    return True
+
+def test_batch_manifest():
+    """测试批量处理清单：未变化的文件跳过，内容或参数变化时重新处理"""
+    print_header("测试批量处理清单")
+
+    import shutil
+    from pdf_batch_processor import PDFBatchProcessor
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_dir = Path(temp_dir) / "input"
+        input_dir.mkdir()
+        if not (create_blank_pdf(input_dir / "a.pdf", 4) and create_blank_pdf(input_dir / "b.pdf", 6)):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+
+        processor = PDFBatchProcessor(base_output_dir=Path(temp_dir) / "output")
+
+        def run(**kwargs):
+            result = processor.process_directory(input_dir, pages_per_chapter=2, **kwargs)
+            return result['processed'], result['skipped']
+
+        assert run() == (2, 0)
+        assert run() == (0, 2)
+
+        # 只有修改时间变化：计算哈希后仍然跳过
+        os.utime(input_dir / "a.pdf", (1, 1))
+        assert run() == (0, 2)
+
+        # 内容变化：重新处理并清理旧输出
+        shutil.copy(input_dir / "a.pdf", input_dir / "b.pdf")
+        assert run() == (1, 1)
+        assert len(list((Path(temp_dir) / "output" / "input" / "b").glob("*_chapter_*.pdf"))) == 2
+
+        # 参数变化或强制处理：全部重新处理
+        assert processor.process_directory(input_dir, pages_per_chapter=3)['processed'] == 2
+        assert run(force=True) == (2, 0)
+
+        # 处理期间文件被替换：清单记录处理前的内容哈希，下次运行重新处理
+        replacement = Path(temp_dir) / "replacement.pdf"
+        create_blank_pdf(replacement, 8)
+        process_serial = processor._process_serial
+
+        def replace_during_processing(tasks, *args):
+            file_results = process_serial(tasks, *args)
+            shutil.copy(replacement, input_dir / "a.pdf")
+            return file_results
+
+        processor._process_serial = replace_during_processing
+        assert run(force=True) == (2, 0)
+        processor._process_serial = process_serial
+        assert run() == (1, 1)
+        print("✅ 清单跳过和重新处理正常")
+
+    return True
+
+def test_split_engines():
+    """测试章节写出方式：raw输出可被PyPDF2读取且与pypdf2一致，virtual只写页面范围索引"""
+    print_header("测试章节写出方式")
+
+    import json
+    from pdf_document import PDFDocument
+    from pdf_split_engine import create_chapter_writer
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "book.pdf"
+        if not create_blank_pdf(pdf_path, 7):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+
+        import PyPDF2
+
+        try:
+            create_chapter_writer('mmap', None, temp_dir, "book")
+            assert False, "未知写出方式应该报错"
+        except ValueError:
+            pass
+
+        ranges = [(1, 0, 3), (2, 3, 6), (3, 6, 7)]
+        outputs = {}
+        with PDFDocument(pdf_path) as doc:
+            for engine in ('pypdf2', 'raw', 'virtual'):
+                output_dir = Path(temp_dir) / engine
+                output_dir.mkdir()
+                writer = create_chapter_writer(engine, doc, output_dir, "book")
+                outputs[engine] = [writer.write(*chapter) for chapter in ranges]
+                outputs[engine + '_index'] = writer.close()
+                assert writer.stats()['chapters_written'] == 3
+
+        for raw_path, pypdf2_path in zip(outputs['raw'], outputs['pypdf2']):
+            raw_pages = PyPDF2.PdfReader(str(raw_path)).pages
+            pypdf2_pages = PyPDF2.PdfReader(str(pypdf2_path)).pages
+            assert len(raw_pages) == len(pypdf2_pages)
+            assert [page.mediabox for page in raw_pages] == [page.mediabox for page in pypdf2_pages]
+
+        assert outputs['virtual'] == [None, None, None]
+        index = json.loads(outputs['virtual_index'].read_text(encoding='utf-8'))
+        assert index['total_pages'] == 7
+        assert [(c['start_page'], c['end_page']) for c in index['chapters']] == [(0, 3), (3, 6), (6, 7)]
+        assert not list((Path(temp_dir) / "virtual").glob("*.pdf"))
+
+        # 原始复制和PdfWriter回退都失败时不计入已写出的章节
+        def fail(*args):
+            raise RuntimeError("写出失败")
+
+        with PDFDocument(pdf_path) as doc:
+            writer = create_chapter_writer('raw', doc, Path(temp_dir) / "raw", "failing")
+            writer._write_chapter = fail
+            writer.write(1, 0, 3)
+            writer._fallback_writer.write = fail
+            try:
+                writer.write(2, 3, 6)
+                assert False, "回退写出失败应该抛出异常"
+            except RuntimeError:
+                pass
+            writer.close()
+            assert writer.stats()['chapters_written'] == 1 and writer.stats()['fallbacks'] == 2
+        print("✅ raw章节与pypdf2一致，virtual索引正确")
+
+        try:
+            import PIL
+        except ImportError:
+            print("⚠️  PIL未安装，跳过续跑测试")
+            return True
+
+        from pdf_ocr_processor import PDFOCRProcessor
+
+        # 第2章开始时中断，续跑后虚拟章节索引仍然覆盖整个文档
+        def interrupt_at_second_chapter(progress, message):
+            if message.startswith("处理第 2/"):
+                raise RuntimeError("模拟中断")
+
+        resume_dir = Path(temp_dir) / "resume"
+        processor = PDFOCRProcessor(dpi=30, ocr_backend='stub', split_engine='virtual')
+        result = processor.process_scanned_pdf(pdf_path, resume_dir, pages_per_chapter=3,
+                                               progress_callback=interrupt_at_second_chapter)
+        assert not result['success']
+        result = processor.process_scanned_pdf(pdf_path, resume_dir, pages_per_chapter=3, resume=True)
+        assert result['success'] and result['resumed'] and result['chapters_created'] == 3
+        index = json.loads(Path(result['chapter_index']).read_text(encoding='utf-8'))
+        assert [(c['start_page'], c['end_page']) for c in index['chapters']] == [(0, 3), (3, 6), (6, 7)]
+
+        # 换成写章节PDF的方式续跑：virtual完成的章节没有PDF，必须重新处理
+        raw = PDFOCRProcessor(dpi=30, ocr_backend='stub', split_engine='raw')
+        result = raw.process_scanned_pdf(pdf_path, resume_dir, pages_per_chapter=3, resume=True)
+        assert result['success'] and not result['resumed'] and len(result['pdf_files']) == 3
+        print("✅ 续跑后虚拟章节索引覆盖整个文档，换写出方式时不沿用检查点")
+
+    return True
+
+def test_streaming_split():
+    """测试有内存上限的流式拆分：每章释放缓存，超过上限时中止，v1流式拆分使用同一引擎"""
+    print_header("测试流式拆分内存上限")
+
+    from pdf_document import PDFDocument
+    from pdf_memory import MemoryLimitExceeded
+    from pdf_split_engine import create_chapter_writer
+    from pdf_chapter_splitter_v1 import PDFSplitter
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "archive.pdf"
+        if not create_blank_pdf(pdf_path, 7):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+
+        # 之前的处理留下的进程峰值不计入本文档的峰值
+        buffer = bytearray(256 * 1024 * 1024)
+        del buffer
+
+        with PDFDocument(pdf_path) as doc:
+            writer = create_chapter_writer('streaming', doc, temp_dir, "archive", max_memory=1 << 40)
+            assert doc.memory_guard is writer.memory_guard
+            for chapter in [(1, 0, 3), (2, 3, 7)]:
+                writer.write(*chapter)
+            writer.close()
+            memory = writer.stats()['memory']
+            assert memory['releases'] == 2 and not memory['exceeded']
+            if memory['peak_rss'] is not None:
+                assert memory['start_rss'] <= memory['peak_rss'] < memory['process_peak_rss']
+                assert memory['process_peak_rss'] - memory['peak_rss'] > 128 * 1024 * 1024
+            assert not doc.reader.resolved_objects
+
+        with PDFDocument(pdf_path) as doc:
+            writer = create_chapter_writer('streaming', doc, temp_dir, "archive", max_memory=1)
+            try:
+                writer.write(1, 0, 3)
+                assert False, "超过内存上限应该中止"
+            except MemoryLimitExceeded:
+                pass
+            writer.close()
+            assert writer.stats()['memory']['exceeded']
+
+        chapters = PDFSplitter(pages_per_chapter=3).split_pdf_streaming(pdf_path, Path(temp_dir) / "v1", chunk_size=5)
+        assert len(chapters) == 3
+        import PyPDF2
+        assert [len(PyPDF2.PdfReader(path).pages) for path in chapters] == [3, 2, 2]
+        print(f"✅ 峰值常驻内存 {memory['peak_rss'] / 1024 / 1024:.0f} MB，上限检查正常")
+
+    return True
+
+def test_mapped_input():
+    """测试共享内存映射输入：同一文件只映射一次，读取结果与普通文件一致，关闭后解除映射"""
+    print_header("测试共享内存映射输入")
+
+    from pdf_document import PDFDocument
+    from pdf_input import map_file, mapped_file_count
+    from pdf_split_engine import RawChapterWriter
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "input.pdf"
+        if not create_blank_pdf(pdf_path, 5):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+
+        mapped_before = mapped_file_count()
+        first = PDFDocument(pdf_path).open()
+        second = PDFDocument(pdf_path).open()
+        plain = PDFDocument(pdf_path, use_mmap=False).open()
+        assert first.buffer is not None and first.buffer is second.buffer
+        assert plain.buffer is None
+        assert mapped_file_count() == mapped_before + 1
+        assert first.total_pages == plain.total_pages == 5
+        assert first.content_hash == plain.content_hash
+
+        outputs = []
+        for name, doc in (("mapped", first), ("plain", plain)):
+            output_dir = Path(temp_dir) / name
+            output_dir.mkdir()
+            writer = RawChapterWriter(doc, output_dir, "input")
+            outputs.append(writer.write(1, 1, 4).read_bytes())
+            writer.close()
+        assert outputs[0] == outputs[1]
+
+        for doc in (first, second, plain):
+            doc.close()
+        assert mapped_file_count() == mapped_before
+
+        empty_path = Path(temp_dir) / "empty.pdf"
+        empty_path.write_bytes(b'')
+        assert map_file(empty_path) is None
+        print("✅ 映射共享、读取一致、关闭后解除映射")
+
+    return True
+
+def test_page_text_memo():
+    """测试页面文本备忘：LRU淘汰的文本溢出到磁盘，索引和拆分共用，每页只提取一次"""
+    print_header("测试页面文本备忘")
+
+    from pdf_document import PDFDocument
+    from pdf_page_index import build_page_text_index
+    from pdf_page_text import PageTextMemo
+    from pdf_split_engine import PageTextCache
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "blank.pdf"
+        if not create_blank_pdf(pdf_path, 10):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+
+        with PDFDocument(pdf_path) as doc:
+            memo = PageTextMemo(doc, capacity=3, spill_dir=temp_dir)
+            assert [memo.get(page) for page in range(10)] == [''] * 10
+            assert memo.get(0) == '' and memo.lookup(9) == ''
+            stats = memo.stats()
+            assert stats['extractions'] == 10 and stats['spilled'] == 8
+            assert stats['spill_hits'] == 1 and stats['resident'] == 3
+            memo.close()
+
+            no_spill = PageTextMemo(doc, capacity=2, spill=False)
+            for page in (0, 1, 2, 0):
+                no_spill.get(page)
+            assert no_spill.extractions == 4 and no_spill.lookup(1) is None
+
+            # 类型检测采样过的页面，构建索引和取标题时不再提取（索引提取的其余页面计入提取次数）
+            assert doc.page_texts.get(0) == ''
+            index = build_page_text_index(doc)
+            page_texts = PageTextCache(doc, index)
+            assert page_texts.chapter_title(0, "第 1 章") == "第 1 章"
+            assert page_texts.extractions == 10 and page_texts.memo.index_hits >= 1
+
+        assert doc._page_texts is None
+
+        # OCR测试共享文档句柄：文件不存在或损坏时每页结果为空，不抛出异常
+        from pdf_chapter_splitter_v2 import PDFSplitterV2
+        splitter = PDFSplitterV2()
+        splitter.use_ocr = True
+        corrupt_path = Path(temp_dir) / "corrupt.pdf"
+        corrupt_path.write_bytes(b"not a pdf")
+        assert splitter.ocr_test(corrupt_path) is False
+        assert splitter.ocr_test(Path(temp_dir) / "missing.pdf") is False
+        print(f"✅ 备忘正常: 溢出 {stats['spilled']} 页, 读回 {stats['spill_hits']} 页")
+
+    return True
+
+def test_optimal_chapter_boundaries():
+    """测试动态规划边界选择：超长间隔后仍能接受后续章节，章节长度不越界"""
+    print_header("测试最优章节边界选择")
+
+    from pdf_chapter_detector import ChapterDetector
+
+    body = "这是正文内容，段落足够长，没有任何标题。后面还有更多句子，继续描述正文内容。"
+    starts = [0, 12, 70, 85]
+    page_texts = {page: body for page in range(100)}
+    for number, page in enumerate(starts, 1):
+        page_texts[page] = f"第{number}章 标题\n{body}"
+
+    greedy = ChapterDetector(min_chapter_pages=10, max_chapter_pages=40).detect_from_text(page_texts)
+    optimal = ChapterDetector(min_chapter_pages=10, max_chapter_pages=40,
+                              strategy='optimal').detect_from_text(page_texts)
+
+    # 贪心在12 -> 70的超长间隔后跳过了后续章节，只能按固定页数补齐
+    assert 85 not in greedy
+    assert set(starts) <= set(optimal)
+    lengths = [end - start for start, end in zip(optimal, optimal[1:] + [100])]
+    assert all(10 <= length <= 40 for length in lengths)
+
+    try:
+        ChapterDetector(strategy='unknown')
+        assert False, "未知策略应该报错"
+    except ValueError:
+        pass
+    print(f"✅ 最优边界: {optimal}（贪心: {greedy}）")
+
+    return True
+
+def test_parallel_ocr_pages():
+    """测试多进程OCR：结果按页序返回，单页失败不影响其他页面，提前停止时不等整个文档"""
+    print_header("测试多进程OCR")
+
+    try:
+        import PIL
+    except ImportError:
+        print("⚠️  PIL未安装，跳过测试")
+        return True
+
+    from pdf_ocr_processor import PDFOCRProcessor
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = Path(temp_dir) / "scan.pdf"
+        if not create_blank_pdf(pdf_path, 40):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+
+        processor = PDFOCRProcessor(dpi=30, ocr_backend='stub:fail_pages=4', workers=2, raster_window=2)
+        results = list(processor._ocr_pages(pdf_path, range(9)))
+        assert [result[0] for result in results] == list(range(9))
+        failed = [result[0] for result in results if result[2] is not None]
+        assert failed == [3], failed
+        assert all(result[1] for result in results if result[0] != 3)
+
+        # 整个文档约 40 x 400ms / 2 = 8秒；取到第一页就停止时只等已在运行的窗口
+        slow = PDFOCRProcessor(dpi=30, ocr_backend='stub:latency_ms=400', workers=2, raster_window=2)
+        start_time = time.perf_counter()
+        page_results = slow._ocr_pages(pdf_path, range(40))
+        assert next(page_results)[0] == 0
+        page_results.close()
+        elapsed = time.perf_counter() - start_time
+        assert elapsed < 4, elapsed
+        print(f"✅ 页序正确、第4页失败被隔离，提前停止耗时 {elapsed:.2f} 秒")
+
+    return True
+
+def test_parallel_batch_processing():
+    """测试多进程批量处理：报告按输入顺序，每个文件记录处理时间，单个文件失败不影响其他文件"""
+    print_header("测试多进程批量处理")
+
+    from pdf_batch_processor import PDFBatchProcessor, _splitter_options
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_dir = Path(temp_dir) / "input"
+        input_dir.mkdir()
+        if not (create_blank_pdf(input_dir / "large.pdf", 40) and create_blank_pdf(input_dir / "small.pdf", 2)):
+            print("⚠️  PyPDF2未安装，跳过测试")
+            return True
+        (input_dir / "broken.pdf").write_bytes(b"not a pdf")
+
+        processor = PDFBatchProcessor(base_output_dir=Path(temp_dir) / "output")
+
+        # 大文件排在前面：小文件先完成，结果仍按任务顺序返回
+        tasks = [(input_dir / name, Path(temp_dir) / "direct" / Path(name).stem)
+                 for name in ("large.pdf", "broken.pdf", "small.pdf")]
+        split_options = {'force_ocr': False, 'use_smart_detection': True}
+        file_results = processor._process_parallel(tasks, _splitter_options({'pages_per_chapter': 2}),
+                                                   split_options, max_workers=2)
+        assert [Path(result['file']).name for result in file_results] == ["large.pdf", "broken.pdf", "small.pdf"]
+        assert [result['success'] for result in file_results] == [True, False, True]
+        assert file_results[1].get('error')
+        assert all(result['processing_time'] > 0 for result in file_results)
+
+        # 目录处理：报告顺序与输入文件顺序一致，失败的文件单独计数
+        result = processor.process_directory(input_dir, max_workers=2, pages_per_chapter=2)
+        assert result['max_workers'] == 2
+        assert (result['successful'], result['failed']) == (2, 1)
+        assert [Path(r['file']).name for r in result['file_results']] == [p.name for p in input_dir.glob("*.pdf")]
+        assert all(r['processing_time'] > 0 for r in result['file_results'])
+        print(f"✅ 2个进程处理3个文件: 成功 {result['successful']}, 失败 {result['failed']}")
+
+    return True
+
+def main():
+    """主测试函数"""
+    print_header("Sprint 5 功能测试")
+
+    all_tests_passed = True
+
+    for test in (test_shared_document_handle, test_raster_windows, test_ocr_cache,
+                 test_processing_checkpoint, test_single_pass_split, test_page_text_index,
+                 test_batch_chapter_detection, test_numpy_preprocessing,
+                 test_structure_classifier, test_adaptive_dpi, test_persistent_ocr_engine,
+                 test_stub_ocr_backend, test_ocr_pipeline, test_streamed_chapter_text,
+                 test_page_scheduler, test_inbox_watcher, test_batch_manifest,
+                 test_split_engines, test_streaming_split, test_mapped_input,
+                 test_page_text_memo, test_optimal_chapter_boundaries, test_parallel_ocr_pages,
+                 test_parallel_batch_processing):
+        all_tests_passed = test() and all_tests_passed
+
+    if all_tests_passed:
+        print("\n🎉 Sprint 5 所有测试通过!")
+        return 0
+    else:
+        print("\n❌ 部分测试失败")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())